@@ -0,0 +1,86 @@
+"""
+Trade recording throughput of ConcurrentStockMarket as writer threads are added.
+
+Each writer records trades for its own symbols while a reader recomputes the index.
+Throughput only scales with the number of writers on a free-threaded Python build
+(python3.13t and later), with the GIL the writers take turns. Run from the project's
+root directory:
+
+    python -m benchmarks.bench_concurrent --trades 200000 --threads 1 2 4 8
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+
+from benchmarks.suite import synthetic_symbol
+from src.models.concurrent_market import ConcurrentStockMarket
+from src.models.stock import Stock
+from src.models.stock_type import StockType
+
+
+def concurrent_market(symbols: int) -> ConcurrentStockMarket:
+    """Build a concurrent market of `symbols` common stocks."""
+
+    market = ConcurrentStockMarket()
+    for index in range(symbols):
+        market.add_stock(Stock(symbol=synthetic_symbol(index), type=StockType.COMMON,
+                               last_dividend=8, par_value=100))
+    return market
+
+
+def bench_threads(threads: int, trades: int, symbols_per_thread: int) -> float:
+    """Record `trades` trades split over `threads` writers and return trades per second."""
+
+    market = concurrent_market(threads * symbols_per_thread)
+    names = market.get_supported_stocks()
+    per_thread = trades // threads
+    done = threading.Event()
+
+    def writer(offset: int) -> None:
+        symbols = names[offset * symbols_per_thread:(offset + 1) * symbols_per_thread]
+        for i in range(per_thread):
+            market.record_trade(symbols[i % symbols_per_thread], 100, 10.0 + i % 5, "BUY")
+
+    def reader() -> None:
+        while not done.is_set():
+            market.all_share_index()
+            time.sleep(0.001)
+
+    writers = [threading.Thread(target=writer, args=(offset,)) for offset in range(threads)]
+    index_reader = threading.Thread(target=reader)
+    index_reader.start()
+    start = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    index_reader.join()
+    return per_thread * threads / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=200_000, help="Number of trades")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Writer thread counts to measure")
+    parser.add_argument("--symbols-per-thread", type=int, default=16,
+                        help="Symbols written by each thread")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    baseline = None
+    for threads in args.threads:
+        throughput = bench_threads(threads, args.trades, args.symbols_per_thread)
+        baseline = baseline or throughput
+        print(f"{threads:>3} writers: {throughput:>14,.0f} trades/sec "
+              f"({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
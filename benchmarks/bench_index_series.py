@@ -0,0 +1,66 @@
+"""
+Point-in-time VWSP and index queries over a day of trades.
+
+Trades are spread over a whole day, then the GBCE All Share Index is computed at one
+second resolution over the day, and at random earlier times one at a time. Run from the
+project's root directory:
+
+    python -m benchmarks.bench_index_series --trades 1000000
+"""
+import argparse
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from benchmarks.bench_record_trades import synthetic_columns
+from benchmarks.suite import synthetic_market
+from src.models.trade_store import from_epoch_ns
+
+DAY_NS = 24 * 3600 * 1_000_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=1_000_000, help="Number of trades")
+    parser.add_argument("--symbols", type=int, default=100, help="Number of stocks")
+    parser.add_argument("--queries", type=int, default=1_000,
+                        help="Number of single point-in-time index queries")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    market = synthetic_market(args.symbols)
+    columns = synthetic_columns(market.get_supported_stocks(), args.trades)
+    start_ns = time.time_ns() - DAY_NS
+    columns["timestamp"] = start_ns + np.arange(args.trades) * (DAY_NS // args.trades)
+    market.record_trades(columns)
+    start, end = from_epoch_ns(start_ns), from_epoch_ns(start_ns + DAY_NS)
+
+    # The first series also builds every stock's prefix sums
+    for label in ("first", "again"):
+        began = time.perf_counter()
+        times_ns, values = market.all_share_index_series(start, end, timedelta(seconds=1))
+        seconds = time.perf_counter() - began
+        print(f"index series, {len(times_ns):,} points ({label}): {seconds:>8.3f} s")
+
+    market.all_share_index(end)
+    rng = np.random.default_rng(1)
+    times = [from_epoch_ns(int(t)) for t in rng.integers(start_ns, start_ns + DAY_NS,
+                                                          args.queries)]
+    began = time.perf_counter()
+    for now in times:
+        market.all_share_index(now)
+    seconds = time.perf_counter() - began
+    print(f"index as of an earlier time:       {seconds / args.queries * 1e6:>8.1f} µs")
+
+    symbol = market.get_supported_stocks()[0]
+    began = time.perf_counter()
+    for now in times:
+        market.stocks[symbol].volume_weighted_stock_price(now)
+    seconds = time.perf_counter() - began
+    print(f"VWSP as of an earlier time:        {seconds / args.queries * 1e6:>8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
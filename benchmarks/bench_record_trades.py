@@ -0,0 +1,97 @@
+"""
+Throughput comparison of StockMarket.record_trade against StockMarket.record_trades.
+
+Batches are also recorded with exchange timestamps arriving up to `--lateness` out of
+order, as merged from several feeds. Run from the project's root directory:
+
+    python -m benchmarks.bench_record_trades --trades 100000
+"""
+import argparse
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from src.util import set_up_stock_market
+
+
+def synthetic_columns(symbols, count: int, seed: int = 42) -> dict:
+    """Build random trade columns over the given symbols."""
+
+    rng = np.random.default_rng(seed)
+    return {
+        "symbol": rng.choice(np.array(symbols, dtype=object), count),
+        "quantity": rng.integers(1, 1_000, count),
+        "trade_price": rng.uniform(50.0, 150.0, count),
+        "side": rng.choice(np.array(["BUY", "SELL"], dtype=object), count),
+    }
+
+
+def bench_single(columns: dict) -> float:
+    """Record the trades one at a time and return trades per second."""
+
+    market = set_up_stock_market()
+    rows = list(zip(columns["symbol"], columns["quantity"].tolist(),
+                    columns["trade_price"].tolist(), columns["side"]))
+    start = time.perf_counter()
+    for symbol, quantity, trade_price, side in rows:
+        market.record_trade(symbol, quantity, trade_price, side)
+    return len(rows) / (time.perf_counter() - start)
+
+
+def bench_batch(columns: dict, batch_size: int) -> float:
+    """Record the trades in batches of `batch_size` and return trades per second."""
+
+    market = set_up_stock_market()
+    count = len(columns["symbol"])
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        market.record_trades({name: column[offset:offset + batch_size]
+                              for name, column in columns.items()})
+    return count / (time.perf_counter() - start)
+
+
+def bench_out_of_order(columns: dict, batch_size: int, lateness: timedelta) -> float:
+    """
+    Record the trades in batches with timestamps jittered by up to `lateness`, and
+    return trades per second.
+    """
+
+    market = set_up_stock_market()
+    market.max_lateness = lateness
+    count = len(columns["symbol"])
+    rng = np.random.default_rng(0)
+    lateness_ns = lateness // timedelta(microseconds=1) * 1000
+    # One trade per microsecond, each stamped up to `lateness` before it arrived
+    columns = dict(columns, timestamp=time.time_ns() + np.arange(count) * 1_000
+                   - rng.integers(0, lateness_ns, count))
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        market.record_trades({name: column[offset:offset + batch_size]
+                              for name, column in columns.items()})
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=100_000, help="Number of trades")
+    parser.add_argument("--batch-size", type=int, default=10_000,
+                        help="Number of trades per record_trades call")
+    parser.add_argument("--lateness", type=float, default=0.05,
+                        help="Seconds out-of-order trades arrive late by, at most")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    columns = synthetic_columns(set_up_stock_market().get_supported_stocks(), args.trades)
+    single = bench_single(columns)
+    batch = bench_batch(columns, args.batch_size)
+    late = bench_out_of_order(columns, args.batch_size, timedelta(seconds=args.lateness))
+    print(f"record_trade:  {single:>14,.0f} trades/sec")
+    print(f"record_trades: {batch:>14,.0f} trades/sec (batch size {args.batch_size})")
+    print(f"speed-up:      {batch / single:>14.1f}x")
+    print(f"out of order:  {late:>14,.0f} trades/sec (up to {args.lateness} s late)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Ingest throughput with a write-ahead journal, and time to recover from it.
+
+Trades are recorded in batches with and without a journal attached, then the market is
+rebuilt from the journal, and from a checkpoint of it. Run from the project's root
+directory:
+
+    python -m benchmarks.bench_recovery --trades 10000000
+"""
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from benchmarks.bench_record_trades import synthetic_columns
+from benchmarks.suite import synthetic_market
+from src.models.stock_market import StockMarket
+from src.models.trade_store import from_epoch_ns
+from src.persistence.journal import TradeJournal, checkpoint, recover_market
+
+
+def ingest(columns: dict, symbols: int, batch_size: int,
+           journal: Optional[TradeJournal]) -> float:
+    """Record the trades in batches and return trades per second."""
+
+    market = synthetic_market(symbols)
+    market.attach_journal(journal)
+    count = len(columns["symbol"])
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        market.record_trades({name: column[offset:offset + batch_size]
+                              for name, column in columns.items()})
+    if journal is not None:
+        journal.commit()
+    return count / (time.perf_counter() - start)
+
+
+def recover(journal_path: Path, symbols: int, checkpoint_path: Optional[Path],
+            now_ns: int) -> float:
+    """Rebuild the market and its index, returning the seconds taken."""
+
+    market = StockMarket() if checkpoint_path else synthetic_market(symbols)
+    start = time.perf_counter()
+    recover_market(journal_path, checkpoint_path, market=market, now=from_epoch_ns(now_ns))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=10_000_000, help="Number of trades")
+    parser.add_argument("--symbols", type=int, default=1_000, help="Number of stocks")
+    parser.add_argument("--batch-size", type=int, default=50_000,
+                        help="Number of trades per record_trades call")
+    parser.add_argument("--directory", type=Path, default=None,
+                        help="Where to write the journal, a temporary directory by default")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    symbols = synthetic_market(args.symbols).get_supported_stocks()
+    columns = synthetic_columns(symbols, args.trades)
+    # A trading day's worth of timestamps, so windows only hold the last 15 minutes
+    day_ns = 8 * 3600 * 1_000_000_000
+    start_ns = time.time_ns() - day_ns
+    columns["timestamp"] = start_ns + np.arange(args.trades) * (day_ns // args.trades)
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        journal_path = Path(directory) / "trades.journal"
+        checkpoint_path = Path(directory) / "market.checkpoint"
+
+        plain = ingest(columns, args.symbols, args.batch_size, None)
+        print(f"ingest without journal: {plain:>14,.0f} trades/sec")
+        with TradeJournal(journal_path) as journal:
+            journaled = ingest(columns, args.symbols, args.batch_size, journal)
+        print(f"ingest with journal:    {journaled:>14,.0f} trades/sec "
+              f"({journaled / plain:.2f}x), {journal_path.stat().st_size / 1e6:,.0f} MB")
+
+        now_ns = int(columns["timestamp"][-1])
+        seconds = recover(journal_path, args.symbols, None, now_ns)
+        print(f"recover from journal:    {seconds:>10.2f} s "
+              f"({args.trades / seconds:,.0f} trades/sec)")
+
+        market = recover_market(journal_path, market=synthetic_market(args.symbols),
+                                now=from_epoch_ns(now_ns))
+        with TradeJournal(journal_path) as journal:
+            checkpoint(market, journal, checkpoint_path)
+        del market
+        seconds = recover(journal_path, args.symbols, checkpoint_path, now_ns)
+        print(f"recover from checkpoint: {seconds:>10.2f} s "
+              f"({args.trades / seconds:,.0f} trades/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Loading a large stock universe from reference data files.
+
+Synthetic stock definitions are written as CSV, NPZ and JSON files, then each is loaded
+with `load_stock_market` and compared to validating and adding every stock one by one.
+Run from the project's root directory:
+
+    python -m benchmarks.bench_reference_data --symbols 50000
+"""
+import argparse
+import csv
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.suite import synthetic_symbol
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.util import load_stock_market
+
+
+def synthetic_columns(symbols: int, seed: int = 42) -> dict:
+    """Columns of `symbols` random common and preferred stock definitions."""
+
+    rng = np.random.default_rng(seed)
+    preferred = rng.random(symbols) < 0.2
+    return {
+        "symbol": np.array([synthetic_symbol(index) for index in range(symbols)]),
+        "type": np.where(preferred, "PREFERRED", "COMMON"),
+        "last_dividend": rng.integers(0, 30, symbols).astype(np.float64),
+        "fixed_dividend": np.where(preferred, 0.02, np.nan),
+        "par_value": rng.choice([60.0, 100.0, 250.0], symbols),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=50_000, help="Number of stocks")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    columns = synthetic_columns(args.symbols)
+    rows = [{name: value for name, value in zip(columns, row) if value == value}
+            for row in zip(*(column.tolist() for column in columns.values()))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {suffix: Path(directory) / f"stocks.{suffix}" for suffix in ("csv", "npz",
+                                                                            "json")}
+        with open(paths["csv"], "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(columns))
+            writer.writeheader()
+            writer.writerows(rows)
+        np.savez(paths["npz"], **columns)
+        paths["json"].write_text(json.dumps(rows))
+
+        for suffix, path in paths.items():
+            began = time.perf_counter()
+            market = load_stock_market(path)
+            seconds = time.perf_counter() - began
+            assert len(market.stocks) == args.symbols
+            # Free the market outside the timed section
+            del market
+            print(f"load_stock_market, {suffix:<4}        {seconds:>8.3f} s")
+
+    began = time.perf_counter()
+    market = StockMarket()
+    for row in rows:
+        market.add_stock(Stock(**row))
+    print(f"Stock(...) and add_stock each   {time.perf_counter() - began:>8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
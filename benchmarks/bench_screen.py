@@ -0,0 +1,75 @@
+"""
+Top-N and screening queries over a large market.
+
+Trades are recorded for every stock, then the top 50 stocks by dividend yield are
+queried, with a few trades recorded between queries, and compared to ranking every
+stock from its VWSP on each query. Run from the project's root directory:
+
+    python -m benchmarks.bench_screen --symbols 50000
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from benchmarks.bench_record_trades import synthetic_columns
+from benchmarks.suite import synthetic_market
+from src.models.screen import ScreenMetric
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=50_000, help="Number of stocks")
+    parser.add_argument("--trades", type=int, default=500_000, help="Number of trades")
+    parser.add_argument("--count", type=int, default=50, help="Number of stocks returned")
+    parser.add_argument("--queries", type=int, default=1_000, help="Number of queries")
+    parser.add_argument("--ticks", type=int, default=10,
+                        help="Number of trades recorded between two queries")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    market = synthetic_market(args.symbols)
+    symbols = market.get_supported_stocks()
+    market.record_trades(synthetic_columns(symbols, args.trades))
+    metric = ScreenMetric.DIVIDEND_YIELD
+
+    began = time.perf_counter()
+    market.top_stocks(metric, args.count)
+    print(f"first query, building the indexes:  {time.perf_counter() - began:>10.3f} s")
+
+    began = time.perf_counter()
+    for _ in range(args.queries):
+        market.top_stocks(metric, args.count)
+    seconds = time.perf_counter() - began
+    print(f"top {args.count}, no new trades:          "
+          f"{seconds / args.queries * 1e6:>10.1f} µs")
+
+    rng = np.random.default_rng(1)
+    ticks = rng.choice(symbols, (args.queries, args.ticks)).tolist()
+    began = time.perf_counter()
+    for batch in ticks:
+        for symbol in batch:
+            market.record_trade(symbol, 100, 100.0, "BUY")
+        market.top_stocks(metric, args.count)
+    seconds = time.perf_counter() - began
+    print(f"top {args.count}, {args.ticks} trades before each:   "
+          f"{seconds / args.queries * 1e6:>10.1f} µs (trades included)")
+
+    queries = max(1, args.queries // 100)
+    began = time.perf_counter()
+    for _ in range(queries):
+        now_ns = time.time_ns()
+        yields = []
+        for stock in market.stocks.values():
+            price = stock._volume_weighted_stock_price_ns(now_ns)
+            if price:
+                yields.append((stock.dividend() / price, stock.symbol))
+        sorted(yields, reverse=True)[:args.count]
+    seconds = time.perf_counter() - began
+    print(f"top {args.count}, full recompute:         "
+          f"{seconds / queries * 1e6:>10.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
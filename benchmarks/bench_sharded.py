@@ -0,0 +1,72 @@
+"""
+Batch ingest throughput of ShardedStockMarket as shards are added.
+
+Trades are routed to the shards in batches and the clock stops once every shard has
+recorded its share. Throughput scales with the number of shards up to the number of
+cores. Run from the project's root directory:
+
+    python -m benchmarks.bench_sharded --trades 2000000 --shards 1 2 4 8
+"""
+import argparse
+import logging
+import os
+import time
+
+from benchmarks.bench_record_trades import synthetic_columns
+from benchmarks.suite import synthetic_market
+from src.engine.sharded_market import ShardedStockMarket
+
+
+def bench_single(columns: dict, symbols: int, batch_size: int) -> float:
+    """Record the trades into one in-process market and return trades per second."""
+
+    market = synthetic_market(symbols)
+    count = len(columns["symbol"])
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        market.record_trades({name: column[offset:offset + batch_size]
+                              for name, column in columns.items()})
+    return count / (time.perf_counter() - start)
+
+
+def bench_sharded(columns: dict, symbols: int, shards: int, batch_size: int) -> float:
+    """Record the trades across `shards` worker processes and return trades per second."""
+
+    stocks = synthetic_market(symbols).stocks.values()
+    count = len(columns["symbol"])
+    with ShardedStockMarket(stocks, shards=shards) as market:
+        # Wait for the workers to start before timing
+        market.trade_counts()
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            market.record_trades({name: column[offset:offset + batch_size]
+                                  for name, column in columns.items()})
+        recorded = sum(market.trade_counts().values())
+        elapsed = time.perf_counter() - start
+    assert recorded == count
+    return count / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=2_000_000, help="Number of trades")
+    parser.add_argument("--symbols", type=int, default=1_000, help="Number of stocks")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Shard counts to measure")
+    parser.add_argument("--batch-size", type=int, default=50_000,
+                        help="Number of trades per record_trades call")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    symbols = synthetic_market(args.symbols).get_supported_stocks()
+    columns = synthetic_columns(symbols, args.trades)
+    print(f"{os.cpu_count()} cores")
+    single = bench_single(columns, args.symbols, args.batch_size)
+    print(f"in-process: {single:>14,.0f} trades/sec")
+    for shards in args.shards:
+        throughput = bench_sharded(columns, args.symbols, shards, args.batch_size)
+        print(f"{shards:>3} shards:  {throughput:>14,.0f} trades/sec ({throughput / single:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
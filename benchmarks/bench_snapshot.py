@@ -0,0 +1,88 @@
+"""
+Size and speed of binary market snapshots against a pydantic JSON dump.
+
+The JSON dump is what persisting a market through pydantic takes: the stocks from
+`model_dump_json` plus every trade as a `Trade` model, with its UUID and datetime. Run
+from the project's root directory:
+
+    python -m benchmarks.bench_snapshot --trades 1000000
+"""
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from pydantic import TypeAdapter
+
+from benchmarks.bench_record_trades import synthetic_columns
+from benchmarks.suite import synthetic_market
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.trade import Trade
+from src.persistence.snapshot import load_snapshot, write_snapshot
+
+_TRADES_ADAPTER = TypeAdapter(Dict[str, List[Trade]])
+
+
+def dump_json(market: StockMarket, path: Path) -> None:
+    """Write the market and its trades as pydantic JSON."""
+
+    trades = {symbol: list(stock.trades) for symbol, stock in market.stocks.items()}
+    path.write_bytes(market.model_dump_json().encode() + b"\n"
+                     + _TRADES_ADAPTER.dump_json(trades))
+
+
+def load_json(path: Path) -> StockMarket:
+    """Restore a market written by `dump_json`."""
+
+    market_json, trades_json = path.read_bytes().split(b"\n", 1)
+    market = StockMarket.model_validate_json(market_json)
+    for symbol, trades in _TRADES_ADAPTER.validate_json(trades_json).items():
+        stock = market.stocks[symbol]
+        market.add_stock(Stock(trades=trades, **stock.model_dump()))
+    return market
+
+
+def timed(function, *args) -> float:
+    """Return the seconds a call takes."""
+
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=1_000_000, help="Number of trades")
+    parser.add_argument("--symbols", type=int, default=100, help="Number of stocks")
+    parser.add_argument("--directory", type=Path, default=None,
+                        help="Where to write the files, a temporary directory by default")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    market = synthetic_market(args.symbols)
+    market.record_trades(synthetic_columns(market.get_supported_stocks(), args.trades))
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        snapshot_path = Path(directory) / "market.snapshot"
+        json_path = Path(directory) / "market.json"
+
+        results = [
+            ("binary snapshot", snapshot_path,
+             timed(write_snapshot, market, snapshot_path),
+             timed(load_snapshot, snapshot_path)),
+            ("pydantic JSON", json_path,
+             timed(dump_json, market, json_path),
+             timed(load_json, json_path)),
+        ]
+        print(f"{args.trades:,} trades over {args.symbols} stocks")
+        print(f"{'':<16}{'size (MB)':>12}{'write (s)':>12}{'load (s)':>12}")
+        for name, path, write_seconds, load_seconds in results:
+            print(f"{name:<16}{path.stat().st_size / 1e6:>12,.1f}"
+                  f"{write_seconds:>12.3f}{load_seconds:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-trade construction cost of the pydantic Trade model against TradeRecord.
+
+Run from the project's root directory:
+
+    python -m benchmarks.bench_trade_construction --trades 100000
+"""
+import argparse
+import logging
+import time
+import timeit
+from datetime import datetime
+
+import pytz
+
+from src.models.trade import Trade
+from src.models.trade_record import TradeRecord
+from src.models.trade_side import TradeSide
+from src.models.trade_store import to_epoch_ns
+from src.util import set_up_stock_market
+
+
+def per_trade_ns(statement, count: int, repeat: int = 5) -> float:
+    """Return the best per-call time of `statement` in nanoseconds."""
+
+    return min(timeit.repeat(statement, number=count, repeat=repeat)) / count * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=100_000,
+                        help="Number of trades per measurement")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    eastern = pytz.timezone('US/Eastern')
+    now = datetime.now(eastern)
+    now_ns = to_epoch_ns(now)
+
+    results = {
+        "Trade (pydantic, uuid4, datetime.now)": per_trade_ns(
+            lambda: Trade(timestamp=datetime.now(eastern), quantity=100, side="BUY",
+                          trade_price=80.0), args.trades),
+        "Trade (pydantic, uuid4)": per_trade_ns(
+            lambda: Trade(timestamp=now, quantity=100, side="BUY", trade_price=80.0),
+            args.trades),
+        "TradeRecord.create": per_trade_ns(
+            lambda: TradeRecord.create(now_ns, 100, 80.0, TradeSide.BUY), args.trades),
+        "TradeRecord.validate (time.time_ns)": per_trade_ns(
+            lambda: TradeRecord.validate(time.time_ns(), 100, 80.0, "BUY"), args.trades),
+    }
+
+    market = set_up_stock_market()
+    stock = market.stocks["POP"]
+    results["Stock.record_trade(Trade)"] = per_trade_ns(
+        lambda: stock.record_trade(Trade(timestamp=datetime.now(eastern), quantity=100,
+                                         side="BUY", trade_price=80.0)), args.trades, 1)
+    results["StockMarket.record_trade"] = per_trade_ns(
+        lambda: market.record_trade("POP", 100, 80.0, "BUY"), args.trades, 1)
+
+    for name, cost in results.items():
+        print(f"{name:<40} {cost:>10,.0f} ns/trade")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Load generator for the trade feed server.
+
+Opens many connections that each stream trades in pipelined bursts and send a query
+after every burst, then reports the sustained trades/sec acknowledged by the server
+and the query round trip latency. Starts a server in-process unless --port is given.
+Run from the project's root directory:
+
+    python -m benchmarks.load_feed --connections 1000 --trades 200 --burst 50
+    python -m benchmarks.load_feed --host 127.0.0.1 --port 9009
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from src.server.feed_server import FeedServer
+from src.server.protocol import parse_response
+from src.util import set_up_stock_market
+
+QUERIES = [b"Q VWSP %s", b"Q DY %s 120", b"Q PE %s 120", b"Q INDEX"]
+
+
+async def feed(host: str, port: int, symbols: List[str], trades: int, burst: int,
+               latencies: List[float], seed: int) -> int:
+    """Stream `trades` trades in bursts, querying after each, and return trades acked."""
+
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    number = acked = 0
+    try:
+        for offset in range(0, trades, burst):
+            lines = []
+            for _ in range(min(burst, trades - offset)):
+                lines.append(b"T %s %d %.2f %s\n" % (
+                    rng.choice(symbols).encode(), rng.randint(1, 1_000),
+                    rng.uniform(50.0, 150.0), rng.choice((b"BUY", b"SELL"))))
+            query = rng.choice(QUERIES)
+            lines.append((query % rng.choice(symbols).encode() if b"%s" in query else query)
+                         + b"\n")
+            number += len(lines)
+            sent = time.perf_counter()
+            writer.write(b"".join(lines))
+            await writer.drain()
+            while True:
+                kind, answered, _ = parse_response(await reader.readline())
+                if kind == "A":
+                    # Acks carry request numbers, which also count the queries sent
+                    acked = answered - offset // burst
+                elif answered == number:
+                    latencies.append(time.perf_counter() - sent)
+                    break
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return acked
+
+
+async def run(host: Optional[str], port: Optional[int], connections: int, trades: int,
+              burst: int) -> None:
+    server = None
+    if port is None:
+        server = FeedServer(set_up_stock_market())
+        host, port = await server.start()
+    symbols = ["TEA", "POP", "ALE", "JOE", "GIN"]
+    latencies: List[float] = []
+    start = time.perf_counter()
+    acked = await asyncio.gather(*(feed(host, port, symbols, trades, burst, latencies, seed)
+                                   for seed in range(connections)))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        await server.close()
+
+    p50, p99 = np.percentile(np.array(latencies) * 1e6, [50, 99])
+    print(f"{connections} connections, {sum(acked):,} trades in {elapsed:.2f}s: "
+          f"{sum(acked) / elapsed:,.0f} trades/sec")
+    print(f"query round trip: p50 {p50:,.0f} us, p99 {p99:,.0f} us "
+          f"({len(latencies):,} queries)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="Server address")
+    parser.add_argument("--port", type=int, help="Server port, starts a server if not given")
+    parser.add_argument("--connections", type=int, default=1_000,
+                        help="Number of concurrent feed connections")
+    parser.add_argument("--trades", type=int, default=200, help="Trades per connection")
+    parser.add_argument("--burst", type=int, default=50,
+                        help="Trades pipelined before each query")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.host, args.port, args.connections, args.trades, args.burst))
+
+
+if __name__ == "__main__":
+    main()
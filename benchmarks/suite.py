@@ -0,0 +1,275 @@
+"""
+Benchmark suite for the market hot paths, with a regression check against a baseline.
+
+Measures StockMarket.record_trade, Stock.volume_weighted_stock_price,
+StockMarket.all_share_index, Stock.dividend_yield and Stock.pe_ratio over synthetic
+markets of different sizes, and writes ops/sec, p50/p99 latency and peak memory to a
+JSON file. Run from the project's root directory:
+
+    python -m benchmarks.suite run --grid quick --output results.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.1
+
+`compare` exits with status 1 if any benchmark regressed beyond the threshold.
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.util import set_up_stock_market
+
+RESULTS_VERSION = 1
+
+# (symbols, trades) market sizes of each grid
+GRIDS: Dict[str, List[Tuple[int, int]]] = {
+    "smoke": [(5, 1_000)],
+    "quick": [(5, 1_000), (5, 100_000), (1_000, 100_000), (10_000, 1_000_000)],
+    "full": [(5, 1_000), (5, 1_000_000), (1_000, 1_000_000), (10_000, 1_000_000),
+             (10_000, 10_000_000)],
+}
+
+# Trades of a synthetic market are spread over this span, ending at build time
+TRADE_SPAN_NS = 60 * 60 * 1_000_000_000
+POPULATE_BATCH_SIZE = 100_000
+# Windows priced at once by the multi-window VWSP benchmark
+VWSP_WINDOWS = (timedelta(minutes=1), timedelta(minutes=5), timedelta(minutes=15),
+                timedelta(minutes=60))
+
+# Benchmark metrics and whether a higher value is better
+METRICS = {"ops_per_sec": True, "p50_ns": False, "p99_ns": False, "peak_memory_bytes": False}
+
+
+def synthetic_symbol(index: int) -> str:
+    """Four letter symbol for a synthetic stock, AAAA, AAAB, ..."""
+
+    letters = []
+    for _ in range(4):
+        index, letter = divmod(index, 26)
+        letters.append(chr(ord("A") + letter))
+    return "".join(reversed(letters))
+
+
+def synthetic_market(symbols: int, seed: int = 42) -> StockMarket:
+    """
+    Build a market of `symbols` stocks, the `set_up_stock_market` stocks for 5 or
+    fewer, random common and preferred stocks otherwise.
+    """
+
+    if symbols <= 5:
+        market = set_up_stock_market()
+        for symbol in market.get_supported_stocks()[symbols:]:
+            del market.stocks[symbol]
+        return market
+
+    rng = np.random.default_rng(seed)
+    market = StockMarket()
+    preferred = rng.random(symbols) < 0.2
+    last_dividends = rng.integers(0, 30, symbols).tolist()
+    par_values = rng.choice([60, 100, 250], symbols).tolist()
+    for index in range(symbols):
+        market.add_stock(Stock(
+            symbol=synthetic_symbol(index),
+            type=StockType.PREFERRED if preferred[index] else StockType.COMMON,
+            last_dividend=last_dividends[index],
+            fixed_dividend=0.02 if preferred[index] else None,
+            par_value=par_values[index]))
+    return market
+
+
+def populate(market: StockMarket, trades: int, seed: int = 42) -> None:
+    """Record `trades` random trades over the last hour, in time order."""
+
+    rng = np.random.default_rng(seed)
+    symbols = np.array(market.get_supported_stocks(), dtype=object)
+    end_ns = time.time_ns()
+    timestamps = np.linspace(end_ns - TRADE_SPAN_NS, end_ns, trades, dtype=np.int64)
+    for offset in range(0, trades, POPULATE_BATCH_SIZE):
+        size = min(POPULATE_BATCH_SIZE, trades - offset)
+        market.record_trades({
+            "symbol": rng.choice(symbols, size),
+            "quantity": rng.integers(1, 1_000, size),
+            "trade_price": rng.uniform(50.0, 150.0, size),
+            "side": rng.choice(np.array(["BUY", "SELL"], dtype=object), size),
+            "timestamp": timestamps[offset:offset + size],
+        })
+
+
+def measure(operation: Callable[[int], object], ops: int, warmup: int = 100,
+            between: Optional[Callable[[int], object]] = None) -> Dict[str, float]:
+    """
+    Time `ops` calls of `operation(i)` one by one and return ops/sec with p50 and p99
+    latency in nanoseconds. `between(i)`, if given, runs before each call untimed.
+    """
+
+    for i in range(min(warmup, ops)):
+        if between is not None:
+            between(i)
+        operation(i)
+
+    latencies = np.empty(ops, dtype=np.int64)
+    clock = time.perf_counter_ns
+    for i in range(ops):
+        if between is not None:
+            between(i)
+        start = clock()
+        operation(i)
+        latencies[i] = clock() - start
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"ops": ops, "ops_per_sec": ops / (latencies.sum() / 1e9),
+            "p50_ns": float(p50), "p99_ns": float(p99)}
+
+
+def bench_market(symbols: int, trades: int, ops: int, seed: int = 42) -> List[Dict]:
+    """Run every benchmark against one synthetic market."""
+
+    tracemalloc.start()
+    market = synthetic_market(symbols, seed)
+    populate(market, trades, seed)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rng = np.random.default_rng(seed)
+    names = market.get_supported_stocks()
+    picks = [names[i] for i in rng.integers(0, len(names), ops + 100)]
+    stocks = [market.stocks[symbol] for symbol in picks]
+    quantities = rng.integers(1, 1_000, len(picks)).tolist()
+    prices = rng.uniform(50.0, 150.0, len(picks)).tolist()
+    sides = rng.choice(["BUY", "SELL"], len(picks)).tolist()
+
+    def record_one(i: int) -> None:
+        market.record_trade(picks[i], quantities[i], prices[i], sides[i])
+
+    benchmarks: Iterable[Tuple[str, Callable[[int], object], Optional[Callable]]] = [
+        ("record_trade", record_one, None),
+        ("volume_weighted_stock_price", lambda i: stocks[i].volume_weighted_stock_price(),
+         None),
+        # Trades are recorded between calls, so the prefix sums are extended every time
+        ("volume_weighted_stock_price_1m",
+         lambda i: stocks[i].volume_weighted_stock_price(window=VWSP_WINDOWS[0]), record_one),
+        ("volume_weighted_stock_prices_4_windows",
+         lambda i: stocks[i].volume_weighted_stock_prices(VWSP_WINDOWS), record_one),
+        ("order_flow", lambda i: stocks[i].order_flow(), record_one),
+        # A trade is recorded between index calls, so every call has a changed symbol
+        ("all_share_index", lambda i: market.all_share_index(), record_one),
+        ("dividend_yield", lambda i: stocks[i].dividend_yield(prices[i]), None),
+        ("pe_ratio", lambda i: stocks[i].pe_ratio(prices[i]), None),
+    ]
+
+    results = []
+    for name, operation, between in benchmarks:
+        result = {"benchmark": name, "symbols": symbols, "trades": trades}
+        result.update(measure(operation, ops, between=between))
+        result["peak_memory_bytes"] = peak_memory
+        results.append(result)
+    return results
+
+
+def result_key(result: Dict) -> str:
+    """Identify a result across runs."""
+
+    return f"{result['benchmark']}[symbols={result['symbols']},trades={result['trades']}]"
+
+
+def run(sizes: Iterable[Tuple[int, int]], ops: int, seed: int = 42,
+        report: Callable[[Dict], None] = lambda result: None) -> Dict:
+    """Run the suite over the given market sizes and return the results document."""
+
+    results = []
+    for symbols, trades in sizes:
+        for result in bench_market(symbols, trades, ops, seed):
+            report(result)
+            results.append(result)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Return a description of every metric of `current` worse than `baseline` by more
+    than `threshold` (a fraction, 0.1 is 10%). Benchmarks missing from either side are
+    skipped.
+    """
+
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = result_key(result)
+        if key not in previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = previous[key].get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{key} {metric}: {before:,.0f} -> {after:,.0f} "
+                                   f"({change:+.1%})")
+    return regressions
+
+
+def format_result(result: Dict) -> str:
+    """One line summary of a result."""
+
+    return (f"{result_key(result):<70} {result['ops_per_sec']:>14,.0f} ops/sec "
+            f"p50 {result['p50_ns']:>9,.0f} ns  p99 {result['p99_ns']:>9,.0f} ns  "
+            f"peak {result['peak_memory_bytes'] / 2 ** 20:>8,.1f} MiB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--grid", choices=sorted(GRIDS), default="quick",
+                            help="Market sizes to benchmark")
+    run_parser.add_argument("--symbols", type=int, help="Benchmark only this many symbols")
+    run_parser.add_argument("--trades", type=int, help="Benchmark only this many trades")
+    run_parser.add_argument("--ops", type=int, default=10_000,
+                            help="Timed calls per benchmark")
+    run_parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    run_parser.add_argument("--output", help="Write the results to this JSON file")
+
+    compare_parser = commands.add_parser("compare", help="Compare results with a baseline")
+    compare_parser.add_argument("baseline", help="Baseline results JSON file")
+    compare_parser.add_argument("current", help="Current results JSON file")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Allowed regression, as a fraction")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as baseline, open(args.current) as current:
+            regressions = compare(json.load(baseline), json.load(current), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%}")
+        return 1 if regressions else 0
+
+    logging.disable(logging.INFO)
+    sizes = GRIDS[args.grid]
+    if args.symbols is not None or args.trades is not None:
+        sizes = [(args.symbols or 5, args.trades or 1_000)]
+    document = run(sizes, args.ops, args.seed, lambda result: print(format_result(result)))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(document, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from src.cli.application import interactive_menu
+from src.cli.commands import app
 
 if __name__ == "__main__":
-        interactive_menu()
\ No newline at end of file
+        app()
@@ -1,5 +1,3 @@
-import time
-
 import typer
 
 from src.util import set_up_stock_market
@@ -89,5 +87,3 @@ def interactive_menu() -> None:
                 break
             case _:
                 typer.echo("Invalid option. Please choose a number between 1 and 6.")
-
-        time.sleep(2)
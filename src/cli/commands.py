@@ -0,0 +1,242 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import math
+import sys
+import time
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import typer
+
+from src.cli.application import interactive_menu
+from src.feeds.tape import DEFAULT_BATCH_SIZE, read_csv_tape, read_tape, replay_tape
+from src.models.stock_market import StockMarket
+from src.models.trade_store import from_epoch_ns, to_epoch_ns
+from src.server.feed_server import FeedServer
+from src.util import load_stock_market, set_up_stock_market
+
+app = typer.Typer(help="Super Simple Stock Market")
+
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class OutputFormat(str, Enum):
+    """
+    Enum class for the output formats of the headless commands
+    """
+
+    JSON = "json"
+    CSV = "csv"
+
+
+# Options shared by the headless commands
+MARKET_OPTION = typer.Option(None, "--market", "-m", exists=True, dir_okay=False,
+                             help="Stock definition file (CSV, NPZ or JSON), the built-in "
+                                  "stocks if not given")
+TRADES_OPTION = typer.Option(None, "--trades", "-t",
+                             help="CSV or binary trade tape to record first, - for CSV on "
+                                  "stdin; the timestamp column may be left out")
+NOW_OPTION = typer.Option(None, help="ISO 8601 time to calculate at (UTC without an offset), "
+                                     "the last trade's time or the current time by default")
+FORMAT_OPTION = typer.Option(OutputFormat.JSON, "--format", "-f", help="Output format")
+
+
+@app.callback(invoke_without_command=True)
+def main(ctx: typer.Context,
+         log_level: str = typer.Option("INFO", help="Logging level, DEBUG logs every trade "
+                                                    "and calculation")) -> None:
+    """
+    Configures logging and runs the interactive menu when no command is given.
+    """
+
+    level = logging.getLevelName(log_level.upper())
+    if not isinstance(level, int):
+        raise typer.BadParameter(f"Unknown logging level {log_level}", param_hint="--log-level")
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+    if ctx.invoked_subcommand is None:
+        interactive_menu()
+
+
+@app.command()
+def replay(
+        tape: Path = typer.Argument(..., exists=True, dir_okay=False,
+                                    help="CSV or binary trade tape to replay"),
+        speed: Optional[float] = typer.Option(
+            None, help="Replay at this multiple of the recorded pace, as fast as possible if "
+                 "not given"),
+        batch_size: int = typer.Option(DEFAULT_BATCH_SIZE, min=1,
+                                       help="Number of trades read per batch"),
+) -> None:
+    """
+    Replays a trade tape into the stock market, keeping the recorded trade timestamps.
+    """
+
+    if speed is not None and speed <= 0:
+        raise typer.BadParameter("Replay speed must be positive", param_hint="--speed")
+
+    market = set_up_stock_market()
+    start = time.perf_counter()
+    result = replay_tape(market, read_tape(tape, batch_size), speed=speed)
+    elapsed = time.perf_counter() - start
+
+    typer.echo(f"Replayed {result.accepted} trades in {elapsed:.3f}s "
+               f"({result.accepted / elapsed if elapsed else 0:,.0f} trades/sec).")
+    for reject in result.rejected:
+        typer.echo(f"Rejected tape row {reject.row}: {reject.reason}")
+    if result.last_timestamp_ns is None:
+        return
+
+    end_of_tape = from_epoch_ns(result.last_timestamp_ns)
+    typer.echo(f"End of tape: {end_of_tape.isoformat()}")
+    for symbol, stock in market.stocks.items():
+        price = stock.volume_weighted_stock_price(now=end_of_tape)
+        if price is not None:
+            typer.echo(f"Volume Weighted Stock Price for {symbol} is: {price:.4f}")
+    index = market.all_share_index(now=end_of_tape)
+    if index is not None:
+        typer.echo(f"GBCE All Share Index is: {index:.4f}")
+
+
+@app.command()
+def serve(host: str = typer.Option("127.0.0.1", help="Address to listen on"),
+          port: int = typer.Option(9009, min=0, max=65535, help="Port to listen on")) -> None:
+    """
+    Serves the trade feed protocol over TCP until interrupted.
+    """
+
+    server = FeedServer(set_up_stock_market(), host, port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        typer.echo(f"Stopped after recording {server.trades_recorded} trades.")
+
+
+@app.command()
+def quote(
+        symbols: List[str] = typer.Option([], "--symbol", "-s",
+                                          help="Stock to quote, every stock if not given"),
+        prices: List[str] = typer.Option(
+            [], "--price", "-p", help="SYMBOL=PRICE to calculate the dividend yield and P/E "
+                                      "ratio at, instead of the VWSP"),
+        market_path: Optional[Path] = MARKET_OPTION,
+        trades: Optional[str] = TRADES_OPTION,
+        now: Optional[str] = NOW_OPTION,
+        output_format: OutputFormat = FORMAT_OPTION,
+) -> None:
+    """
+    Prints the VWSP, dividend yield and P/E ratio of stocks, without prompts.
+    """
+
+    market, now_time = _prepare_market(market_path, trades, now)
+    given_prices = _parse_prices(prices)
+    symbols = [symbol.upper() for symbol in symbols] or market.get_supported_stocks()
+    unknown = [symbol for symbol in {*symbols, *given_prices} if symbol not in market.stocks]
+    if unknown:
+        raise typer.BadParameter(f"Stock symbol not found: {', '.join(sorted(unknown))}")
+
+    rows = []
+    for symbol in symbols:
+        stock = market.stocks[symbol]
+        vwsp = stock.volume_weighted_stock_price(now_time)
+        price = given_prices.get(symbol, vwsp)
+        rows.append({
+            "symbol": symbol,
+            "vwsp": vwsp,
+            "price": price,
+            "dividend_yield": None if price is None else stock.dividend_yield(price),
+            "pe_ratio": None if price is None else stock.pe_ratio(price),
+        })
+    _echo_rows(rows, ("symbol", "vwsp", "price", "dividend_yield", "pe_ratio"), output_format)
+
+
+@app.command()
+def index(
+        market_path: Optional[Path] = MARKET_OPTION,
+        trades: Optional[str] = TRADES_OPTION,
+        now: Optional[str] = NOW_OPTION,
+        output_format: OutputFormat = FORMAT_OPTION,
+) -> None:
+    """
+    Prints the GBCE All Share Index, without prompts.
+    """
+
+    market, now_time = _prepare_market(market_path, trades, now)
+    row = {"time": now_time.isoformat(), "all_share_index": market.all_share_index(now_time)}
+    _echo_rows([row], ("time", "all_share_index"), output_format)
+
+
+def _prepare_market(market_path: Optional[Path], trades: Optional[str],
+                    now: Optional[str]) -> Tuple[StockMarket, datetime]:
+    """
+    Load the market and record the trades of a headless command, returning the market
+    and the time to calculate at. Rejected trades are reported on stderr.
+    """
+
+    try:
+        market = set_up_stock_market() if market_path is None \
+            else load_stock_market(market_path)
+    except ValueError as error:
+        raise typer.BadParameter(str(error), param_hint="--market") from None
+    try:
+        now_time = None if now is None else datetime.fromisoformat(now)
+    except ValueError:
+        raise typer.BadParameter(f"Invalid time {now!r}", param_hint="--now") from None
+
+    if trades is not None:
+        if trades == "-":
+            batches = read_csv_tape(sys.stdin)
+        elif Path(trades).is_file():
+            batches = read_tape(trades)
+        else:
+            raise typer.BadParameter(f"No such file: {trades}", param_hint="--trades")
+        try:
+            result = replay_tape(market, batches)
+        except ValueError as error:
+            raise typer.BadParameter(str(error), param_hint="--trades") from None
+        for reject in result.rejected:
+            typer.echo(f"Rejected trade row {reject.row}: {reject.reason}", err=True)
+        if now_time is None and result.last_timestamp_ns is not None:
+            now_time = from_epoch_ns(result.last_timestamp_ns)
+    if now_time is None:
+        now_time = market.clock.now()
+    elif now_time.tzinfo is None:
+        now_time = from_epoch_ns(to_epoch_ns(now_time))
+    return market, now_time
+
+
+def _parse_prices(prices: Sequence[str]) -> Dict[str, float]:
+    """Parse SYMBOL=PRICE options."""
+
+    parsed = {}
+    for value in prices:
+        symbol, _, price = value.partition("=")
+        error = f"Expected SYMBOL=PRICE with a positive price, got {value!r}"
+        try:
+            number = float(price)
+        except ValueError as failure:
+            raise typer.BadParameter(error, param_hint="--price") from failure
+        if not symbol.strip() or not math.isfinite(number) or number <= 0:
+            raise typer.BadParameter(error, param_hint="--price")
+        parsed[symbol.strip().upper()] = number
+    return parsed
+
+
+def _echo_rows(rows: List[Dict[str, Any]], fields: Sequence[str],
+               output_format: OutputFormat) -> None:
+    """Print rows as a JSON array, or as CSV with a header line."""
+
+    if output_format is OutputFormat.JSON:
+        typer.echo(json.dumps(rows))
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    typer.echo(buffer.getvalue(), nl=False)
@@ -0,0 +1,131 @@
+import sys
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+# Trades passed to a shard, one 32 byte record each
+TRADE_RING_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("quantity", "<i8"),
+    ("trade_price", "<f8"),
+    ("symbol", "S5"),
+    ("side", "i1"),
+    ("padding", "V2"),
+])
+
+# The write and read counters live on separate cache lines ahead of the records
+_HEADER_SIZE = 128
+_WRITE_OFFSET = 0
+_READ_OFFSET = 64
+
+
+class TradeRing:
+    """
+    Single producer, single consumer ring buffer of trade records in shared memory.
+
+    The producer and consumer each own one monotonically increasing counter, the number
+    of records written and read so far, so neither ever writes what the other writes.
+    A record is copied in before the write counter is advanced past it, and copied out
+    before the read counter is.
+    """
+
+    __slots__ = ("capacity", "_memory", "_counters", "_records", "_owner")
+
+    def __init__(self, memory: shared_memory.SharedMemory, capacity: int, owner: bool) -> None:
+        self.capacity = capacity
+        self._memory = memory
+        self._owner = owner
+        # Two uint64 counters, at _WRITE_OFFSET and _READ_OFFSET
+        self._counters = np.ndarray((_HEADER_SIZE // 8,), dtype=np.uint64, buffer=memory.buf)
+        self._records = np.ndarray((capacity,), dtype=TRADE_RING_DTYPE, buffer=memory.buf,
+                                   offset=_HEADER_SIZE)
+
+    @classmethod
+    def create(cls, capacity: int) -> "TradeRing":
+        """Allocate a ring of `capacity` records, a power of two."""
+
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("Ring capacity must be a positive power of two")
+        memory = shared_memory.SharedMemory(
+            create=True, size=_HEADER_SIZE + capacity * TRADE_RING_DTYPE.itemsize)
+        ring = cls(memory, capacity, owner=True)
+        ring._counters[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, capacity: int) -> "TradeRing":
+        """Attach to a ring created by another process."""
+
+        if sys.version_info >= (3, 13):
+            # Only the creating process unlinks the block
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Spawned processes share their parent's resource tracker, which registers
+            # each block once, so attaching does not make it unlink the block twice
+            memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, capacity, owner=False)
+
+    @property
+    def name(self) -> str:
+        """Name other processes attach to the ring by."""
+
+        return self._memory.name
+
+    def __len__(self) -> int:
+        """Number of records written but not read yet."""
+
+        return int(self._counters[_WRITE_OFFSET // 8] - self._counters[_READ_OFFSET // 8])
+
+    def write(self, records: np.ndarray) -> int:
+        """
+        Copy as many of the records in as there is room for, returning how many were
+        written. Must only be called by the producer.
+        """
+
+        written = int(self._counters[_WRITE_OFFSET // 8])
+        free = self.capacity - (written - int(self._counters[_READ_OFFSET // 8]))
+        count = min(free, len(records))
+        if count:
+            self._copy_in(written, records[:count])
+            self._counters[_WRITE_OFFSET // 8] = written + count
+        return count
+
+    def read(self, max_count: Optional[int] = None) -> np.ndarray:
+        """
+        Copy out up to `max_count` of the unread records, oldest first. Must only be
+        called by the consumer.
+        """
+
+        read = int(self._counters[_READ_OFFSET // 8])
+        count = int(self._counters[_WRITE_OFFSET // 8]) - read
+        if max_count is not None:
+            count = min(count, max_count)
+        if not count:
+            return self._records[:0].copy()
+        start = read % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            records = self._records[start:end].copy()
+        else:
+            records = np.concatenate((self._records[start:],
+                                      self._records[:end - self.capacity]))
+        self._counters[_READ_OFFSET // 8] = read + count
+        return records
+
+    def _copy_in(self, written: int, records: np.ndarray) -> None:
+        """Copy records into the slots following the `written` first records."""
+
+        start = written % self.capacity
+        first = min(len(records), self.capacity - start)
+        self._records[start:start + first] = records[:first]
+        if first < len(records):
+            self._records[:len(records) - first] = records[first:]
+
+    def close(self) -> None:
+        """Detach from the ring, freeing it if this process created it."""
+
+        self._counters = self._records = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
@@ -0,0 +1,446 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from src.engine.ring_buffer import TRADE_RING_DTYPE, TradeRing
+from src.models.clock import Clock, system_clock
+from src.models.order_flow import OrderFlow
+from src.models.screen import ScreenMetric, ScreenRow
+from src.models.share_index import index_series
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.trade_batch import TradeBatch, TradeBatchResult, ValidatedTrades, to_columns, \
+    validate_trades
+from src.models.trade_record import TradeRecord
+from src.models.trade_side import TradeSide
+from src.models.trade_store import SIDE_FLAGS, to_epoch_ns
+
+log = logging.getLogger(__name__)
+
+DEFAULT_RING_CAPACITY = 1 << 16
+# Most records a shard records in one go
+SHARD_BATCH_SIZE = 16_384
+# How long an idle shard waits for a command before polling its ring again, in seconds
+SHARD_IDLE_WAIT = 0.001
+# How long a producer backs off when a shard's ring is full, in seconds
+RING_FULL_WAIT = 0.0001
+
+
+def shard_for(symbol: str, shards: int) -> int:
+    """Return the shard owning the symbol, stable across processes and runs."""
+
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def _check_ring_symbol(symbol: str) -> None:
+    """Raise a ValueError unless the symbol fits the symbol field of ring records."""
+
+    if not (symbol.isascii() and
+            0 < len(symbol) <= TRADE_RING_DTYPE["symbol"].itemsize):
+        raise ValueError(f"Stock symbol does not fit a trade ring record: {symbol!r}")
+
+
+def _record_from_ring(market: StockMarket, records: np.ndarray) -> None:
+    """Record ring records, validated by the producer, into the shard's market."""
+
+    validated = ValidatedTrades(
+        symbols=np.char.decode(records["symbol"], "ascii").astype(object),
+        quantities=records["quantity"], trade_prices=records["trade_price"],
+        sides=records["side"], timestamps=records["timestamp"],
+        valid=np.ones(len(records), dtype=bool))
+    market.record_validated(validated)
+
+
+def _drain(ring: TradeRing, market: StockMarket) -> int:
+    """Record everything in the ring, returning the number of trades recorded."""
+
+    total = 0
+    while len(records := ring.read(SHARD_BATCH_SIZE)):
+        _record_from_ring(market, records)
+        total += len(records)
+    return total
+
+
+def _handle(market: StockMarket, command: str, args: Tuple[Any, ...]) -> Any:
+    """Answer a command sent to a shard."""
+
+    if command == "add_stock":
+        market.add_stock(Stock.from_validated(args[0]))
+        return None
+    if command == "index_terms":
+        return market.all_share_index_terms(args[0])
+    if command == "index_series_terms":
+        return market.all_share_index_series_terms(*args)
+    if command == "vwsp":
+        symbol, now, window = args
+        return market.stocks[symbol].volume_weighted_stock_price(now, window)
+    if command == "order_flow":
+        return market.order_flow(args[0])
+    if command == "top_stocks":
+        return market.top_stocks(*args)
+    if command == "screen_stocks":
+        return market.screen_stocks(*args)
+    if command == "set_reference_prices":
+        return market.set_reference_prices(*args)
+    if command == "trade_counts":
+        return {symbol: len(stock.trades) for symbol, stock in market.stocks.items()}
+    raise ValueError(f"Unknown shard command {command!r}")
+
+
+def run_shard(ring_name: str, capacity: int, stocks: List[Dict[str, Any]],
+              connection: Connection) -> None:
+    """
+    Worker process of a shard: records the trades routed to it and answers commands.
+
+    Before answering a command the ring is drained, so answers include every trade
+    sent before the command.
+    """
+
+    logging.disable(logging.INFO)
+    ring = TradeRing.attach(ring_name, capacity)
+    market = StockMarket()
+    # Dumped from validated stocks by the parent
+    market.add_stocks(Stock.from_validated(data) for data in stocks)
+    try:
+        while True:
+            busy = _drain(ring, market)
+            if not connection.poll(0 if busy else SHARD_IDLE_WAIT):
+                continue
+            command, *args = connection.recv()
+            _drain(ring, market)
+            if command == "stop":
+                connection.send((True, None))
+                return
+            try:
+                connection.send((True, _handle(market, command, tuple(args))))
+            except Exception as error:
+                connection.send((False, f"{type(error).__name__}: {error}"))
+    finally:
+        ring.close()
+        connection.close()
+
+
+class _Shard:
+    """Parent side handle of a shard worker."""
+
+    __slots__ = ("ring", "connection", "process", "lock")
+
+    def __init__(self, ring: TradeRing, connection: Connection,
+                 process: multiprocessing.process.BaseProcess) -> None:
+        self.ring = ring
+        self.connection = connection
+        self.process = process
+        # Writers and commands of a shard are serialised, the ring has one producer
+        self.lock = threading.Lock()
+
+    def write(self, records: np.ndarray) -> None:
+        """Write all the records to the ring, waiting for room when it is full."""
+
+        while len(records):
+            written = self.ring.write(records)
+            records = records[written:]
+            if len(records):
+                if not self.process.is_alive():
+                    raise RuntimeError("Shard worker exited")
+                time.sleep(RING_FULL_WAIT)
+
+    def request(self, command: str, *args: Any) -> Any:
+        """Send a command and wait for its answer."""
+
+        self.connection.send((command, *args))
+        return self.answer(command)
+
+    def answer(self, command: str) -> Any:
+        """Wait for the answer to a command sent to the shard."""
+
+        try:
+            ok, value = self.connection.recv()
+        except (EOFError, OSError):
+            raise RuntimeError("Shard worker exited") from None
+        if not ok:
+            raise RuntimeError(f"Shard command {command} failed: {value}")
+        return value
+
+
+class ShardedStockMarket:
+    """
+    Stock market partitioned by symbol across worker processes.
+
+    Every shard is a process owning the stocks whose symbol hashes to it. Trades are
+    validated and timestamped in the calling process, then passed to their shard over a
+    shared memory ring buffer, so ingest is spread over as many cores as there are
+    shards. The GBCE All Share Index is combined from the per-shard sums of log VWSPs,
+    giving the same value as a single `StockMarket` holding every stock.
+
+    Use it as a context manager, or call `close` to stop the workers.
+    """
+
+    def __init__(self, stocks: Iterable[Stock] = (), shards: Optional[int] = None,
+                 ring_capacity: int = DEFAULT_RING_CAPACITY,
+                 clock: Optional[Clock] = None) -> None:
+        self.shards = shards or os.cpu_count() or 1
+        self.ring_capacity = ring_capacity
+        # Stamps trades and gives the time of queries without one, the shards are
+        # always asked with an explicit time
+        self.clock = clock or system_clock()
+        self._symbols: Dict[str, int] = {}
+        self._shards: List[_Shard] = []
+
+        definitions: List[List[Dict[str, Any]]] = [[] for _ in range(self.shards)]
+        for stock in stocks:
+            _check_ring_symbol(stock.symbol)
+            shard = shard_for(stock.symbol, self.shards)
+            self._symbols[stock.symbol] = shard
+            definitions[shard].append(stock.model_dump())
+
+        context = multiprocessing.get_context("spawn")
+        try:
+            for shard_stocks in definitions:
+                ring = TradeRing.create(ring_capacity)
+                parent, child = context.Pipe()
+                process = context.Process(target=run_shard, daemon=True,
+                                          args=(ring.name, ring_capacity, shard_stocks, child))
+                process.start()
+                child.close()
+                self._shards.append(_Shard(ring, parent, process))
+        except BaseException:
+            self.close()
+            raise
+        log.info("Started %d market shards", self.shards)
+
+    def __enter__(self) -> "ShardedStockMarket":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_supported_stocks(self) -> List[str]:
+        """Return a list of supported stock symbols."""
+
+        return list(self._symbols)
+
+    def add_stock(self, stock: Stock) -> None:
+        """Add a stock to the market, on the shard its symbol hashes to."""
+
+        _check_ring_symbol(stock.symbol)
+        shard = shard_for(stock.symbol, self.shards)
+        with self._shards[shard].lock:
+            self._shards[shard].request("add_stock", stock.model_dump())
+        self._symbols[stock.symbol] = shard
+
+    def record_trade(self, symbol: str, quantity: int, trade_price: float, side: TradeSide,
+                     timestamp: Optional[datetime] = None) -> None:
+        """Record a trade for the given stock symbol on its shard.
+
+        The trade is validated here, so invalid trades raise a ValueError as with
+        `StockMarket.record_trade`, and recorded by the shard asynchronously. It is
+        stamped with `timestamp`, e.g. an exchange time, or the clock's time if None.
+        """
+        shard = self._symbols.get(symbol)
+        if shard is None:
+            raise ValueError("Stock symbol not found")
+        timestamp_ns = self.clock.now_ns() if timestamp is None else to_epoch_ns(timestamp)
+        trade = TradeRecord.validate(timestamp_ns, quantity, trade_price, side)
+
+        record = np.zeros(1, dtype=TRADE_RING_DTYPE)
+        record[0] = (trade.timestamp_ns, trade.quantity, trade.trade_price, symbol.encode("ascii"),
+                     SIDE_FLAGS[trade.side], b"")
+        with self._shards[shard].lock:
+            self._shards[shard].write(record)
+
+    def record_trades(self, trades: TradeBatch) -> TradeBatchResult:
+        """Record a batch of trades, see `StockMarket.record_trades`.
+
+        The batch is validated here and its valid rows are routed to their shards in
+        bulk.
+        """
+        columns = to_columns(trades)
+        validated, rejected = validate_trades(columns, self._symbols, self.clock.now_ns())
+
+        rows = np.flatnonzero(validated.valid)
+        records = np.zeros(len(rows), dtype=TRADE_RING_DTYPE)
+        records["timestamp"] = validated.timestamps[rows]
+        records["quantity"] = validated.quantities[rows]
+        records["trade_price"] = validated.trade_prices[rows]
+        records["side"] = validated.sides[rows]
+        symbols = validated.symbols[rows]
+        records["symbol"] = symbols.astype("S5")
+        shard_ids = np.fromiter((self._symbols[symbol] for symbol in symbols), dtype=np.intp,
+                                count=len(symbols))
+        for shard_id in np.unique(shard_ids):
+            shard = self._shards[shard_id]
+            with shard.lock:
+                shard.write(records[shard_ids == shard_id])
+
+        log.info("Recorded batch of trades: %d accepted, %d rejected", len(rows),
+                 len(rejected))
+        return TradeBatchResult(accepted=len(rows), rejected=rejected)
+
+    def volume_weighted_stock_price(self, symbol: str, now: Optional[datetime] = None,
+                                    window: Optional[timedelta] = None) -> Optional[float]:
+        """Calculate the VWSP of the given stock on its shard."""
+
+        shard = self._symbols.get(symbol)
+        if shard is None:
+            raise ValueError("Stock symbol not found")
+        if now is None:
+            now = self.clock.now()
+        with self._shards[shard].lock:
+            return self._shards[shard].request("vwsp", symbol, now, window)
+
+    def all_share_index(self, now: Optional[datetime] = None) -> Optional[float]:
+        """Calculate the GBCE All Share Index over every shard.
+
+        Each shard updates its own index and returns the sum of its log VWSPs, the
+        shards working in parallel.
+        """
+        if now is None:
+            now = self.clock.now()
+        terms = self._broadcast("index_terms", now)
+        count = sum(shard_count for _, shard_count in terms)
+        if not count:
+            return None
+        return math.exp(math.fsum(log_sum for log_sum, _ in terms) / count)
+
+    def all_share_index_series(self, start: datetime, end: datetime,
+                               step: timedelta = timedelta(seconds=1)) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """Calculate the index as of every `step` from `start` to `end` over every shard.
+
+        See `StockMarket.all_share_index_series`, each shard sums the log VWSPs of its
+        stocks at every time.
+        """
+        terms = self._broadcast("index_series_terms", start, end, step)
+        times_ns = terms[0][0]
+        log_sums = np.sum([log_sums for _, log_sums, _ in terms], axis=0)
+        counts = np.sum([counts for _, _, counts in terms], axis=0)
+        return times_ns, index_series(log_sums, counts)
+
+    def order_flow(self, now: Optional[datetime] = None,
+                   symbols: Optional[Iterable[str]] = None) -> Dict[str, OrderFlow]:
+        """Return the order flow of the given stocks, all by default, from every shard."""
+
+        if now is None:
+            now = self.clock.now()
+        flows: Dict[str, OrderFlow] = {}
+        for shard_flows in self._broadcast("order_flow", now):
+            flows.update(shard_flows)
+        if symbols is None:
+            return flows
+        symbols = list(symbols)
+        missing = [symbol for symbol in symbols if symbol not in flows]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        return {symbol: flows[symbol] for symbol in symbols}
+
+    def top_stocks(self, metric: ScreenMetric, count: int = 10, ascending: bool = False,
+                   now: Optional[datetime] = None) -> List[ScreenRow]:
+        """
+        Return the `count` stocks with the highest metric, or the lowest if `ascending`,
+        merged from the top `count` of every shard, see `StockMarket.top_stocks`.
+        """
+        metric = ScreenMetric(metric)
+        if now is None:
+            now = self.clock.now()
+        answers = self._broadcast("top_stocks", metric, count, ascending, now)
+        rows = [row for shard_rows in answers for row in shard_rows]
+        rows.sort(key=lambda row: getattr(row, metric.value), reverse=not ascending)
+        return rows[:count]
+
+    def screen_stocks(self, criteria: Mapping[ScreenMetric, Tuple[Optional[float],
+                                                                  Optional[float]]],
+                      now: Optional[datetime] = None) -> List[ScreenRow]:
+        """
+        Return the stocks whose metrics all fall in the given ranges from every shard,
+        ordered by the first metric, see `StockMarket.screen_stocks`.
+        """
+        criteria = {ScreenMetric(metric): bounds for metric, bounds in criteria.items()}
+        if not criteria:
+            raise ValueError("Screen by at least one metric")
+        if now is None:
+            now = self.clock.now()
+        first = next(iter(criteria)).value
+        answers = self._broadcast("screen_stocks", criteria, now)
+        rows = [row for shard_rows in answers for row in shard_rows]
+        rows.sort(key=lambda row: getattr(row, first))
+        return rows
+
+    def set_reference_prices(self, prices: Optional[Mapping[str, float]] = None,
+                             now: Optional[datetime] = None) -> None:
+        """
+        Set the prices the VWSP change is measured from on the shards of their stocks,
+        every stock's VWSP by default, see `StockMarket.set_reference_prices`.
+        """
+        if now is None:
+            now = self.clock.now()
+        if prices is None:
+            self._broadcast("set_reference_prices", None, now)
+            return
+        missing = [symbol for symbol in prices if symbol not in self._symbols]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        shard_prices: Dict[int, Dict[str, float]] = {}
+        for symbol, price in prices.items():
+            shard_prices.setdefault(self._symbols[symbol], {})[symbol] = price
+        for shard_id, subset in shard_prices.items():
+            with self._shards[shard_id].lock:
+                self._shards[shard_id].request("set_reference_prices", subset, now)
+
+    def trade_counts(self) -> Dict[str, int]:
+        """Return the number of trades recorded for every stock, once the shards caught up."""
+
+        counts: Dict[str, int] = {}
+        for shard_counts in self._broadcast("trade_counts"):
+            counts.update(shard_counts)
+        return counts
+
+    def _broadcast(self, command: str, *args: Any) -> List[Any]:
+        """
+        Send a command to every shard, then gather the answers in shard order.
+
+        Every shard's answer is read before the first error is raised, so no answer is
+        left for the next command to read.
+        """
+
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            for shard in self._shards:
+                shard.connection.send((command, *args))
+            answers, error = [], None
+            for shard in self._shards:
+                try:
+                    answers.append(shard.answer(command))
+                except RuntimeError as failure:
+                    error = error or failure
+            if error is not None:
+                raise error
+            return answers
+        finally:
+            for shard in self._shards:
+                shard.lock.release()
+
+    def close(self) -> None:
+        """Stop the shard workers once they recorded every trade sent, and free the rings."""
+
+        for shard in self._shards:
+            try:
+                if shard.process.is_alive():
+                    shard.request("stop")
+            except (RuntimeError, OSError):
+                pass
+            shard.process.join(timeout=5)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.connection.close()
+            shard.ring.close()
+        self._shards = []
@@ -0,0 +1,126 @@
+import csv
+import json
+from pathlib import Path
+from typing import Annotated, Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, \
+    Optional, Union
+
+import numpy as np
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+from src.models.stock import Stock
+from src.models.stock_type import StockType
+
+# Columns of a stock definition file, fixed_dividend is optional
+STOCK_COLUMNS = ("symbol", "type", "last_dividend", "fixed_dividend", "par_value")
+_REQUIRED_COLUMNS = ("symbol", "type", "last_dividend", "par_value")
+
+_FIELDS = Stock.model_fields
+
+
+class StockDefinition(TypedDict):
+    """
+    Reference data of a stock, with the constraints of the `Stock` fields
+    """
+
+    symbol: Annotated[str, _FIELDS["symbol"]]
+    type: Annotated[StockType, _FIELDS["type"]]
+    last_dividend: Annotated[float, _FIELDS["last_dividend"]]
+    fixed_dividend: Annotated[Optional[float], _FIELDS["fixed_dividend"]]
+    par_value: Annotated[float, _FIELDS["par_value"]]
+
+
+# Validates a whole list of definitions in one call, without building any model
+_DEFINITIONS = TypeAdapter(List[StockDefinition])
+
+
+class MarketDefinition(NamedTuple):
+    """
+    Stocks of a definition file, not validated yet, and the market settings it holds
+    """
+
+    stocks: List[Mapping[str, Any]]
+    settings: Dict[str, Any]
+
+
+def validate_stock_definitions(rows: Iterable[Mapping[str, Any]]) -> List[StockDefinition]:
+    """
+    Validate stock definitions in one pass, converting their values to the field types.
+
+    Raises a pydantic ValidationError, which is a ValueError, listing every invalid row
+    by its position.
+    """
+
+    return _DEFINITIONS.validate_python(rows if isinstance(rows, list) else list(rows))
+
+
+def iter_stocks(definitions: Iterable[StockDefinition]) -> Iterator[Stock]:
+    """
+    Build the stocks of validated definitions, one at a time as they are consumed, e.g.
+    by `StockMarket.add_stocks`, without validating them again.
+    """
+
+    return map(Stock.from_validated, definitions)
+
+
+def read_market_definition(source: Union[str, Path]) -> MarketDefinition:
+    """
+    Read the stock definitions of a file, by its extension:
+
+    - `.csv` with a header of `STOCK_COLUMNS`, fixed_dividend may be empty or left out.
+    - `.npz` (`numpy.savez`) with an array per column, fixed_dividend is NaN where unset.
+    - `.json` with a list of stocks, or a market with its settings and a `stocks` list
+      or mapping of symbol to stock.
+    """
+
+    path = Path(source)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return MarketDefinition(_read_csv(path), {})
+    if suffix == ".npz":
+        return MarketDefinition(_read_columns(path), {})
+    if suffix == ".json":
+        return _read_json(path)
+    raise ValueError(f"{path} is not a CSV, NPZ or JSON stock definition file")
+
+
+def _check_columns(path: Path, columns: Iterable[str]) -> None:
+    """Raise a ValueError when required stock columns are missing."""
+
+    missing = [column for column in _REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+
+
+def _read_csv(path: Path) -> List[Mapping[str, Any]]:
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        _check_columns(path, reader.fieldnames or ())
+        # Empty cells take the field's default
+        return [{column: value for column, value in row.items() if value}
+                for row in reader]
+
+
+def _read_columns(path: Path) -> List[Mapping[str, Any]]:
+    with np.load(path, allow_pickle=False) as columns:
+        _check_columns(path, columns.files)
+        names = [column for column in STOCK_COLUMNS if column in columns.files]
+        values = [columns[column].tolist() for column in names]
+    if "fixed_dividend" in names:
+        fixed = values[names.index("fixed_dividend")]
+        values[names.index("fixed_dividend")] = [None if value != value else value
+                                                 for value in fixed]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def _read_json(path: Path) -> MarketDefinition:
+    with open(path) as file:
+        definition = json.load(file)
+    if isinstance(definition, list):
+        return MarketDefinition(definition, {})
+    if not isinstance(definition, dict):
+        raise ValueError(f"{path} is not a market definition")
+    stocks = definition.pop("stocks", None) or []
+    if isinstance(stocks, dict):
+        stocks = list(stocks.values())
+    return MarketDefinition(stocks, definition)
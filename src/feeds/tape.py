@@ -0,0 +1,281 @@
+import csv
+import mmap
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, \
+    Union
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from src.models.stock_market import StockMarket
+from src.models.trade_batch import TradeReject
+from src.models.trade_side import TradeSide
+from src.models.trade_store import SIDE_FLAGS, from_epoch_ns, to_epoch_ns
+
+# Columns of a CSV trade tape, in file order
+CSV_TAPE_COLUMNS = ("timestamp", "symbol", "quantity", "trade_price", "side")
+
+# Binary trade tapes start with this header, followed by fixed-width records
+BINARY_TAPE_MAGIC = b"SSSMTAP1"
+BINARY_TAPE_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("quantity", "<i8"),
+    ("trade_price", "<f8"),
+    ("symbol", "S8"),
+    ("side", "u1"),
+    ("padding", "V7"),
+])
+
+DEFAULT_BATCH_SIZE = 10_000
+
+# Side names indexed by side flag, used to decode binary records
+_SIDE_NAMES = np.array([side.value for side, _ in sorted(SIDE_FLAGS.items(),
+                                                         key=lambda item: item[1])],
+                       dtype=object)
+
+TapeRecord = Tuple[Union[datetime, int], str, int, float, Union[TradeSide, str]]
+TapeBatch = Dict[str, np.ndarray]
+
+
+class ReplayResult(BaseModel):
+    """
+    Outcome of replaying a trade tape into a market
+    """
+
+    accepted: int = Field(default=0, description="Number of trades recorded")
+    rejected: List[TradeReject] = Field(default_factory=list,
+                                        description="Tape rows that were not recorded")
+    first_timestamp_ns: Optional[int] = Field(default=None,
+                                              description="Time of the first replayed trade")
+    last_timestamp_ns: Optional[int] = Field(default=None,
+                                             description="Time of the last replayed trade")
+
+
+def _timestamp_ns(timestamp: Union[datetime, int]) -> int:
+    """Return a tape timestamp as epoch nanoseconds."""
+
+    return timestamp if isinstance(timestamp, int) else to_epoch_ns(timestamp)
+
+
+def write_csv_tape(path: Union[str, Path], records: Iterable[TapeRecord]) -> int:
+    """
+    Write trades to a CSV tape, timestamps as epoch nanoseconds.
+
+    Returns the number of records written.
+    """
+
+    count = 0
+    with open(path, "w", newline="") as tape:
+        writer = csv.writer(tape)
+        writer.writerow(CSV_TAPE_COLUMNS)
+        for timestamp, symbol, quantity, trade_price, side in records:
+            writer.writerow((_timestamp_ns(timestamp), symbol, quantity, repr(float(trade_price)),
+                             TradeSide(side).value))
+            count += 1
+    return count
+
+
+def write_binary_tape(path: Union[str, Path], records: Iterable[TapeRecord],
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Write trades to a binary tape of fixed-width records.
+
+    Returns the number of records written.
+    """
+
+    count = 0
+    records = iter(records)
+    with open(path, "wb") as tape:
+        tape.write(BINARY_TAPE_MAGIC)
+        while chunk := list(islice(records, batch_size)):
+            block = np.zeros(len(chunk), dtype=BINARY_TAPE_DTYPE)
+            for row, (timestamp, symbol, quantity, trade_price, side) in enumerate(chunk):
+                block[row] = (_timestamp_ns(timestamp), quantity, trade_price,
+                              symbol.encode("ascii"), SIDE_FLAGS[TradeSide(side)], b"")
+            tape.write(block.tobytes())
+            count += len(chunk)
+    return count
+
+
+def read_csv_tape(path: Union[str, Path, TextIO],
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[TapeBatch]:
+    """
+    Stream a CSV tape, given as a path or an open text stream, as batches of at most
+    `batch_size` trades.
+
+    Batches are mappings of column name to values, ready for
+    `StockMarket.record_trades`. Timestamps are epoch nanoseconds or ISO 8601 strings.
+    The timestamp column may be left out, the trades are then stamped when recorded.
+    """
+
+    if not isinstance(path, (str, Path)):
+        yield from _read_csv_stream(path, batch_size)
+        return
+    with open(path, newline="") as tape:
+        yield from _read_csv_stream(tape, batch_size)
+
+
+def _read_csv_stream(tape: TextIO, batch_size: int) -> Iterator[TapeBatch]:
+    reader = csv.reader(tape)
+    header = next(reader, None)
+    if header is None:
+        return
+    width = len(header)
+    missing = [name for name in CSV_TAPE_COLUMNS if name not in header and name != "timestamp"]
+    if missing:
+        raise ValueError(f"Tape is missing the {', '.join(missing)} column(s)")
+    names = [name for name in CSV_TAPE_COLUMNS if name in header]
+    positions = [header.index(name) for name in names]
+    row_offset = 0
+    while rows := list(islice(reader, batch_size)):
+        padded = [row + [""] * (width - len(row)) if len(row) < width else row
+                  for row in rows]
+        columns = list(zip(*padded))
+        batch = {name: np.asarray(columns[position])
+                 for name, position in zip(names, positions)}
+        if "timestamp" in batch:
+            batch["timestamp"] = _parse_timestamps(batch["timestamp"], row_offset)
+        yield batch
+        row_offset += len(rows)
+
+
+def _parse_timestamps(values: np.ndarray, row_offset: int) -> np.ndarray:
+    """Convert CSV timestamps, epoch nanoseconds or ISO 8601 strings, to epoch ns."""
+
+    try:
+        return values.astype(np.int64)
+    except (ValueError, OverflowError):
+        pass
+    timestamps = np.empty(len(values), dtype=np.int64)
+    for row, value in enumerate(values):
+        try:
+            timestamps[row] = int(value) if value.isdigit() \
+                else to_epoch_ns(datetime.fromisoformat(value))
+        except ValueError:
+            raise ValueError(f"Invalid timestamp {value!r} on tape row "
+                             f"{row_offset + row}") from None
+    return timestamps
+
+
+def read_binary_tape(path: Union[str, Path],
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[TapeBatch]:
+    """
+    Stream a binary tape as batches of at most `batch_size` trades.
+
+    The file is memory mapped and read in slices, so only the pages of the current
+    batch need to be resident.
+    """
+
+    with open(path, "rb") as tape:
+        if tape.read(len(BINARY_TAPE_MAGIC)) != BINARY_TAPE_MAGIC:
+            raise ValueError(f"{path} is not a binary trade tape")
+        size = tape.seek(0, 2)
+        if size == len(BINARY_TAPE_MAGIC):
+            return
+        with mmap.mmap(tape.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            count = (size - len(BINARY_TAPE_MAGIC)) // BINARY_TAPE_DTYPE.itemsize
+            records = np.frombuffer(mapped, dtype=BINARY_TAPE_DTYPE, count=count,
+                                    offset=len(BINARY_TAPE_MAGIC))
+            block = None
+            try:
+                for offset in range(0, count, batch_size):
+                    block = records[offset:offset + batch_size]
+                    sides = block["side"]
+                    known = sides < len(_SIDE_NAMES)
+                    side_names = np.full(len(block), None, dtype=object)
+                    side_names[known] = _SIDE_NAMES[sides[known]]
+                    yield {
+                        "timestamp": block["timestamp"].copy(),
+                        "symbol": np.char.decode(block["symbol"], "ascii").astype(object),
+                        "quantity": block["quantity"].copy(),
+                        "trade_price": block["trade_price"].copy(),
+                        "side": side_names,
+                    }
+            finally:
+                # Views of the map have to be released before it can be closed
+                records = block = sides = None
+
+
+def read_tape(path: Union[str, Path], batch_size: int = DEFAULT_BATCH_SIZE) \
+        -> Iterator[TapeBatch]:
+    """Stream a tape as batches, binary tapes are detected by their header."""
+
+    with open(path, "rb") as tape:
+        is_binary = tape.read(len(BINARY_TAPE_MAGIC)) == BINARY_TAPE_MAGIC
+    if is_binary:
+        return read_binary_tape(path, batch_size)
+    return read_csv_tape(path, batch_size)
+
+
+def replay_tape(market: StockMarket, batches: Iterable[TapeBatch],
+                speed: Optional[float] = None,
+                sleep: Callable[[float], None] = time.sleep,
+                clock: Callable[[], float] = time.monotonic) -> ReplayResult:
+    """
+    Replay tape batches into the market, keeping the recorded trade timestamps.
+
+    With `speed` None the tape is replayed as fast as possible. Otherwise trades are
+    released at `speed` times the pace they were recorded at, e.g. 10 replays an hour
+    of tape in 6 minutes. If the market has a retention policy it is enforced after
+    every batch, as of the last trade replayed. Batches without timestamps are recorded
+    at the market's current time, and can only be replayed as fast as possible.
+    """
+
+    if speed is not None and speed <= 0:
+        raise ValueError("Replay speed must be positive")
+
+    result = ReplayResult()
+    tape_start_ns: Optional[int] = None
+    wall_start = clock()
+    row_offset = 0
+    for batch in batches:
+        size = len(batch["symbol"])
+        stamped = "timestamp" in batch
+        chunks: Iterable[Tuple[int, int]] = [(0, size)]
+        if speed is not None:
+            if not stamped:
+                raise ValueError("Paced replays need trade timestamps")
+            timestamps = np.maximum.accumulate(batch["timestamp"])
+            if tape_start_ns is None and size:
+                tape_start_ns = int(timestamps[0])
+            due = wall_start + (timestamps - tape_start_ns) / 1e9 / speed
+            chunks = _paced_chunks(due, sleep, clock)
+
+        for start, end in chunks:
+            outcome = market.record_trades({name: column[start:end]
+                                            for name, column in batch.items()})
+            result.accepted += outcome.accepted
+            result.rejected.extend(
+                TradeReject(row=row_offset + start + reject.row, reason=reject.reason)
+                for reject in outcome.rejected)
+
+        if size and stamped:
+            if result.first_timestamp_ns is None:
+                result.first_timestamp_ns = int(batch["timestamp"][0])
+            result.last_timestamp_ns = int(batch["timestamp"][-1])
+            if market.retention is not None:
+                market.enforce_retention(from_epoch_ns(result.last_timestamp_ns))
+        row_offset += size
+    return result
+
+
+def _paced_chunks(due: np.ndarray, sleep: Callable[[float], None],
+                  clock: Callable[[], float]) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) row ranges of a batch as they fall due, sleeping in between.
+
+    `due` holds the non-decreasing wall clock time each row is due at.
+    """
+
+    start = 0
+    while start < len(due):
+        now = clock()
+        end = int(np.searchsorted(due, now, side="right"))
+        if end <= start:
+            sleep(due[start] - now)
+            continue
+        yield start, end
+        start = end
@@ -0,0 +1,227 @@
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Deque, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from src.models.trade_store import from_epoch_ns
+
+# Bar intervals dashboards commonly track, see StockMarket.bar_intervals
+DEFAULT_BAR_INTERVALS = (timedelta(seconds=1), timedelta(minutes=1), timedelta(minutes=5))
+DEFAULT_BAR_CAPACITY = 720
+
+
+class Bar(BaseModel):
+    """
+    Bar class holding the OHLCV summary of the trades of one time interval.
+    """
+
+    start_ns: int = Field(description="Start of the interval, in epoch nanoseconds")
+    duration_ns: int = Field(gt=0, description="Length of the interval, in nanoseconds")
+    open: float = Field(description="Price of the first trade")
+    high: float = Field(description="Highest trade price")
+    low: float = Field(description="Lowest trade price")
+    close: float = Field(description="Price of the last trade")
+    volume: int = Field(default=0, description="Total quantity traded")
+    notional: float = Field(default=0.0, description="Sum of trade_price * quantity")
+    buy_volume: int = Field(default=0, description="Quantity traded on BUY trades")
+    sell_volume: int = Field(default=0, description="Quantity traded on SELL trades")
+    trade_count: int = Field(default=0, description="Number of trades")
+
+    @property
+    def start(self) -> datetime:
+        """Start of the interval."""
+
+        return from_epoch_ns(self.start_ns)
+
+    @property
+    def vwap(self) -> Optional[float]:
+        """Volume weighted average price of the interval, None if no volume traded."""
+
+        if self.volume == 0:
+            return None
+        return self.notional / self.volume
+
+    def merge(self, other: "Bar") -> None:
+        """Fold a later bar of the same interval into this one."""
+
+        self.high = max(self.high, other.high)
+        self.low = min(self.low, other.low)
+        self.close = other.close
+        self.volume += other.volume
+        self.notional += other.notional
+        self.buy_volume += other.buy_volume
+        self.sell_volume += other.sell_volume
+        self.trade_count += other.trade_count
+
+
+def aggregate_bars(timestamps: np.ndarray, quantities: np.ndarray, trade_prices: np.ndarray,
+                   sides: np.ndarray, duration_ns: int) -> List[list]:
+    """
+    Aggregate time-ordered trade columns into bars of `duration_ns` in one NumPy pass.
+
+    Returns one row per bar, laid out as the bars of a `BarSeries`. `sides` holds the
+    trade store side flags (0 for BUY, 1 for SELL).
+    """
+
+    if not len(timestamps):
+        return []
+    buckets = timestamps // duration_ns
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+    quantities = quantities.astype(np.int64, copy=False)
+    sell_quantities = np.where(sides == 1, quantities, 0)
+
+    volumes = np.add.reduceat(quantities, starts)
+    sell_volumes = np.add.reduceat(sell_quantities, starts)
+    return [list(row) for row in zip(
+        (buckets[starts] * duration_ns).tolist(),
+        trade_prices[starts].tolist(),
+        np.maximum.reduceat(trade_prices, starts).tolist(),
+        np.minimum.reduceat(trade_prices, starts).tolist(),
+        trade_prices[ends].tolist(),
+        volumes.tolist(),
+        np.add.reduceat(trade_prices * quantities, starts).tolist(),
+        (volumes - sell_volumes).tolist(),
+        sell_volumes.tolist(),
+        (ends - starts + 1).tolist(),
+        timestamps[starts].tolist(),
+        timestamps[ends].tolist(),
+    )]
+
+
+def build_bars(timestamps: np.ndarray, quantities: np.ndarray, trade_prices: np.ndarray,
+               sides: np.ndarray, duration_ns: int) -> List[Bar]:
+    """
+    Aggregate time-ordered trade columns into bars of `duration_ns` in one NumPy pass.
+
+    `sides` holds the trade store side flags (0 for BUY, 1 for SELL).
+    """
+
+    return [_to_bar(row, duration_ns)
+            for row in aggregate_bars(timestamps, quantities, trade_prices, sides, duration_ns)]
+
+
+def _to_bar(row: list, duration_ns: int) -> Bar:
+    """Build the `Bar` of a bar row, whose values are trusted."""
+
+    return Bar.model_construct(
+        start_ns=row[_START], duration_ns=duration_ns, open=row[_OPEN], high=row[_HIGH],
+        low=row[_LOW], close=row[_CLOSE], volume=row[_VOLUME], notional=row[_NOTIONAL],
+        buy_volume=row[_BUY_VOLUME], sell_volume=row[_SELL_VOLUME],
+        trade_count=row[_TRADE_COUNT])
+
+
+# Positions of the values in a bar row, a list kept by BarSeries for each bar
+(_START, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _NOTIONAL, _BUY_VOLUME, _SELL_VOLUME,
+ _TRADE_COUNT, _FIRST_NS, _LAST_NS) = range(12)
+
+
+class BarSeries:
+    """
+    Ring buffer of the most recent bars of one interval, updated trade by trade.
+
+    Bars are kept as plain lists and only built into `Bar` models when read. Intervals
+    without trades have no bar. A trade older than the oldest bar kept is left out,
+    other late trades update the bar of their interval, keeping the open and close of
+    the earliest and latest trades by timestamp.
+    """
+
+    __slots__ = ("duration_ns", "_bars")
+
+    def __init__(self, duration_ns: int, capacity: int) -> None:
+        if duration_ns <= 0:
+            raise ValueError("Bar interval must be positive")
+        if capacity <= 0:
+            raise ValueError("Bar capacity must be positive")
+        self.duration_ns = duration_ns
+        self._bars: Deque[list] = deque(maxlen=capacity)
+
+    @property
+    def capacity(self) -> int:
+        return self._bars.maxlen
+
+    def __len__(self) -> int:
+        return len(self._bars)
+
+    def add(self, timestamp_ns: int, quantity: int, trade_price: float, side: int) -> None:
+        """Add a trade, given as trade store values, to the bar of its interval."""
+
+        bars = self._bars
+        start_ns = timestamp_ns - timestamp_ns % self.duration_ns
+        if bars:
+            bar = bars[-1]
+            if bar[_START] == start_ns:
+                if trade_price > bar[_HIGH]:
+                    bar[_HIGH] = trade_price
+                elif trade_price < bar[_LOW]:
+                    bar[_LOW] = trade_price
+                if timestamp_ns >= bar[_LAST_NS]:
+                    bar[_CLOSE] = trade_price
+                    bar[_LAST_NS] = timestamp_ns
+                elif timestamp_ns < bar[_FIRST_NS]:
+                    bar[_OPEN] = trade_price
+                    bar[_FIRST_NS] = timestamp_ns
+                bar[_VOLUME] += quantity
+                bar[_NOTIONAL] += trade_price * quantity
+                bar[_SELL_VOLUME if side else _BUY_VOLUME] += quantity
+                bar[_TRADE_COUNT] += 1
+                return
+        self.merge([start_ns, trade_price, trade_price, trade_price, trade_price, quantity,
+                    trade_price * quantity, 0 if side else quantity, quantity if side else 0,
+                    1, timestamp_ns, timestamp_ns])
+
+    def add_columns(self, timestamps: np.ndarray, quantities: np.ndarray,
+                    trade_prices: np.ndarray, sides: np.ndarray) -> None:
+        """Add time-ordered trades given as columns, aggregated in one NumPy pass."""
+
+        for row in aggregate_bars(timestamps, quantities, trade_prices, sides,
+                                  self.duration_ns):
+            self.merge(row)
+
+    def merge(self, row: list) -> None:
+        """Fold a bar row into the bar of the same interval, or insert it in order."""
+
+        bars = self._bars
+        if not bars or row[_START] > bars[-1][_START]:
+            bars.append(row)
+            return
+        position = bisect_left([bar[_START] for bar in bars], row[_START])
+        if position < len(bars) and bars[position][_START] == row[_START]:
+            _fold(bars[position], row)
+        elif len(bars) < bars.maxlen:
+            bars.insert(position, row)
+        elif position > 0:
+            bars.popleft()
+            bars.insert(position - 1, row)
+
+    def latest(self, count: Optional[int] = None) -> List[Bar]:
+        """Return the `count` most recent bars, all of them by default, oldest first."""
+
+        bars = self._bars
+        if count is None or count >= len(bars):
+            rows = list(bars)
+        else:
+            rows = list(islice(bars, len(bars) - count, None)) if count > 0 else []
+        return [_to_bar(row, self.duration_ns) for row in rows]
+
+    def clear(self) -> None:
+        self._bars.clear()
+
+
+def _fold(bar: list, row: list) -> None:
+    """Fold a bar row into a bar row of the same interval."""
+
+    bar[_HIGH] = max(bar[_HIGH], row[_HIGH])
+    bar[_LOW] = min(bar[_LOW], row[_LOW])
+    if row[_FIRST_NS] < bar[_FIRST_NS]:
+        bar[_OPEN] = row[_OPEN]
+        bar[_FIRST_NS] = row[_FIRST_NS]
+    if row[_LAST_NS] >= bar[_LAST_NS]:
+        bar[_CLOSE] = row[_CLOSE]
+        bar[_LAST_NS] = row[_LAST_NS]
+    for field in (_VOLUME, _NOTIONAL, _BUY_VOLUME, _SELL_VOLUME, _TRADE_COUNT):
+        bar[field] += row[field]
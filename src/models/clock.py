@@ -0,0 +1,97 @@
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, tzinfo
+from typing import Union
+
+from src.models.trade_store import DISPLAY_TIMEZONE, from_epoch_ns, to_epoch_ns
+
+
+class Clock(ABC):
+    """
+    Source of the current time of a market, as integer UTC epoch nanoseconds.
+
+    Trades are stamped and queries without an explicit time are answered at `now_ns`;
+    aware datetimes are only built by `now`, for display.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def now_ns(self) -> int:
+        """Return the current time in epoch nanoseconds."""
+
+    def now(self, tz: tzinfo = DISPLAY_TIMEZONE) -> datetime:
+        """Return the current time as an aware datetime in `tz`."""
+
+        return from_epoch_ns(self.now_ns(), tz)
+
+
+class SystemClock(Clock):
+    """
+    Wall clock time read from the monotonic clock, anchored to the system clock once.
+
+    Time never goes backwards when the system clock is adjusted, so trades stamped by
+    the clock keep arriving in order.
+    """
+
+    __slots__ = ("_offset_ns",)
+
+    def __init__(self) -> None:
+        self._offset_ns = time.time_ns() - time.monotonic_ns()
+
+    def now_ns(self) -> int:
+        return time.monotonic_ns() + self._offset_ns
+
+
+class SimulatedClock(Clock):
+    """
+    Clock that only moves when told to, for deterministic tests and replays.
+
+    `sleep` and `monotonic` stand in for `time.sleep` and `time.monotonic`, e.g. for
+    `replay_tape`, so a paced replay runs at once while the clock goes through the
+    tape's times.
+    """
+
+    __slots__ = ("_now_ns",)
+
+    def __init__(self, start: Union[datetime, int]) -> None:
+        self._now_ns = start if isinstance(start, int) else to_epoch_ns(start)
+
+    def now_ns(self) -> int:
+        return self._now_ns
+
+    def set(self, now: Union[datetime, int]) -> None:
+        """Move the clock to a time, which must not be earlier than the current one."""
+
+        now_ns = now if isinstance(now, int) else to_epoch_ns(now)
+        if now_ns < self._now_ns:
+            raise ValueError("Clock cannot go backwards")
+        self._now_ns = now_ns
+
+    def advance(self, delta: Union[timedelta, int]) -> None:
+        """Move the clock forward by a timedelta or a number of nanoseconds."""
+
+        if isinstance(delta, timedelta):
+            delta = delta // timedelta(microseconds=1) * 1000
+        self.set(self._now_ns + delta)
+
+    def sleep(self, seconds: float) -> None:
+        """Move the clock forward by `seconds` instead of waiting."""
+
+        if seconds > 0:
+            self.advance(round(seconds * 1e9))
+
+    def monotonic(self) -> float:
+        """Return the current time in seconds, as `time.monotonic` would."""
+
+        return self._now_ns / 1e9
+
+
+# Clock of markets and stocks not given one, shared so they stamp trades alike
+SYSTEM_CLOCK = SystemClock()
+
+
+def system_clock() -> Clock:
+    """Return the shared system clock."""
+
+    return SYSTEM_CLOCK
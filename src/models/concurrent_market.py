@@ -0,0 +1,283 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field, PrivateAttr
+
+from src.models.bar import Bar
+from src.models.order_flow import OrderFlow
+from src.models.screen import MarketScreen
+from src.models.stock import STOCK_DEFAULT_TIME_LAG_NS, Stock
+from src.models.stock_market import StockMarket, paused_gc
+from src.models.subscription import Subscription, UpdateCallback
+from src.models.trade import Trade
+from src.models.trade_batch import ValidatedTrades
+from src.models.trade_record import TradeRecord
+from src.models.trade_side import TradeSide
+from src.models.trade_store import from_epoch_ns, to_epoch_ns
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LOCK_STRIPES = 64
+
+
+class WindowSnapshot(BaseModel):
+    """
+    Consistent view of a stock's VWSP window, taken while holding the stock's lock
+    """
+
+    symbol: str = Field(description="Stock symbol")
+    timestamp: datetime = Field(description="Time the window was taken at")
+    volume_weighted_stock_price: Optional[float] = Field(
+        default=None, description="VWSP of the trades in the window, None if empty")
+    trades: List[Trade] = Field(default_factory=list,
+                                description="Trades in the window, oldest first")
+
+
+class ConcurrentStockMarket(StockMarket):
+    """
+    Stock market that can be shared between threads.
+
+    Every stock is guarded by one of `lock_stripes` locks, picked by hashing its symbol,
+    so feeds recording trades for different symbols rarely contend. Index updates are
+    serialised by a separate lock and take each stock's lock only while re-pricing it,
+    so computing the index does not stop the feeds.
+
+    Stocks must be read through the market (`volume_weighted_stock_price`,
+    `window_snapshot`) rather than through `Stock` directly, since VWSP queries move the
+    stock's rolling window.
+    """
+
+    lock_stripes: int = Field(default=DEFAULT_LOCK_STRIPES, gt=0,
+                              description="Number of locks the stocks are spread over")
+
+    _stripes: List[threading.Lock] = PrivateAttr(default_factory=list)
+    # Symbols with trades recorded since the last index update, one set per stripe and
+    # guarded by the stripe's lock, so writers never share a set
+    _stripe_changes: List[Set[str]] = PrivateAttr(default_factory=list)
+    _index_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    # Guards the subscriptions, taken before the index lock; reentrant so subscriber
+    # callbacks can subscribe and unsubscribe
+    _subscription_lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+
+    def model_post_init(self, __context) -> None:
+        """Create the lock stripes before watching the initial stocks."""
+
+        self._stripes = [threading.Lock() for _ in range(self.lock_stripes)]
+        self._stripe_changes = [set() for _ in range(self.lock_stripes)]
+        super().model_post_init(__context)
+
+    def lock_for(self, symbol: str) -> threading.Lock:
+        """Return the lock guarding the stock with the given symbol."""
+
+        stripes = self.__pydantic_private__['_stripes']
+        return stripes[hash(symbol) % len(stripes)]
+
+    def _change_listener(self, symbol: str) -> Callable[[str], None]:
+        """Stocks report new trades to the changed-symbol set of their stripe."""
+
+        changes = self.__pydantic_private__['_stripe_changes']
+        return changes[hash(symbol) % len(changes)].add
+
+    def add_stock(self, stock: Stock) -> None:
+        """Add a stock to the market, replacing any stock with the same symbol.
+
+        Waits for any index update in progress, which iterates over the stocks.
+        """
+        with self._index_lock, self.lock_for(stock.symbol):
+            super().add_stock(stock)
+
+    def add_stocks(self, stocks: Iterable[Stock]) -> None:
+        """Add many stocks to the market, holding the index lock once for all of them."""
+
+        with self._index_lock, paused_gc():
+            count = 0
+            for stock in stocks:
+                with self.lock_for(stock.symbol):
+                    StockMarket.add_stock(self, stock)
+                count += 1
+        log.info("Added %d stocks to market", count)
+
+    def record_trade(self, symbol: str, quantity: int, trade_price: float, side: TradeSide,
+                     timestamp: Optional[datetime] = None) -> None:
+        """Record a trade for the given stock symbol, holding only that stock's lock.
+
+        The trade is validated and timestamped before the lock is taken, its lateness
+        checked under it.
+        """
+        stock = self.stocks.get(symbol)
+        if stock is None:
+            raise ValueError("Stock symbol not found")
+
+        timestamp_ns = self._now_ns(timestamp)
+        trade = TradeRecord.validate(timestamp_ns, quantity, trade_price, side)
+        with self.lock_for(symbol):
+            if self.max_lateness is not None:
+                self._check_lateness(stock, timestamp_ns)
+            stock.record_trade(trade)
+        journal = self.__pydantic_private__['_journal']
+        if journal is not None:
+            journal.append(symbol, trade)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Recorded trade for %s: %r", symbol, trade)
+
+    def _record_rows(self, stock: Stock, validated: ValidatedTrades, rows: np.ndarray) \
+            -> np.ndarray:
+        """Append the given rows of a validated batch to the stock, under its lock."""
+
+        with self.lock_for(stock.symbol):
+            return super()._record_rows(stock, validated, rows)
+
+    def volume_weighted_stock_price(self, symbol: str, now: Optional[datetime] = None,
+                                    window: Optional[timedelta] = None) -> Optional[float]:
+        """Calculate the VWSP of the given stock, see `Stock.volume_weighted_stock_price`."""
+
+        stock = self.stocks.get(symbol)
+        if stock is None:
+            raise ValueError("Stock symbol not found")
+        with self.lock_for(symbol):
+            return stock.volume_weighted_stock_price(now, window)
+
+    def _stock_prices(self, stock: Stock, windows: List[timedelta], now: datetime) \
+            -> Dict[timedelta, Optional[float]]:
+        """Return the VWSP of a stock over each window, under the stock's lock."""
+
+        with self.lock_for(stock.symbol):
+            return stock.volume_weighted_stock_prices(windows, now)
+
+    def _stock_order_flow(self, stock: Stock, now_ns: int) -> OrderFlow:
+        """Return the order flow of a stock at `now_ns`, under the stock's lock."""
+
+        with self.lock_for(stock.symbol):
+            return stock._order_flow_ns(now_ns)
+
+    def latest_bars(self, interval: timedelta, count: int = 1,
+                    symbols: Optional[Iterable[str]] = None) -> Dict[str, List[Bar]]:
+        """Return the latest bars of the given stocks, each read under the stock's lock."""
+
+        if symbols is None:
+            symbols = self.get_supported_stocks()
+        missing = [symbol for symbol in symbols if symbol not in self.stocks]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        bars = {}
+        for symbol in symbols:
+            with self.lock_for(symbol):
+                bars[symbol] = self.stocks[symbol].recent_bars(interval, count)
+        return bars
+
+    def window_snapshot(self, symbol: str, now: Optional[datetime] = None) -> WindowSnapshot:
+        """
+        Return the trades in the given stock's VWSP window and their VWSP, both read
+        under the stock's lock so no trade recorded meanwhile is half included.
+        """
+        stock = self.stocks.get(symbol)
+        if stock is None:
+            raise ValueError("Stock symbol not found")
+
+        with self.lock_for(symbol):
+            # Taken under the lock so every trade already recorded is in the past
+            if now is None:
+                now_ns = self.clock.now_ns()
+                now = from_epoch_ns(now_ns)
+            else:
+                now_ns = to_epoch_ns(now)
+            price = stock._volume_weighted_stock_price_ns(now_ns)
+            store = stock.trades
+            trades = store[store.bisect(now_ns - STOCK_DEFAULT_TIME_LAG_NS):]
+        return WindowSnapshot(symbol=symbol, timestamp=now, volume_weighted_stock_price=price,
+                              trades=trades)
+
+    def enforce_retention(self, now: Optional[datetime] = None) -> int:
+        """Evict trades by the retention policy, holding one stock's lock at a time.
+
+        Safe to call from a housekeeping thread while trades are being recorded.
+        """
+        if self.retention is None:
+            return 0
+        if now is None:
+            now = self.clock.now()
+
+        evicted = 0
+        for symbol, stock in list(self.stocks.items()):
+            with self.lock_for(symbol):
+                evicted += stock.evict_trades(self.retention, now)
+        if evicted:
+            log.info("Evicted %d trades by retention policy", evicted)
+        return evicted
+
+    def _index_terms(self, now_ns: int) -> Tuple[float, int]:
+        """Return the terms of the index, see `StockMarket.all_share_index`.
+
+        Concurrent callers are serialised, trades can be recorded meanwhile.
+        """
+        with self._index_lock:
+            return super()._index_terms(now_ns)
+
+    def _query_screen(self, now_ns: int, query: Callable[[MarketScreen], Any],
+                      past: bool = True) -> Any:
+        """Run a query on the screen, see `StockMarket.top_stocks`, under the index lock."""
+
+        with self._index_lock:
+            return super()._query_screen(now_ns, query, past)
+
+    def _stock_price_series(self, stock: Stock, times_ns: np.ndarray) -> np.ndarray:
+        """Return the VWSP of a stock as of each time, under the stock's lock."""
+
+        with self.lock_for(stock.symbol):
+            return stock.volume_weighted_stock_price_series(times_ns)
+
+    def subscribe(self, callback: UpdateCallback, symbols: Iterable[str] = (),
+                  index: bool = False, min_interval: timedelta = timedelta(0)) -> Subscription:
+        """Register for pushed updates, see `StockMarket.subscribe`, under the lock."""
+
+        with self._subscription_lock:
+            return super().subscribe(callback, symbols, index, min_interval)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop publishing updates to a subscription, under the subscription lock."""
+
+        with self._subscription_lock:
+            super().unsubscribe(subscription)
+
+    def publish_updates(self, now: Optional[datetime] = None) -> int:
+        """Push changed values to their subscribers, see `StockMarket.publish_updates`.
+
+        Publishers are serialised, every stock is read under its lock and trades can be
+        recorded meanwhile.
+        """
+        with self._subscription_lock:
+            return super().publish_updates(now)
+
+    def _take_published_changes(self) -> Set[str]:
+        """Swap the changes to publish under the index lock, which updates them."""
+
+        with self._index_lock:
+            return super()._take_published_changes()
+
+    def _stock_price_ns(self, stock: Stock, now_ns: int) -> Optional[float]:
+        """Return the VWSP of a stock at `now_ns`, under the stock's lock."""
+
+        with self.lock_for(stock.symbol):
+            return stock._volume_weighted_stock_price_ns(now_ns)
+
+    def _drain_changed_symbols(self) -> Set[str]:
+        """Collect the changed symbols of every stripe, holding one stripe lock at a time."""
+
+        changed = super()._drain_changed_symbols()
+        for lock, pending in zip(self._stripes, self._stripe_changes):
+            with lock:
+                changed |= pending
+                pending.clear()
+        return changed
+
+    def _price_stock(self, stock: Stock, now_ns: int) -> Tuple[Optional[float], Optional[int]]:
+        """Re-price the stock for the index under its lock."""
+
+        with self.lock_for(stock.symbol):
+            return super()._price_stock(stock, now_ns)
+
+
+ConcurrentStockMarket.model_rebuild()
@@ -0,0 +1,81 @@
+from itertools import compress
+from operator import mul
+from typing import NamedTuple, Optional
+
+
+class OrderFlow(NamedTuple):
+    """
+    Buy and sell split of the trades in a stock's VWSP window.
+
+    A named tuple rather than a model, so a dashboard reading the flow of thousands of
+    symbols only pays for building tuples.
+    """
+
+    buy_volume: int = 0
+    sell_volume: int = 0
+    # Sums of trade_price * quantity per side
+    buy_notional: float = 0.0
+    sell_notional: float = 0.0
+    buy_trade_count: int = 0
+    sell_trade_count: int = 0
+
+    @property
+    def volume(self) -> int:
+        """Total quantity traded."""
+
+        return self.buy_volume + self.sell_volume
+
+    @property
+    def trade_count(self) -> int:
+        """Number of trades."""
+
+        return self.buy_trade_count + self.sell_trade_count
+
+    @property
+    def buy_vwsp(self) -> Optional[float]:
+        """Volume weighted price of the BUY trades, None if there are none."""
+
+        if self.buy_volume == 0:
+            return None
+        return self.buy_notional / self.buy_volume
+
+    @property
+    def sell_vwsp(self) -> Optional[float]:
+        """Volume weighted price of the SELL trades, None if there are none."""
+
+        if self.sell_volume == 0:
+            return None
+        return self.sell_notional / self.sell_volume
+
+    @property
+    def imbalance(self) -> Optional[float]:
+        """
+        Buy/sell volume imbalance, (buy - sell) / (buy + sell): 1 when only buying, -1
+        when only selling. None if nothing traded.
+        """
+
+        volume = self.volume
+        if volume == 0:
+            return None
+        return (self.buy_volume - self.sell_volume) / volume
+
+
+def side_sums(quantities, trade_prices, sides):
+    """
+    Return the notional, quantity and number of the SELL trades among trade columns,
+    `sides` holding the trade store side flags (0 for BUY, 1 for SELL).
+    """
+
+    if not any(sides):
+        return 0.0, 0, 0
+    sold = list(compress(quantities, sides))
+    return float(sum(map(mul, compress(trade_prices, sides), sold))), sum(sold), len(sold)
+
+
+def summarize(quantities, trade_prices, sides) -> OrderFlow:
+    """Return the order flow of trades given as columns."""
+
+    sell_notional, sell_volume, sell_count = side_sums(quantities, trade_prices, sides)
+    return OrderFlow(sum(quantities) - sell_volume, sell_volume,
+                     float(sum(map(mul, trade_prices, quantities))) - sell_notional,
+                     sell_notional, len(quantities) - sell_count, sell_count)
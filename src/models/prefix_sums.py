@@ -0,0 +1,135 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+import numpy as np
+
+from src.models.trade_store import TradeStore
+
+# Most new trades summed in a Python loop rather than with NumPy
+_LOOP_THRESHOLD = 64
+
+
+def _count_before(timestamps: np.ndarray, times_ns: np.ndarray, side: str,
+                  times_sorted: bool) -> np.ndarray:
+    """
+    Return `np.searchsorted(timestamps, times_ns, side)`: the number of trades before,
+    or also at, each time. When there are more sorted times than trades, the trades are
+    placed among the times instead and counted, which is cheaper than a binary search
+    per time.
+    """
+
+    if not times_sorted or len(times_ns) <= len(timestamps):
+        return np.searchsorted(timestamps, times_ns, side=side)
+    # Trade i counts for every time from the first one it is before, or at
+    first = np.searchsorted(times_ns, timestamps, side="right" if side == "left" else "left")
+    return np.cumsum(np.bincount(first, minlength=len(times_ns) + 1)[:len(times_ns)])
+
+
+class TradePrefixSums:
+    """
+    Prefix sums of notional (price * quantity) and quantity over a stock's trade store.
+
+    Entry `i` holds the totals of the `i` oldest trades, so the VWSP of any time window is
+    two binary searches and two subtractions away, however many windows are asked for,
+    and whether the window ends now or at any earlier time. The sums are extended lazily
+    with NumPy when read: appended trades only cost their own sums, a trade inserted out
+    of order makes the sums after it stale.
+    """
+
+    __slots__ = ("store", "valid", "_notional", "_quantity")
+
+    def __init__(self, store: TradeStore) -> None:
+        self.store = store
+        # Number of trades the sums are up to date for
+        self.valid = 0
+        self._notional = array('d', [0.0])
+        self._quantity = array('d', [0.0])
+
+    def invalidate(self, position: int) -> None:
+        """Mark the sums from `position` on as stale, after a trade was inserted there."""
+
+        if position < self.valid:
+            self.valid = position
+
+    def drop_front(self, count: int) -> None:
+        """Forget the sums of the `count` oldest trades, evicted from the store."""
+
+        if count <= 0:
+            return
+        if count > self.valid:
+            self.valid = 0
+            self._notional = array('d', [0.0])
+            self._quantity = array('d', [0.0])
+            return
+        # The remaining entries are still valid differences from the new first one
+        del self._notional[:count]
+        del self._quantity[:count]
+        self.valid -= count
+
+    def sync(self) -> None:
+        """Bring the sums up to date with the store."""
+
+        store, valid = self.store, self.valid
+        end = len(store)
+        if valid == end and len(self._notional) == end + 1:
+            return
+        del self._notional[valid + 1:]
+        del self._quantity[valid + 1:]
+        if end - valid <= _LOOP_THRESHOLD:
+            # A few trades are cheaper to add up one by one than through NumPy
+            notional, quantity = self._notional[valid], self._quantity[valid]
+            prices, quantities = store.prices, store.quantities
+            for position in range(valid, end):
+                notional += prices[position] * quantities[position]
+                quantity += quantities[position]
+                self._notional.append(notional)
+                self._quantity.append(quantity)
+            self.valid = end
+            return
+        quantities = np.frombuffer(store.quantities, dtype=np.int64)[valid:end] \
+            .astype(np.float64)
+        prices = np.frombuffer(store.prices, dtype=np.float64)[valid:end]
+        notional = np.cumsum(prices * quantities)
+        notional += self._notional[valid]
+        quantity = np.cumsum(quantities)
+        quantity += self._quantity[valid]
+        self._notional.frombytes(notional.tobytes())
+        self._quantity.frombytes(quantity.tobytes())
+        self.valid = end
+
+    def volume_weighted_stock_price(self, start_ns: int,
+                                    end_ns: Optional[int] = None) -> Optional[float]:
+        """
+        Return the VWSP of the trades at or after `start_ns`, and at or before `end_ns` if
+        given, None if there are none or their quantities do not sum to a positive total.
+        Call `sync` first.
+        """
+
+        timestamps, end = self.store.timestamps, self.valid
+        start = bisect_left(timestamps, start_ns, 0, end)
+        if end_ns is not None:
+            end = bisect_right(timestamps, end_ns, start, end)
+        quantity = self._quantity[end] - self._quantity[start]
+        if start >= end or quantity <= 0:
+            return None
+        return (self._notional[end] - self._notional[start]) / quantity
+
+    def volume_weighted_stock_prices_at(self, end_ns: np.ndarray, lag_ns: int) -> np.ndarray:
+        """
+        Return the VWSP of the trades in the `lag_ns` long window ending at each time of
+        `end_ns`, both ends included, NaN where there are none. Call `sync` first.
+        """
+
+        end = self.valid
+        timestamps = np.frombuffer(self.store.timestamps, dtype=np.int64)[:end]
+        times_sorted = bool(np.all(end_ns[1:] >= end_ns[:-1]))
+        starts = _count_before(timestamps, end_ns - lag_ns, "left", times_sorted)
+        ends = _count_before(timestamps, end_ns, "right", times_sorted)
+        notional = np.frombuffer(self._notional, dtype=np.float64)
+        quantity = np.frombuffer(self._quantity, dtype=np.float64)
+        quantities = quantity[ends] - quantity[starts]
+        prices = np.full(len(end_ns), np.nan)
+        np.divide(notional[ends] - notional[starts], quantities, out=prices,
+                  where=quantities > 0)
+        return prices
@@ -0,0 +1,37 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+def _positive_prices(prices: ArrayLike) -> np.ndarray:
+    """Return the prices as a float64 array, checking they are all positive."""
+
+    prices = np.asarray(prices, dtype=np.float64)
+    if not np.all(prices > 0):
+        raise ValueError("Price must be positive")
+    return prices
+
+
+def dividend_yields(dividends: ArrayLike, prices: ArrayLike) -> np.ndarray:
+    """
+    Calculate dividend yields (dividend / price) for arrays of dividends and prices.
+
+    The arrays are broadcast against each other, e.g. dividends of shape (stocks, 1)
+    against prices of shape (stocks, scenarios).
+    """
+
+    return np.asarray(dividends, dtype=np.float64) / _positive_prices(prices)
+
+
+def pe_ratios(dividends: ArrayLike, prices: ArrayLike) -> np.ndarray:
+    """
+    Calculate P/E Ratios (price / dividend) for arrays of dividends and prices.
+
+    Ratios for a zero dividend are undefined and returned as NaN; `np.isnan` gives the
+    mask of undefined ratios.
+    """
+
+    prices = _positive_prices(prices)
+    dividends, prices = np.broadcast_arrays(np.asarray(dividends, dtype=np.float64), prices)
+    ratios = np.full(prices.shape, np.nan)
+    np.divide(prices, dividends, out=ratios, where=dividends != 0)
+    return ratios
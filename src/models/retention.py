@@ -0,0 +1,28 @@
+from datetime import timedelta
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+# Length of the bars evicted trades are compacted into
+COMPACTED_BAR_DURATION = timedelta(minutes=1)
+
+
+class RetentionPolicy(BaseModel):
+    """
+    How long a market keeps the trades of each stock.
+
+    Trades older than `max_age`, or beyond the newest `max_trades` of a stock, are
+    evicted. Trades still inside the active VWSP window are always kept, whatever the
+    policy says.
+    """
+
+    max_age: Optional[timedelta] = Field(default=None, gt=timedelta(0),
+                                         description="Keep trades newer than this")
+    max_trades: Optional[int] = Field(default=None, ge=0,
+                                      description="Keep at most this many trades per stock")
+    compact_to_bars: bool = Field(default=True,
+                                  description="Compact evicted trades into per-minute "
+                                              "OHLCV bars instead of dropping them")
+    max_bars: Optional[int] = Field(default=None, gt=0,
+                                    description="Keep at most this many compacted bars per "
+                                                "stock")
@@ -0,0 +1,280 @@
+from bisect import bisect_left, bisect_right
+from enum import Enum
+from itertools import chain, islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Largest number of entries a chunk of a sorted index holds before it is split in two
+_CHUNK_SIZE = 1024
+
+
+class ScreenMetric(str, Enum):
+    """
+    Enum class for the metrics stocks can be ranked and filtered by
+    """
+
+    VWSP = "vwsp"
+    DIVIDEND_YIELD = "dividend_yield"
+    PE_RATIO = "pe_ratio"
+    VWSP_CHANGE = "vwsp_change"
+    WINDOW_VOLUME = "window_volume"
+
+
+class ScreenRow(NamedTuple):
+    """
+    Metrics of a stock, derived from its VWSP window. A metric is None when undefined:
+    no trades in the window, no reference price, or a zero dividend for the P/E ratio.
+    """
+
+    symbol: str
+    vwsp: Optional[float] = None
+    # Dividend yield and P/E ratio at the VWSP
+    dividend_yield: Optional[float] = None
+    pe_ratio: Optional[float] = None
+    # Relative change of the VWSP since the reference price, 0.05 for +5%
+    vwsp_change: Optional[float] = None
+    window_volume: int = 0
+
+
+def screen_row(symbol: str, dividend: Optional[float], price: Optional[float], volume: int,
+               reference: Optional[float]) -> ScreenRow:
+    """
+    Derive the metrics of a stock from its dividend, VWSP, window volume and reference.
+    The dividend yield and P/E ratio are undefined for a stock whose dividend is None.
+    """
+
+    if price is None or price <= 0:
+        return ScreenRow(symbol, None, None, None, None, volume)
+    if dividend is None:
+        return ScreenRow(symbol, price, None, None,
+                         price / reference - 1.0 if reference else None, volume)
+    return ScreenRow(symbol, price, dividend / price,
+                     price / dividend if dividend else None,
+                     price / reference - 1.0 if reference else None, volume)
+
+
+class SortedIndex:
+    """
+    Symbols sorted by a value, kept in chunks of bounded size.
+
+    Adding or removing a symbol is a binary search over floats and a shift of one
+    chunk, rather than of the whole list, and the symbols can be read in order from
+    either end or from any value, so a top-N query only touches the N symbols it
+    returns. Symbols with equal values are in no particular order.
+    """
+
+    __slots__ = ("_values", "_symbols", "_maxes", "_length")
+
+    def __init__(self) -> None:
+        # Values and symbols of every chunk, in parallel lists
+        self._values: List[List[float]] = []
+        self._symbols: List[List[str]] = []
+        # Last value of every chunk
+        self._maxes: List[float] = []
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @classmethod
+    def from_pairs(cls, pairs: List[Tuple[float, str]]) -> "SortedIndex":
+        """Build an index of the given (value, symbol) pairs, sorting them once."""
+
+        index = cls()
+        pairs = sorted(pairs)
+        half = _CHUNK_SIZE // 2
+        for start in range(0, len(pairs), half):
+            values, symbols = zip(*pairs[start:start + half])
+            index._values.append(list(values))
+            index._symbols.append(list(symbols))
+            index._maxes.append(values[-1])
+        index._length = len(pairs)
+        return index
+
+    def add(self, value: float, symbol: str) -> None:
+        """Add a symbol with its value."""
+
+        chunks, maxes = self._values, self._maxes
+        self._length += 1
+        if not chunks:
+            chunks.append([value])
+            self._symbols.append([symbol])
+            maxes.append(value)
+            return
+        position = min(bisect_left(maxes, value), len(chunks) - 1)
+        values, symbols = chunks[position], self._symbols[position]
+        offset = bisect_right(values, value)
+        values.insert(offset, value)
+        symbols.insert(offset, symbol)
+        maxes[position] = values[-1]
+        if len(values) > _CHUNK_SIZE:
+            half = len(values) // 2
+            chunks[position:position + 1] = [values[:half], values[half:]]
+            self._symbols[position:position + 1] = [symbols[:half], symbols[half:]]
+            maxes[position:position + 1] = [values[half - 1], values[-1]]
+
+    def remove(self, value: float, symbol: str) -> None:
+        """Remove a symbol, which must be in the index with the given value."""
+
+        chunks, maxes = self._values, self._maxes
+        position = bisect_left(maxes, value)
+        offset = bisect_left(chunks[position], value)
+        # Look for the symbol among the ones with an equal value
+        while True:
+            symbols = self._symbols[position]
+            try:
+                offset = symbols.index(symbol, offset,
+                                       bisect_right(chunks[position], value, offset))
+                break
+            except ValueError:
+                position, offset = position + 1, 0
+        values = chunks[position]
+        del values[offset]
+        del symbols[offset]
+        self._length -= 1
+        if values:
+            maxes[position] = values[-1]
+        else:
+            del chunks[position]
+            del self._symbols[position]
+            del maxes[position]
+
+    def __iter__(self) -> Iterator[Tuple[float, str]]:
+        """(value, symbol) pairs from the lowest value."""
+
+        return chain.from_iterable(map(zip, self._values, self._symbols))
+
+    def __reversed__(self) -> Iterator[Tuple[float, str]]:
+        """(value, symbol) pairs from the highest value."""
+
+        return chain.from_iterable(zip(reversed(values), reversed(symbols)) for values, symbols
+                                   in zip(reversed(self._values), reversed(self._symbols)))
+
+    def between(self, low: Optional[float], high: Optional[float]) \
+            -> Iterator[Tuple[float, str]]:
+        """
+        (value, symbol) pairs with a value from `low` to `high`, both included and
+        unbounded if None.
+        """
+
+        chunks = self._values
+        position, offset = 0, 0
+        if low is not None:
+            position = bisect_left(self._maxes, low)
+            if position < len(chunks):
+                offset = bisect_left(chunks[position], low)
+        if position == len(chunks):
+            return
+        pairs = chain(islice(zip(chunks[position], self._symbols[position]), offset, None),
+                      chain.from_iterable(map(zip, chunks[position + 1:],
+                                              self._symbols[position + 1:])))
+        for pair in pairs:
+            if high is not None and pair[0] > high:
+                return
+            yield pair
+
+
+# Metrics the screen keeps an index for, with their position in a ScreenRow
+_INDEXED = tuple((metric, ScreenRow._fields.index(metric.value)) for metric in ScreenMetric)
+
+
+class MarketScreen:
+    """
+    Derived metrics of every stock of a market, each indexed by value.
+
+    The market updates a stock's row whenever it re-prices the stock for the index, i.e.
+    when trades are recorded for it or leave its VWSP window, so ranking and filtering
+    stocks reads the indexes without recomputing anything.
+    """
+
+    __slots__ = ("rows", "indexed", "_indexes", "_references", "_dividends")
+
+    def __init__(self, indexed: bool = True) -> None:
+        self.rows: Dict[str, ScreenRow] = {}
+        # Whether the indexes follow the rows; filling many rows before calling
+        # `reindex` is cheaper than indexing them one by one
+        self.indexed = indexed
+        self._indexes: Dict[ScreenMetric, SortedIndex] = \
+            {metric: SortedIndex() for metric in ScreenMetric}
+        # Prices the VWSP change is measured from
+        self._references: Dict[str, float] = {}
+        self._dividends: Dict[str, Optional[float]] = {}
+
+    def update(self, symbol: str, dividend: Optional[float], price: Optional[float],
+               volume: int) -> None:
+        """Set the dividend, None if it cannot be computed, VWSP and window volume of a
+        stock."""
+
+        self._dividends[symbol] = dividend
+        self._set_row(screen_row(symbol, dividend, price, volume,
+                                 self._references.get(symbol)))
+
+    def remove(self, symbol: str) -> None:
+        """Remove a stock from the screen."""
+
+        self._dividends.pop(symbol, None)
+        self._references.pop(symbol, None)
+        row = self.rows.pop(symbol, None)
+        if row is not None and self.indexed:
+            for metric, field in _INDEXED:
+                if row[field] is not None:
+                    self._indexes[metric].remove(row[field], symbol)
+
+    def reference(self, symbol: str) -> Optional[float]:
+        """Return the price the VWSP change of a stock is measured from."""
+
+        return self._references.get(symbol)
+
+    def set_reference(self, symbol: str, price: Optional[float]) -> None:
+        """Set the price the VWSP change of a stock is measured from, None to clear it."""
+
+        if price is None or price <= 0:
+            self._references.pop(symbol, None)
+        else:
+            self._references[symbol] = price
+        row = self.rows.get(symbol)
+        if row is not None:
+            self._set_row(screen_row(symbol, self._dividends[symbol], row.vwsp,
+                                     row.window_volume, self._references.get(symbol)))
+
+    def reindex(self) -> None:
+        """Build the indexes from the rows, after which they follow every update."""
+
+        rows = self.rows.values()
+        self._indexes = {metric: SortedIndex.from_pairs([(row[field], row.symbol)
+                                                         for row in rows
+                                                         if row[field] is not None])
+                         for metric, field in _INDEXED}
+        self.indexed = True
+
+    def _set_row(self, row: ScreenRow) -> None:
+        symbol = row.symbol
+        previous = self.rows.get(symbol)
+        self.rows[symbol] = row
+        if not self.indexed:
+            return
+        for metric, field in _INDEXED:
+            old = None if previous is None else previous[field]
+            new = row[field]
+            if old == new:
+                continue
+            index = self._indexes[metric]
+            if old is not None:
+                index.remove(old, symbol)
+            if new is not None:
+                index.add(new, symbol)
+
+    def top(self, metric: ScreenMetric, count: int, ascending: bool = False) \
+            -> List[ScreenRow]:
+        """Return the rows of the `count` stocks with the highest, or lowest, metric."""
+
+        index = self._indexes[metric]
+        pairs = iter(index) if ascending else reversed(index)
+        rows = self.rows
+        return [rows[symbol] for _, symbol in islice(pairs, count)]
+
+    def select(self, metric: ScreenMetric, low: Optional[float], high: Optional[float]) \
+            -> List[ScreenRow]:
+        """Return the rows with a metric from `low` to `high`, ordered by the metric."""
+
+        rows = self.rows
+        return [rows[symbol] for _, symbol in self._indexes[metric].between(low, high)]
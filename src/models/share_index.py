@@ -0,0 +1,97 @@
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.models.trade_store import to_epoch_ns
+
+# Minimum number of updates between two full re-summations of the log prices
+MIN_RESUM_INTERVAL = 1024
+
+
+class ShareIndex:
+    """
+    Incrementally maintained GBCE All Share Index.
+
+    The index is the geometric mean of the VWSP of every contributing stock. Instead of
+    multiplying all prices on every tick, the natural log of each stock's VWSP is kept
+    together with their running sum, so updating a stock is O(1) and the result never
+    overflows or underflows the way a product of thousands of prices does. The running
+    sum is re-computed from scratch every so often to keep floating point drift bounded.
+    """
+
+    __slots__ = ("_log_prices", "_log_sum", "_updates")
+
+    def __init__(self) -> None:
+        self._log_prices: Dict[str, float] = {}
+        self._log_sum = 0.0
+        self._updates = 0
+
+    def __len__(self) -> int:
+        """Number of stocks contributing to the index."""
+
+        return len(self._log_prices)
+
+    def update(self, symbol: str, price: Optional[float]) -> None:
+        """
+        Set the VWSP a stock contributes to the index.
+
+        A price of None, or a non-positive price, removes the stock from the index.
+        """
+
+        previous = self._log_prices.pop(symbol, None)
+        if previous is not None:
+            self._log_sum -= previous
+        if price is not None and price > 0:
+            log_price = math.log(price)
+            self._log_prices[symbol] = log_price
+            self._log_sum += log_price
+
+        self._updates += 1
+        if self._updates >= max(len(self._log_prices), MIN_RESUM_INTERVAL):
+            self._log_sum = math.fsum(self._log_prices.values())
+            self._updates = 0
+
+    def clear(self) -> None:
+        """Remove every stock from the index."""
+
+        self._log_prices.clear()
+        self._log_sum = 0.0
+        self._updates = 0
+
+    @property
+    def log_sum(self) -> float:
+        """Sum of the log VWSPs of the contributing stocks."""
+
+        return self._log_sum
+
+    def value(self) -> Optional[float]:
+        """Return the index value, None if no stock contributes to it."""
+
+        if not self._log_prices:
+            return None
+        return math.exp(self._log_sum / len(self._log_prices))
+
+
+def series_times(start: datetime, end: datetime, step: timedelta) -> np.ndarray:
+    """Return the times every `step` from `start` to `end`, both included, in epoch ns."""
+
+    if step <= timedelta(0):
+        raise ValueError("Series step must be positive")
+    if end < start:
+        raise ValueError("Series end must not be before its start")
+    step_ns = step // timedelta(microseconds=1) * 1000
+    start_ns = to_epoch_ns(start)
+    return np.arange(start_ns, to_epoch_ns(end) + 1, step_ns, dtype=np.int64)
+
+
+def index_series(log_sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Return the index values, exp(log_sum / count), for arrays of log VWSP sums and
+    their numbers, NaN where no stock contributes.
+    """
+
+    values = np.full(len(log_sums), np.nan)
+    np.divide(log_sums, counts, out=values, where=counts > 0)
+    return np.exp(values, out=values, where=counts > 0)
@@ -1,26 +1,41 @@
 import logging
+from bisect import bisect_right
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Optional
+from functools import cache
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Type, Union
 
-import pytz
-from pydantic import BaseModel, Field
+import numpy as np
+from numpy.typing import ArrayLike
+from pydantic import BaseModel, Field, PrivateAttr
 
+from src.models.bar import Bar, BarSeries, build_bars
+from src.models.clock import Clock, system_clock
+from src.models.order_flow import OrderFlow, summarize
+from src.models.prefix_sums import TradePrefixSums
+from src.models.pricing import dividend_yields, pe_ratios
+from src.models.retention import COMPACTED_BAR_DURATION, RetentionPolicy
 from src.models.stock_type import StockType
 from src.models.trade import Trade
+from src.models.trade_record import TradeRecord
+from src.models.trade_store import TradeStore, to_epoch_ns
+from src.models.trade_window import TradeWindow
 
 log = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 
 # Amount of time to take into consideration when filtering trades for stock price calc
 STOCK_DEFAULT_TIME_LAG = 15
+STOCK_DEFAULT_TIME_LAG_NS = STOCK_DEFAULT_TIME_LAG * 60 * 1_000_000_000
 
 class Stock(BaseModel):
     """
     Stock class holding stock data and related information.
     """
 
-    symbol: str = Field(min_length=1, max_length=5, description="Stock symbol")
+    # Printable ASCII, so a symbol fits the 5 byte fields of journals and trade rings
+    symbol: str = Field(min_length=1, max_length=5, pattern=r"^[!-~]+$",
+                        description="Stock symbol, printable ASCII characters")
     type: StockType = Field(description="Stock type, should be PREFERRED or COMMON")
     last_dividend: float = Field(ge=0, description="Last dividend value, "
                                                    "should always be >= 0")
@@ -28,30 +43,131 @@ class Stock(BaseModel):
                                             description="Fixed dividend value. If "
                                                          "provided, should be >= 0")
     par_value: float = Field(gt=0, description="Par value value")
-    trades: Optional[List[Trade]] = Field(default_factory=list, description="List of trades")
 
+    _trades: TradeStore = PrivateAttr(default_factory=TradeStore)
+    _window: Optional[TradeWindow] = PrivateAttr(default=None)
+    # Built on the first query of a window other than the default one, or of the past
+    _prefix_sums: Optional[TradePrefixSums] = PrivateAttr(default=None)
+    # Callbacks notified with the symbol whenever a trade is recorded
+    _trade_listeners: List[Callable[[str], None]] = PrivateAttr(default_factory=list)
+    # Per-minute bars of trades evicted by a retention policy
+    _bars: Deque[Bar] = PrivateAttr(default_factory=deque)
+    # Recent bars of every tracked interval, keyed by its duration in nanoseconds
+    _bar_series: Dict[int, BarSeries] = PrivateAttr(default_factory=dict)
+    # Time of queries not given one, the market's clock once the stock is added to one
+    _clock: Clock = PrivateAttr(default_factory=system_clock)
 
-    def dividend_yield(self, price: float) -> float:
-        """Calculate dividend yield given a price.
+    def __init__(self, trades: Iterable[Union[Trade, TradeRecord]] = (), **data) -> None:
+        super().__init__(**data)
+        for trade in trades:
+            self.record_trade(trade)
 
-        For Common stocks: last_dividend / price.
-        For Preferred stocks: (fixed_dividend * par_value) / price.
+    @classmethod
+    def from_validated(cls, values: Dict[str, Any]) -> "Stock":
         """
-        if price <= 0:
-            raise ValueError("Price must be positive")
+        Build a stock from field values already validated against the fields, e.g. by
+        `validate_stock_definitions`, without validating them again.
+
+        `model_construct` would still resolve every private attribute's default through
+        pydantic, which costs several times more than building the stock, so the private
+        dict is filled here from the attributes' defaults directly.
+        """
+
+        stock = cls.__new__(cls)
+        object.__setattr__(stock, '__dict__', values)
+        object.__setattr__(stock, '__pydantic_fields_set__', set(values))
+        object.__setattr__(stock, '__pydantic_extra__', None)
+        object.__setattr__(stock, '__pydantic_private__',
+                           {name: default() if factory else default
+                            for name, factory, default in _private_defaults(cls)})
+        return stock
+
+    @property
+    def trades(self) -> TradeStore:
+        """
+        Trades recorded for the stock, ordered by timestamp.
+
+        Trades are kept in a columnar store and `Trade` objects are only built when
+        they are read from it.
+        """
+
+        return self._trades
+
+    @property
+    def bars(self) -> List[Bar]:
+        """Per-minute OHLCV bars of the trades compacted by `evict_trades`, oldest first."""
+
+        return list(self._bars)
+
+    def track_bars(self, interval: timedelta, capacity: int) -> None:
+        """Keep the latest `capacity` bars of `interval`, updated on every recorded trade.
+
+        The bars are first built from the trades already recorded. Tracking an interval
+        again changes how many of its bars are kept.
+        """
+        duration_ns = interval // timedelta(microseconds=1) * 1000
+        self._bar_series[duration_ns] = self._build_bar_series(duration_ns, capacity)
+
+    def _build_bar_series(self, duration_ns: int, capacity: int) -> BarSeries:
+        """Build a bar series from the trades in the store recent enough for it."""
+
+        series = BarSeries(duration_ns, capacity)
+        store = self._trades
+        if len(store):
+            last_ns = store.timestamps[-1]
+            start = store.bisect(last_ns - last_ns % duration_ns - (capacity - 1) * duration_ns)
+            series.add_columns(np.frombuffer(store.timestamps, dtype=np.int64)[start:],
+                               np.frombuffer(store.quantities, dtype=np.int64)[start:],
+                               np.frombuffer(store.prices, dtype=np.float64)[start:],
+                               np.frombuffer(store.sides, dtype=np.int8)[start:])
+        return series
+
+    def _rebuild_bar_series(self) -> None:
+        """Rebuild the tracked bars from the store, after it was replaced."""
+
+        for duration_ns, series in self._bar_series.items():
+            self._bar_series[duration_ns] = self._build_bar_series(duration_ns, series.capacity)
 
-        log.info(f"Calculating dividend yield for stock with Symbol: {self.symbol} ")
+    def recent_bars(self, interval: timedelta, count: Optional[int] = None) -> List[Bar]:
+        """Return the latest `count` bars of a tracked interval, all of them by default.
+
+        Bars come from the ones kept as trades are recorded, the trades are not read.
+        Intervals without trades have no bar.
+        """
+        series = self._bar_series.get(interval // timedelta(microseconds=1) * 1000)
+        if series is None:
+            raise ValueError(f"Bars of {interval} are not tracked")
+        return series.latest(count)
+
+    def dividend(self) -> float:
+        """Return the dividend per share.
+
+        For Common stocks: last_dividend.
+        For Preferred stocks: fixed_dividend * par_value.
+        """
         match self.type:
             case StockType.COMMON:
-                dividend = self.last_dividend / price
+                return self.last_dividend
             case StockType.PREFERRED:
                 if self.fixed_dividend is None:
                     raise ValueError("Fixed dividend is not set for preferred stock")
-                dividend = (self.fixed_dividend * self.par_value) / price
+                return self.fixed_dividend * self.par_value
             case _:
                 raise ValueError("Unknown stock type")
 
-        log.info(f"Calculated dividend yield for stock with Symbol: {self.symbol} = {dividend}")
+    def dividend_yield(self, price: float) -> float:
+        """Calculate dividend yield given a price.
+
+        For Common stocks: last_dividend / price.
+        For Preferred stocks: (fixed_dividend * par_value) / price.
+        """
+        if price <= 0:
+            raise ValueError("Price must be positive")
+
+        dividend = self.dividend() / price
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Calculated dividend yield for stock with Symbol: %s = %s", self.symbol,
+                      dividend)
         return dividend
 
     def pe_ratio(self, price: float) -> Optional[float]:
@@ -60,45 +176,299 @@ class Stock(BaseModel):
         P/E Ratio = Price / Dividend.
         If the dividend is zero then P/E Ratio is undefined (None).
         """
+        if price <= 0:
+            raise ValueError("Price must be positive")
 
-        log.info(f"Calculating P/E Ratio for stock with Symbol: {self.symbol} ")
-        dividend = self.dividend_yield(price) * price
+        dividend = self.dividend()
         if dividend == 0:
             return None
         ratio = price / dividend
-        log.info(f"Calculated P/E Ratio for stock with Symbol: {self.symbol} = {ratio:.2f} ")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Calculated P/E Ratio for stock with Symbol: %s = %.2f", self.symbol,
+                      ratio)
         return ratio
 
-    def record_trade(self, trade: Trade) -> None:
-        """Records a trade for given stock."""
+    def dividend_yields(self, prices: ArrayLike) -> np.ndarray:
+        """Calculate the dividend yield for every price of an array in one pass.
+
+        Same rules as `dividend_yield`, every price must be positive.
+        """
+        return dividend_yields(self.dividend(), prices)
+
+    def pe_ratios(self, prices: ArrayLike) -> np.ndarray:
+        """Calculate the P/E Ratio for every price of an array in one pass.
+
+        Same rules as `pe_ratio`, undefined ratios (zero dividend) are NaN.
+        """
+        return pe_ratios(self.dividend(), prices)
+
+    def record_trade(self, trade: Union[Trade, TradeRecord]) -> None:
+        """Records a trade for given stock.
 
-        self.trades.append(trade)
-        log.info(f"Recorded trade for stock with Symbol: {self.symbol}")
+        Takes either a validated `Trade` or a lightweight `TradeRecord` from a trusted
+        feed.
+        """
+
+        # Private attributes are read from the private dict directly, going through
+        # BaseModel.__getattr__ costs more than the rest of this method
+        private = self.__pydantic_private__
+        store = private['_trades']
+        if isinstance(trade, TradeRecord):
+            position = store.append_record(trade)
+        else:
+            position = store.append(trade)
+        window = private['_window']
+        if window is not None and window.seen == len(store) - 1:
+            window.add(position)
+        prefix_sums = private['_prefix_sums']
+        if prefix_sums is not None:
+            prefix_sums.invalidate(position)
+        if private['_bar_series']:
+            for series in private['_bar_series'].values():
+                series.add(store.timestamps[position], store.quantities[position],
+                           store.prices[position], store.sides[position])
+        for listener in private['_trade_listeners']:
+            listener(self.symbol)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Recorded trade for stock with Symbol: %s", self.symbol)
+
+    def record_trade_columns(self, timestamps, quantities, trade_prices, sides,
+                             trade_ids: bytes) -> None:
+        """
+        Records a batch of already validated trades given as columns.
+
+        Columns are NumPy arrays of int64 epoch nanosecond timestamps, int64 quantities,
+        float64 prices and int8 side flags, sorted by timestamp, with 16 bytes of trade
+        ID per trade.
+        """
+
+        count = len(timestamps)
+        if not count:
+            return
+        store = self._trades
+        window = self._window
+        if window is not None and window.seen != len(store):
+            window = None
+        if store.can_extend(int(timestamps[0])):
+            position = store.extend(timestamps, quantities, trade_prices, sides, trade_ids)
+            if window is not None:
+                window.extend(position, count)
+        else:
+            # Some trades are older than the stored ones, e.g. late trades of another feed
+            position = store.merge(timestamps, quantities, trade_prices, sides, trade_ids)
+            if window is not None:
+                window.insert(timestamps, quantities, trade_prices, sides)
+            if self._prefix_sums is not None:
+                self._prefix_sums.invalidate(position)
+        for series in self._bar_series.values():
+            series.add_columns(timestamps, quantities, trade_prices, sides)
+        for listener in self._trade_listeners:
+            listener(self.symbol)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Recorded %d trades for stock with Symbol: %s", count, self.symbol)
+
+    def evict_trades(self, policy: RetentionPolicy, now: Optional[datetime] = None) -> int:
+        """Evict the trades the retention policy no longer keeps.
+
+        Trades still inside the VWSP window at `now` are never evicted. Evicted trades
+        are compacted into per-minute bars if the policy asks for it. Returns the number
+        of trades evicted.
+        """
+        now_ns = self._now_ns(now)
+
+        store = self._trades
+        count = 0
+        if policy.max_age is not None:
+            count = store.bisect(now_ns - policy.max_age // timedelta(microseconds=1) * 1000)
+        if policy.max_trades is not None:
+            count = max(count, len(store) - policy.max_trades)
+        if not count:
+            return 0
+
+        window = self._sync_window()
+        window.advance(now_ns)
+        count = min(count, window.start)
+        dropped = store.drop_front(count)
+        window.drop_front(count)
+        if self._prefix_sums is not None:
+            self._prefix_sums.drop_front(count)
 
-    def volume_weighted_stock_price(self, now: Optional[datetime] = None) -> Optional[float]:
+        if policy.compact_to_bars and count:
+            bars = self._bars
+            if bars.maxlen != policy.max_bars:
+                bars = self._bars = deque(bars, maxlen=policy.max_bars)
+            new_bars = build_bars(
+                np.frombuffer(dropped.timestamps, dtype=np.int64),
+                np.frombuffer(dropped.quantities, dtype=np.int64),
+                np.frombuffer(dropped.prices, dtype=np.float64),
+                np.frombuffer(dropped.sides, dtype=np.int8),
+                COMPACTED_BAR_DURATION // timedelta(microseconds=1) * 1000)
+            if bars and bars[-1].start_ns == new_bars[0].start_ns:
+                bars[-1].merge(new_bars.pop(0))
+            bars.extend(new_bars)
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Evicted %d trades for stock with Symbol: %s", count, self.symbol)
+        return count
+
+    def volume_weighted_stock_price(self, now: Optional[datetime] = None,
+                                    window: Optional[timedelta] = None) -> Optional[float]:
         """Calculate the volume weighted stock price (VWSP) using trades in the past 15 minutes.
 
         VWSP = (Sum(trade_price * quantity)) / (Sum(quantity))
         Returns None if there are no trades in the 15 mins time window.
+
+        The sums are kept by a rolling window that is updated on every recorded trade,
+        so the cost does not grow with the trade history. Only trades up to `now` count:
+        queries for an earlier `now` than a previous call, or with trades recorded after
+        `now`, are answered from prefix sums over the trade store instead, as of `now`.
+        Trades evicted by a retention policy are not part of such answers.
+
+        Give `window` to use trades in another time window instead, see
+        `volume_weighted_stock_prices`.
+        """
+        if window is None or window == timedelta(minutes=STOCK_DEFAULT_TIME_LAG):
+            return self._volume_weighted_stock_price_ns(self._now_ns(now))
+        return self.volume_weighted_stock_prices([window], now)[window]
+
+    def volume_weighted_stock_prices(self, windows: Iterable[timedelta],
+                                     now: Optional[datetime] = None) \
+            -> Dict[timedelta, Optional[float]]:
+        """Calculate the VWSP over several time windows ending at `now` at once.
+
+        All windows are served from prefix sums of notional and quantity over the trade
+        columns, kept up to date lazily, so each window only costs a binary search
+        for its first trade. Returns the VWSP of each window, None for windows without
+        trades.
+        """
+        windows = list(windows)
+        if any(window <= timedelta(0) for window in windows):
+            raise ValueError("VWSP window must be positive")
+        now_ns = self._now_ns(now)
+
+        prefix_sums = self._synced_prefix_sums()
+        return {window: prefix_sums.volume_weighted_stock_price(
+                    now_ns - window // timedelta(microseconds=1) * 1000, now_ns)
+                for window in windows}
+
+    def volume_weighted_stock_price_series(self, times_ns: ArrayLike,
+                                           window: Optional[timedelta] = None) -> np.ndarray:
+        """Calculate the VWSP as of each of many times at once.
+
+        `times_ns` holds the times as int64 epoch nanoseconds, e.g. one per second of a
+        trading day. Every time is priced over the trades of the 15 minutes, or of
+        `window`, up to and including it, from the same prefix sums as
+        `volume_weighted_stock_prices`. Times without trades are NaN.
         """
+        if window is None:
+            lag_ns = STOCK_DEFAULT_TIME_LAG_NS
+        elif window <= timedelta(0):
+            raise ValueError("VWSP window must be positive")
+        else:
+            lag_ns = window // timedelta(microseconds=1) * 1000
+        times_ns = np.asarray(times_ns, dtype=np.int64)
+        return self._synced_prefix_sums().volume_weighted_stock_prices_at(times_ns, lag_ns)
+
+    def order_flow(self, now: Optional[datetime] = None) -> OrderFlow:
+        """Summarize the buy and sell trades in the past 15 minutes.
+
+        Gives the volume, notional, VWSP and number of trades of each side and the
+        volume imbalance. The rolling VWSP window keeps the SELL side sums as trades are
+        recorded, so this costs the same as `volume_weighted_stock_price`. Queries the
+        window cannot answer, as of an earlier time, are summed from the trade store.
+        """
+        return self._order_flow_ns(self._now_ns(now))
+
+    def _order_flow_ns(self, now_ns: int) -> OrderFlow:
+        """Summarize the trades in the VWSP window at a time given in epoch nanoseconds."""
+
+        window = self._sync_window(now_ns)
+        store = self.__pydantic_private__['_trades']
+        timestamps = store.timestamps
+        if (timestamps and timestamps[-1] > now_ns) or not window.can_answer(now_ns):
+            window.advance(now_ns)
+            start = store.bisect(now_ns - STOCK_DEFAULT_TIME_LAG_NS)
+            end = bisect_right(timestamps, now_ns, start)
+            return summarize(store.quantities[start:end], store.prices[start:end],
+                             store.sides[start:end])
+        return window.order_flow(now_ns)
+
+    def _synced_prefix_sums(self) -> TradePrefixSums:
+        """Return the prefix sums over the trade store, brought up to date."""
+
+        prefix_sums = self._prefix_sums
+        if prefix_sums is None or prefix_sums.store is not self._trades:
+            prefix_sums = self._prefix_sums = TradePrefixSums(self._trades)
+        prefix_sums.sync()
+        return prefix_sums
+
+    def _now_ns(self, now: Optional[datetime]) -> int:
+        """Return `now` in epoch nanoseconds, the time of the stock's clock if None."""
+
         if now is None:
-            now = datetime.now(pytz.timezone('US/Eastern'))
-        time_threshold = now - timedelta(minutes=STOCK_DEFAULT_TIME_LAG)
+            return self.__pydantic_private__['_clock'].now_ns()
+        return to_epoch_ns(now)
 
-        relevant_trades = [t for t in self.trades if t.timestamp >= time_threshold]
-        log.info(f"Determined {len(relevant_trades)} relevant trades for stock "
-                 f"with Symbol: {self.symbol}")
-        if not relevant_trades:
-            return None
+    def _volume_weighted_stock_price_ns(self, now_ns: int) -> Optional[float]:
+        """Calculate the VWSP for a time given in epoch nanoseconds."""
 
-        total_trade_value = sum(t.trade_price * t.quantity for t in relevant_trades)
-        total_quantity = sum(t.quantity for t in relevant_trades)
-        log.info(f"Stock Symbol: {self.symbol}, Total trade value: {total_trade_value}, "
-                 f"Total quantity: {total_quantity}")
-        if total_quantity == 0:
-            return None
-        price: float = total_trade_value / total_quantity
-        log.info(f"Calculated volume weighted stock price for stock with Symbol: "
-                 f"{self.symbol}: {price:.2f}")
+        window = self._sync_window(now_ns)
+        timestamps = self.__pydantic_private__['_trades'].timestamps
+        if timestamps and timestamps[-1] > now_ns:
+            # The rolling window would include the trades after `now_ns`
+            window.advance(now_ns)
+            return self._synced_prefix_sums().volume_weighted_stock_price(
+                now_ns - STOCK_DEFAULT_TIME_LAG_NS, now_ns)
+        if not window.can_answer(now_ns):
+            return self._synced_prefix_sums().volume_weighted_stock_price(
+                now_ns - STOCK_DEFAULT_TIME_LAG_NS)
+
+        price = window.volume_weighted_stock_price(now_ns)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Calculated volume weighted stock price for stock with Symbol: %s "
+                      "from %d relevant trades: %s", self.symbol, len(window), price)
         return price
 
+    def _sync_window(self, now_ns: Optional[int] = None) -> TradeWindow:
+        """
+        Return the rolling trade window, rebuilding it if trades were added to the store
+        without going through `record_trade`. A window rebuilt for `now_ns` only sums
+        the trades inside it.
+        """
+
+        private = self.__pydantic_private__
+        window, store = private['_window'], private['_trades']
+        if window is None or window.seen != len(store):
+            window = private['_window'] = TradeWindow(store, STOCK_DEFAULT_TIME_LAG_NS, now_ns)
+        return window
+
+    def _next_change_ns(self, now_ns: int) -> Optional[int]:
+        """
+        Return the first time after `now_ns`, in epoch nanoseconds, at which the VWSP
+        changes by itself: when the oldest trade in the window expires, or when the
+        first trade recorded after `now_ns` becomes part of the window. None if neither
+        happens.
+        """
+
+        # Taken from the store rather than the rolling window, which other queries may
+        # have moved past `now_ns`
+        store = self.__pydantic_private__['_trades']
+        timestamps = store.timestamps
+        change_ns = None
+        oldest = store.bisect(now_ns - STOCK_DEFAULT_TIME_LAG_NS)
+        if oldest < len(timestamps) and timestamps[oldest] <= now_ns:
+            change_ns = timestamps[oldest] + STOCK_DEFAULT_TIME_LAG_NS + 1
+        if timestamps and timestamps[-1] > now_ns:
+            next_trade_ns = timestamps[bisect_right(timestamps, now_ns)]
+            if change_ns is None or next_trade_ns < change_ns:
+                change_ns = next_trade_ns
+        return change_ns
+
+
+@cache
+def _private_defaults(cls: Type[Stock]) -> List[Tuple[str, bool, Any]]:
+    """(name, is factory, default or factory) of every private attribute of a stock class."""
+
+    return [(name, attribute.default_factory is not None,
+             attribute.default_factory or attribute.default)
+            for name, attribute in cls.__private_attributes__.items()]
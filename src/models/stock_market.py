@@ -1,17 +1,35 @@
+import gc
+import heapq
 import logging
 import math
-from datetime import datetime
-from typing import Optional, Dict, List
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Mapping, Optional, Dict, List, Set, \
+    Tuple
 
-import pytz
-from pydantic import BaseModel, Field
+import numpy as np
+from numpy.typing import ArrayLike
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
+from src.models.bar import Bar, DEFAULT_BAR_CAPACITY
+from src.models.clock import Clock, system_clock
+from src.models.order_flow import OrderFlow
+from src.models.pricing import dividend_yields, pe_ratios
+from src.models.retention import RetentionPolicy
+from src.models.screen import MarketScreen, ScreenMetric, ScreenRow
+from src.models.share_index import ShareIndex, index_series, series_times
 from src.models.trade_side import TradeSide
 from src.models.stock import Stock
-from src.models.trade import Trade
+from src.models.subscription import MarketUpdate, Subscription, UpdateCallback
+from src.models.trade_record import TradeRecord
+from src.models.trade_batch import TradeBatch, TradeBatchResult, TradeReject, \
+    ValidatedTrades, new_trade_ids, to_columns, validate_trades
+from src.models.trade_store import to_epoch_ns
+
+if TYPE_CHECKING:
+    from src.persistence.journal import TradeJournal
 
 log = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 
 class StockMarket(BaseModel):
@@ -19,16 +37,91 @@ class StockMarket(BaseModel):
     Class representing the model stock market and related functionality
     """
 
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     stocks: Optional[Dict[str, Stock]] = Field(default_factory=dict)
+    retention: Optional[RetentionPolicy] = Field(default=None,
+                                                 description="How long trades are kept, "
+                                                             "forever if not set")
+    bar_intervals: List[timedelta] = Field(default_factory=list,
+                                           description="Intervals of the bars kept for "
+                                                       "every stock")
+    bar_capacity: int = Field(default=DEFAULT_BAR_CAPACITY, gt=0,
+                              description="Number of bars kept per stock and interval")
+    max_lateness: Optional[timedelta] = Field(default=None,
+                                              description="How far behind the latest trade "
+                                                          "of a stock a trade is still "
+                                                          "recorded, any lateness if not set")
+    clock: Clock = Field(default_factory=system_clock, exclude=True,
+                         description="Source of the time trades are stamped with and "
+                                     "queries without a time are answered at")
+
+    _index: ShareIndex = PrivateAttr(default_factory=ShareIndex)
+    # Symbols with trades recorded since the index was last updated
+    _changed_symbols: Set[str] = PrivateAttr(default_factory=set)
+    # Heap of (time in epoch ns, symbol) at which each stock's VWSP next changes by itself,
+    # when the oldest trade in its window expires or a later trade enters it
+    _expiries: List[Tuple[int, str]] = PrivateAttr(default_factory=list)
+    _scheduled_expiries: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _index_time_ns: Optional[int] = PrivateAttr(default=None)
+    _subscriptions: List[Subscription] = PrivateAttr(default_factory=list)
+    _symbol_subscriptions: Dict[str, List[Subscription]] = PrivateAttr(default_factory=dict)
+    # Symbols whose VWSP changed since updates were last published to subscribers
+    _published_changes: Set[str] = PrivateAttr(default_factory=set)
+    _journal: Optional["TradeJournal"] = PrivateAttr(default=None)
+    # Number of trades dropped for being later than `max_lateness`, per symbol
+    _late_trades: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # Metrics of every stock for ranking and filtering, kept up to date with the index
+    # once first asked for
+    _screen: Optional[MarketScreen] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context) -> None:
+        """Start tracking trades for the stocks the market was created with."""
+
+        for stock in (self.stocks or {}).values():
+            self._watch_stock(stock)
 
 
     def add_stock(self, stock: Stock) -> None:
         """Add a stock to the market."""
         if self.stocks is None:
             self.stocks = {}
+        previous = self.stocks.get(stock.symbol)
+        listener = self._change_listener(stock.symbol)
+        if previous is not None and previous is not stock \
+                and listener in previous._trade_listeners:
+            previous._trade_listeners.remove(listener)
         self.stocks[stock.symbol] = stock
-        log.info(f"Added stock {stock.symbol} to market. Stock details: {stock}")
+        self._watch_stock(stock)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Added stock %s to market. Stock details: %r", stock.symbol, stock)
+
+    def add_stocks(self, stocks: Iterable[Stock]) -> None:
+        """Add many stocks to the market, e.g. a universe built by `build_stocks`."""
+
+        count = 0
+        with paused_gc():
+            for stock in stocks:
+                self.add_stock(stock)
+                count += 1
+        log.info("Added %d stocks to market", count)
+
+    def _watch_stock(self, stock: Stock) -> None:
+        """Track trades recorded for the stock so the index can be updated for them."""
+
+        listener = self._change_listener(stock.symbol)
+        private = stock.__pydantic_private__
+        if listener not in private['_trade_listeners']:
+            private['_trade_listeners'].append(listener)
+        private['_clock'] = self.clock
+        for interval in self.bar_intervals:
+            stock.track_bars(interval, self.bar_capacity)
+        self.__pydantic_private__['_changed_symbols'].add(stock.symbol)
 
+    def _change_listener(self, symbol: str) -> Callable[[str], None]:
+        """Return the callback the stock with the given symbol notifies of new trades."""
+
+        return self.__pydantic_private__['_changed_symbols'].add
 
     def get_supported_stocks(self) -> List[str]:
         """
@@ -37,35 +130,639 @@ class StockMarket(BaseModel):
 
         return list(self.stocks.keys())
 
-    def record_trade(self, symbol: str, quantity: int, trade_price: float, side: TradeSide) \
-            -> None:
-        """Record a trade for the given stock symbol."""
-        if symbol not in self.stocks:
+    def _now_ns(self, now: Optional[datetime]) -> int:
+        """Return `now` in epoch nanoseconds, the time of the market's clock if None."""
+
+        return self.clock.now_ns() if now is None else to_epoch_ns(now)
+
+    def _dividends(self, prices: ArrayLike, symbols: Optional[List[str]]) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the dividends of the given stocks shaped to broadcast against the prices,
+        one row of prices per stock.
+        """
+        if symbols is None:
+            symbols = self.get_supported_stocks()
+        prices = np.asarray(prices, dtype=np.float64)
+        if prices.ndim == 0 or prices.shape[0] != len(symbols):
+            raise ValueError("Prices must have one row per stock symbol")
+        missing = [symbol for symbol in symbols if symbol not in self.stocks]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+
+        dividends = np.fromiter((self.stocks[symbol].dividend() for symbol in symbols),
+                                dtype=np.float64, count=len(symbols))
+        return dividends.reshape((-1,) + (1,) * (prices.ndim - 1)), prices
+
+    def dividend_yields(self, prices: ArrayLike, symbols: Optional[List[str]] = None) \
+            -> np.ndarray:
+        """Calculate dividend yields for many stocks and prices in one pass.
+
+        `prices` has one row per symbol, in the order of `symbols` (all supported stocks
+        by default), holding a single price or a grid of scenario prices. Every price
+        must be positive.
+        """
+        dividends, prices = self._dividends(prices, symbols)
+        return dividend_yields(dividends, prices)
+
+    def pe_ratios(self, prices: ArrayLike, symbols: Optional[List[str]] = None) -> np.ndarray:
+        """Calculate P/E Ratios for many stocks and prices in one pass.
+
+        Takes prices laid out as for `dividend_yields`. Undefined ratios (zero dividend)
+        are NaN.
+        """
+        dividends, prices = self._dividends(prices, symbols)
+        return pe_ratios(dividends, prices)
+
+    def record_trade(self, symbol: str, quantity: int, trade_price: float, side: TradeSide,
+                     timestamp: Optional[datetime] = None) -> None:
+        """Record a trade for the given stock symbol.
+
+        The trade is checked like a `Trade` but stored as a lightweight `TradeRecord`,
+        `Trade` models are only built when the stock's trades are read.
+
+        `timestamp` is when the trade happened, e.g. as stamped by the exchange, now by
+        default. Trades may arrive out of order: see `max_lateness` for how late.
+        """
+        stock = self.stocks.get(symbol)
+        if stock is None:
             raise ValueError("Stock symbol not found")
 
-        trade = Trade(timestamp=datetime.now(pytz.timezone('US/Eastern')), quantity=quantity,
-                      side=side, trade_price=trade_price)
-        self.stocks[symbol].record_trade(trade)
-        log.info(f"Recorded trade for {symbol}: {trade}")
+        timestamp_ns = self._now_ns(timestamp)
+        trade = TradeRecord.validate(timestamp_ns, quantity, trade_price, side)
+        if self.max_lateness is not None:
+            self._check_lateness(stock, timestamp_ns)
+        stock.record_trade(trade)
+        journal = self.__pydantic_private__['_journal']
+        if journal is not None:
+            journal.append(symbol, trade)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Recorded trade for %s: %r", symbol, trade)
+
+    def _check_lateness(self, stock: Stock, timestamp_ns: int) -> None:
+        """
+        Raise a ValueError, and count the trade as late, if a trade at `timestamp_ns` is
+        more than `max_lateness` behind the stock's latest trade.
+        """
+
+        timestamps = stock.trades.timestamps
+        if timestamps and timestamp_ns < timestamps[-1] - self._max_lateness_ns():
+            self._late_trades[stock.symbol] = self._late_trades.get(stock.symbol, 0) + 1
+            raise ValueError(f"Trade is more than {self.max_lateness} older than the latest "
+                             f"trade of {stock.symbol}")
+
+    def _max_lateness_ns(self) -> int:
+        return self.max_lateness // timedelta(microseconds=1) * 1000
+
+    def late_trades(self) -> Dict[str, int]:
+        """
+        Return the number of trades dropped for being more than `max_lateness` behind
+        the latest trade of their stock, per symbol with any.
+        """
+
+        return dict(self._late_trades)
+
+    def record_trades(self, trades: TradeBatch) -> TradeBatchResult:
+        """Record a batch of trades.
+
+        `trades` is either a mapping of column name to values ("symbol", "quantity",
+        "trade_price", "side" and optionally "timestamp"), where the values can be lists
+        or NumPy arrays, or an iterable of (symbol, quantity, trade_price, side[,
+        timestamp]) tuples or of dicts with those keys. Trades without a timestamp are
+        stamped with the time the batch was recorded.
+
+        The batch is validated in one pass and appended per symbol in bulk. Invalid
+        trades, and trades later than `max_lateness`, are reported in the result instead
+        of failing the whole batch.
+        """
+        columns = to_columns(trades)
+        now_ns = self.clock.now_ns()
+        validated, rejected = validate_trades(columns, self.stocks, now_ns)
+
+        accepted = self.record_validated(validated, rejected)
+        rejected.sort(key=lambda reject: reject.row)
+
+        log.info("Recorded batch of trades: %d accepted, %d rejected", accepted, len(rejected))
+        return TradeBatchResult(accepted=accepted, rejected=rejected)
+
+    def record_validated(self, validated: ValidatedTrades,
+                         rejected: Optional[List[TradeReject]] = None) -> int:
+        """
+        Record the valid rows of an already validated batch, appending them per symbol
+        in bulk. Returns the number of trades recorded. Trades later than `max_lateness`
+        are dropped, and added to `rejected` if given.
+        """
+
+        accepted = 0
+        for symbol, rows in validated.groups():
+            late = self._record_rows(self.stocks[symbol], validated, rows)
+            accepted += len(rows) - len(late)
+            if len(late):
+                log.info("Dropped %d trades of %s later than %s", len(late), symbol,
+                         self.max_lateness)
+                if rejected is not None:
+                    reason = f"Trade is more than {self.max_lateness} older than the " \
+                             f"latest trade of {symbol}"
+                    rejected.extend(TradeReject(row=int(row), reason=reason) for row in late)
+        return accepted
+
+    def _record_rows(self, stock: Stock, validated: ValidatedTrades, rows: np.ndarray) \
+            -> np.ndarray:
+        """
+        Append the given rows of a validated batch to the stock, and to the journal,
+        except those later than `max_lateness`. Returns the rows dropped as late.
+        """
+        late = rows[:0]
+        if self.max_lateness is not None:
+            is_late = self._late_rows(stock, validated.timestamps[rows], rows)
+            if is_late.any():
+                late, rows = rows[is_late], rows[~is_late]
+                self._late_trades[stock.symbol] = \
+                    self._late_trades.get(stock.symbol, 0) + len(late)
+                if not len(rows):
+                    return late
+
+        columns = (validated.timestamps[rows], validated.quantities[rows],
+                   validated.trade_prices[rows], validated.sides[rows],
+                   new_trade_ids(len(rows)))
+        stock.record_trade_columns(*columns)
+        journal = self.__pydantic_private__['_journal']
+        if journal is not None:
+            journal.append_columns(stock.symbol, *columns)
+        return late
+
+    def _late_rows(self, stock: Stock, timestamps: np.ndarray, rows: np.ndarray) \
+            -> np.ndarray:
+        """
+        Return the mask of the trades, sorted by timestamp, that are more than
+        `max_lateness` behind the latest trade of the stock, or of the batch before them:
+        rows are taken to have arrived in the order of their position in the batch.
+        """
+        arrival = np.argsort(rows)
+        latest = np.maximum.accumulate(timestamps[arrival])
+        stored = stock.trades.timestamps
+        if stored:
+            latest = np.maximum(latest, stored[-1])
+        is_late = np.empty(len(rows), dtype=bool)
+        is_late[arrival] = timestamps[arrival] < latest - self._max_lateness_ns()
+        return is_late
+
+    def attach_journal(self, journal: Optional["TradeJournal"]) -> None:
+        """Append every trade recorded through the market to a `TradeJournal`.
+
+        Trades recorded with `Stock.record_trade` directly are not journaled. Pass None
+        to stop journaling.
+        """
+        self._journal = journal
+
+    def volume_weighted_stock_prices(
+            self, windows: Iterable[timedelta], now: Optional[datetime] = None,
+            symbols: Optional[Iterable[str]] = None,
+            symbol_windows: Optional[Mapping[str, Iterable[timedelta]]] = None) \
+            -> Dict[str, Dict[timedelta, Optional[float]]]:
+        """Calculate the VWSP of the given stocks, all by default, over several windows.
+
+        Every stock is priced over `windows` plus its own windows in `symbol_windows`,
+        all from the stock's shared prefix sums, see `Stock.volume_weighted_stock_prices`.
+        """
+        if now is None:
+            now = self.clock.now()
+        if symbols is None:
+            symbols = self.get_supported_stocks()
+        windows = list(windows)
+        symbol_windows = symbol_windows or {}
+        missing = [symbol for symbol in {*symbols, *symbol_windows} if symbol not in self.stocks]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(sorted(missing))}")
+        return {symbol: self._stock_prices(self.stocks[symbol],
+                                           windows + list(symbol_windows.get(symbol, ())), now)
+                for symbol in symbols}
+
+    @staticmethod
+    def _stock_prices(stock: Stock, windows: List[timedelta], now: datetime) \
+            -> Dict[timedelta, Optional[float]]:
+        """Return the VWSP of a stock over each window."""
+
+        return stock.volume_weighted_stock_prices(windows, now)
+
+    def order_flow(self, now: Optional[datetime] = None,
+                   symbols: Optional[Iterable[str]] = None) -> Dict[str, OrderFlow]:
+        """Return the order flow of the given stocks, all by default, see `Stock.order_flow`.
+
+        Every stock's flow is read from the sums its VWSP window keeps up to date, so a
+        refresh over thousands of symbols does not touch their trades.
+        """
+        now_ns = self._now_ns(now)
+        if symbols is None:
+            symbols = self.get_supported_stocks()
+        missing = [symbol for symbol in symbols if symbol not in self.stocks]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        return {symbol: self._stock_order_flow(self.stocks[symbol], now_ns)
+                for symbol in symbols}
+
+    @staticmethod
+    def _stock_order_flow(stock: Stock, now_ns: int) -> OrderFlow:
+        """Return the order flow of a stock at `now_ns`."""
+
+        return stock._order_flow_ns(now_ns)
+
+    def latest_bars(self, interval: timedelta, count: int = 1,
+                    symbols: Optional[Iterable[str]] = None) -> Dict[str, List[Bar]]:
+        """Return the latest `count` bars of `interval` for the given stocks, all by default.
+
+        `interval` must be one of `bar_intervals`. Bars are kept up to date as trades are
+        recorded, so this never reads the trades.
+        """
+        if symbols is None:
+            symbols = self.get_supported_stocks()
+        missing = [symbol for symbol in symbols if symbol not in self.stocks]
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        return {symbol: self.stocks[symbol].recent_bars(interval, count) for symbol in symbols}
+
+    def enforce_retention(self, now: Optional[datetime] = None) -> int:
+        """Evict the trades the market's retention policy no longer keeps, from all stocks.
 
+        Meant to be called periodically by the host application rather than on every
+        trade. Trades inside the active VWSP window are always kept. Returns the number
+        of trades evicted.
+        """
+        if self.retention is None:
+            return 0
+        if now is None:
+            now = self.clock.now()
+
+        evicted = sum(stock.evict_trades(self.retention, now) for stock in self.stocks.values())
+        if evicted:
+            log.info("Evicted %d trades by retention policy", evicted)
+        return evicted
 
-    def all_share_index(self) -> Optional[float]:
+    def all_share_index(self, now: Optional[datetime] = None) -> Optional[float]:
         """Calculate the GBCE All Share Index as the geometric mean of the VWSP for all stocks.
 
         Only stocks with a valid VWSP (i.e. with recent trades) are considered.
         Returns None if no stock has a recent trade.
+
+        The index is maintained incrementally: only stocks with new trades, or whose
+        oldest trade left the VWSP window since the last call, are re-priced. The index
+        as of an earlier `now` than the last call is computed from every stock's VWSP
+        as of that time, leaving the maintained index untouched.
         """
-        prices = []
-        log.info("Calculating GBCE All Share Index")
-        for stock in self.stocks.values():
-            price = stock.volume_weighted_stock_price()
-            if price is not None:
-                prices.append(price)
-        if not prices:
+        return self._index_value(self._now_ns(now))
+
+    def _index_value(self, now_ns: int) -> Optional[float]:
+        """Calculate the index at a time given in epoch nanoseconds."""
+
+        log_sum, count = self._index_terms(now_ns)
+        if not count:
             return None
-        product = math.prod(prices)
-        index_value = product ** (1/len(prices))
-        log.info(f"Number of prices used in calculation: {len(prices)}")
-        log.info(f"GBCE All Share Index Calculated Value: {index_value}")
+        index_value = math.exp(log_sum / count)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("GBCE All Share Index Calculated Value from %d prices: %s",
+                      count, index_value)
+        return index_value
+
+    def all_share_index_terms(self, now: Optional[datetime] = None) -> Tuple[float, int]:
+        """
+        Return the sum of the log VWSPs the index is built from and their number, the
+        index being exp(sum / number). Used to combine the indices of market shards.
+        """
+        return self._index_terms(self._now_ns(now))
+
+    def _index_terms(self, now_ns: int) -> Tuple[float, int]:
+        """Return the terms of the index at a time given in epoch nanoseconds."""
+
+        index_time_ns = self.__pydantic_private__['_index_time_ns']
+        if index_time_ns is not None and now_ns < index_time_ns:
+            # Windows only move forward, price the past without touching the index
+            log_prices = []
+            for stock in list(self.stocks.values()):
+                price = self._price_stock(stock, now_ns)[0]
+                if price is not None and price > 0:
+                    log_prices.append(math.log(price))
+            return math.fsum(log_prices), len(log_prices)
+        self._update_index(now_ns)
+        index = self.__pydantic_private__['_index']
+        return index.log_sum, len(index)
+
+    def all_share_index_series(self, start: datetime, end: datetime,
+                               step: timedelta = timedelta(seconds=1)) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """Calculate the index as of every `step` from `start` to `end`, both included.
+
+        Returns the times as int64 epoch nanoseconds and the index at each of them, NaN
+        where no stock had trades in its VWSP window. Every stock is priced at all the
+        times at once from its prefix sums, see `Stock.volume_weighted_stock_price_series`,
+        so a day at one second resolution takes one vectorised pass per stock.
+        """
+        times_ns, log_sums, counts = self.all_share_index_series_terms(start, end, step)
+        return times_ns, index_series(log_sums, counts)
+
+    def all_share_index_series_terms(self, start: datetime, end: datetime,
+                                     step: timedelta = timedelta(seconds=1)) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the times of `all_share_index_series` with the sums of the log VWSPs
+        and their numbers at each time. Used to combine the series of market shards.
+        """
+        times_ns = series_times(start, end, step)
+        log_sums = np.zeros(len(times_ns))
+        counts = np.zeros(len(times_ns), dtype=np.int64)
+        for stock in list(self.stocks.values()):
+            prices = self._stock_price_series(stock, times_ns)
+            priced = prices > 0
+            log_sums += np.log(prices, out=np.zeros(len(prices)), where=priced)
+            counts += priced
+        return times_ns, log_sums, counts
+
+    @staticmethod
+    def _stock_price_series(stock: Stock, times_ns: np.ndarray) -> np.ndarray:
+        """Return the VWSP of a stock as of each time."""
+
+        return stock.volume_weighted_stock_price_series(times_ns)
+
+    def _update_index(self, now_ns: int) -> None:
+        """
+        Re-price the stocks whose VWSP window changed since the last index update, either
+        because trades were recorded for them, because their oldest trade expired or
+        because a trade recorded ahead of the previous update entered the window.
+        """
+
+        changed = self._drain_changed_symbols()
+        # Read once from the private dict, going through BaseModel.__getattr__ costs
+        # more than an idle update
+        private = self.__pydantic_private__
+        expiries, scheduled = private['_expiries'], private['_scheduled_expiries']
+        index, screen = private['_index'], private['_screen']
+        while expiries and expiries[0][0] <= now_ns:
+            expiry_ns, symbol = heapq.heappop(expiries)
+            if scheduled.get(symbol) == expiry_ns:
+                del scheduled[symbol]
+                changed.add(symbol)
+
+        symbols = iter(changed)
+        symbol = None
+        try:
+            for symbol in symbols:
+                stock = self.stocks.get(symbol)
+                if stock is None:
+                    index.update(symbol, None)
+                    scheduled.pop(symbol, None)
+                    if screen is not None:
+                        screen.remove(symbol)
+                    continue
+                price, expiry_ns = self._price_stock(stock, now_ns)
+                index.update(symbol, price)
+                if screen is not None:
+                    screen.update(symbol, _screen_dividend(stock), price,
+                                  self._stock_order_flow(stock, now_ns).volume)
+                if expiry_ns is None:
+                    scheduled.pop(symbol, None)
+                elif scheduled.get(symbol) != expiry_ns:
+                    scheduled[symbol] = expiry_ns
+                    heapq.heappush(expiries, (expiry_ns, symbol))
+        except BaseException:
+            # The changes are drained, hand back the symbols not updated so that the
+            # next update retries them
+            private['_changed_symbols'].add(symbol)
+            private['_changed_symbols'].update(symbols)
+            raise
+        private['_index_time_ns'] = now_ns
+        if private['_subscriptions']:
+            private['_published_changes'] |= changed
+
+    def top_stocks(self, metric: ScreenMetric, count: int = 10, ascending: bool = False,
+                   now: Optional[datetime] = None) -> List[ScreenRow]:
+        """Return the `count` stocks with the highest metric, or the lowest if `ascending`.
+
+        Stocks whose metric is undefined are left out, see `ScreenRow`. The metrics of
+        every stock are kept in sorted indexes, updated along with the index for the
+        stocks with new or expired trades only, so a top-N over tens of thousands of
+        symbols reads N entries. The first query builds the indexes.
+        """
+        metric = ScreenMetric(metric)
+        if count < 0:
+            raise ValueError("Count must not be negative")
+        now_ns = self._now_ns(now)
+        return self._query_screen(now_ns, lambda screen: screen.top(metric, count, ascending))
+
+    def screen_stocks(self, criteria: Mapping[ScreenMetric, Tuple[Optional[float],
+                                                                  Optional[float]]],
+                      now: Optional[datetime] = None) -> List[ScreenRow]:
+        """Return the stocks whose metrics all fall in the given ranges.
+
+        `criteria` maps metrics to a (low, high) range, both ends included and either
+        one unbounded if None, e.g. `{ScreenMetric.PE_RATIO: (None, 15.0)}`. The stocks
+        in the range of the first metric are read from its index and checked against the
+        other ones; they are returned ordered by the first metric.
+        """
+        criteria = [(ScreenMetric(metric), low, high)
+                    for metric, (low, high) in criteria.items()]
+        if not criteria:
+            raise ValueError("Screen by at least one metric")
+        now_ns = self._now_ns(now)
+
+        def select(screen: MarketScreen) -> List[ScreenRow]:
+            (metric, low, high), rest = criteria[0], criteria[1:]
+            rows = screen.select(metric, low, high)
+            for metric, low, high in rest:
+                rows = [row for row in rows
+                        if _in_range(getattr(row, metric.value), low, high)]
+            return rows
+
+        return self._query_screen(now_ns, select)
+
+    def set_reference_prices(self, prices: Optional[Mapping[str, float]] = None,
+                             now: Optional[datetime] = None) -> None:
+        """Set the prices the VWSP change of `top_stocks` and `screen_stocks` is measured from.
+
+        Typically the previous close, given per symbol. By default every stock's VWSP
+        at `now` becomes its reference, e.g. at the open of the trading day. Stocks
+        without a reference have no VWSP change.
+        """
+        if prices is not None:
+            missing = [symbol for symbol in prices if symbol not in self.stocks]
+            if missing:
+                raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        now_ns = self._now_ns(now)
+
+        def set_references(screen: MarketScreen) -> None:
+            references = prices if prices is not None else \
+                {symbol: row.vwsp for symbol, row in screen.rows.items()}
+            for symbol, price in references.items():
+                screen.set_reference(symbol, price)
+
+        self._query_screen(now_ns, set_references, past=False)
+
+    def _query_screen(self, now_ns: int, query: Callable[[MarketScreen], Any],
+                      past: bool = True) -> Any:
+        """
+        Run a query on the screen, brought up to date at `now_ns`. The screen as of an
+        earlier time than the index is built from scratch for the query if `past`,
+        leaving the maintained one untouched.
+        """
+        private = self.__pydantic_private__
+        screen = private['_screen']
+        if screen is None:
+            # Every stock is priced into the screen by the next index update, its
+            # indexes are then sorted in one go
+            screen = private['_screen'] = MarketScreen(indexed=False)
+            self._changed_symbols.update(self.stocks)
+            if private['_index_time_ns'] is not None and now_ns < private['_index_time_ns']:
+                self._update_index(private['_index_time_ns'])
+        index_time_ns = private['_index_time_ns']
+        if index_time_ns is not None and now_ns < index_time_ns:
+            if not past:
+                raise ValueError("Cannot set reference prices as of a time before the "
+                                 "last index update")
+            past_screen = MarketScreen(indexed=False)
+            for symbol, stock in list(self.stocks.items()):
+                past_screen.set_reference(symbol, screen.reference(symbol))
+                past_screen.update(symbol, _screen_dividend(stock),
+                                   self._price_stock(stock, now_ns)[0],
+                                   self._stock_order_flow(stock, now_ns).volume)
+            past_screen.reindex()
+            return query(past_screen)
+        self._update_index(now_ns)
+        if not screen.indexed:
+            screen.reindex()
+        return query(screen)
+
+    def subscribe(self, callback: UpdateCallback, symbols: Iterable[str] = (),
+                  index: bool = False, min_interval: timedelta = timedelta(0)) -> Subscription:
+        """Register for pushed updates of the VWSP of `symbols` and/or of the index.
+
+        `callback` is called with a `MarketUpdate` by `publish_updates` whenever one of
+        the values changed, because of new trades or trades leaving the VWSP window, at
+        most once per value every `min_interval`: a burst of trades on a symbol gives a
+        single update. The current values are published on the first call.
+        """
+        symbols = frozenset(symbols)
+        missing = sorted(symbols - set(self.stocks))
+        if missing:
+            raise ValueError(f"Stock symbol not found: {', '.join(missing)}")
+        if not symbols and not index:
+            raise ValueError("Subscribe to at least one symbol or to the index")
+
+        subscription = Subscription(callback, symbols, index, min_interval)
+        self._subscriptions.append(subscription)
+        for symbol in symbols:
+            self._symbol_subscriptions.setdefault(symbol, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop publishing updates to a subscription."""
+
+        self._subscriptions.remove(subscription)
+        for symbol in subscription.symbols:
+            self._symbol_subscriptions[symbol].remove(subscription)
+
+    def publish_updates(self, now: Optional[datetime] = None) -> int:
+        """Push the values that changed since the last call to their subscribers.
+
+        Meant to be called periodically by the host application, e.g. from a timer or
+        its event loop. Values are only recomputed for symbols with new or expired
+        trades, and for subscriptions whose `min_interval` has elapsed. Returns the
+        number of updates published.
+        """
+        if not self._subscriptions:
+            return 0
+        # Collect the changes since the last index update, then price as of a time read
+        # after taking them: another thread may have taken later trades into the index
+        # meanwhile, and their changes must not be published with older values
+        self._index_value(self._now_ns(now))
+        changed = self._take_published_changes()
+        now_ns = self._now_ns(now)
+        index_value = self._index_value(now_ns)
+        for symbol in changed:
+            for subscription in self._symbol_subscriptions.get(symbol, ()):
+                subscription.pending.add(symbol)
+        if changed:
+            for subscription in self._subscriptions:
+                if subscription.index:
+                    subscription.pending.add(None)
+
+        published = 0
+        for subscription in list(self._subscriptions):
+            if not subscription.due(now_ns):
+                continue
+            updates = []
+            for symbol in subscription.pending:
+                if symbol is None:
+                    value = index_value
+                else:
+                    value = self._stock_price_ns(self.stocks[symbol], now_ns)
+                if subscription.changed(symbol, value):
+                    updates.append(MarketUpdate(symbol, value, now_ns))
+            subscription.pending.clear()
+            subscription.last_published_ns = now_ns
+            for update in updates:
+                try:
+                    subscription.callback(update)
+                except Exception:
+                    log.exception("Subscriber callback failed for update %r", update)
+            published += len(updates)
+        return published
+
+    def _take_published_changes(self) -> Set[str]:
+        """Return and forget the symbols whose VWSP changed since updates were published."""
+
+        private = self.__pydantic_private__
+        changed, private['_published_changes'] = private['_published_changes'], set()
+        return changed
+
+    @staticmethod
+    def _stock_price_ns(stock: Stock, now_ns: int) -> Optional[float]:
+        """Return the VWSP of a stock at `now_ns`."""
+
+        return stock._volume_weighted_stock_price_ns(now_ns)
+
+    def _drain_changed_symbols(self) -> Set[str]:
+        """Return and forget the symbols with trades recorded since the last index update."""
+
+        pending = self.__pydantic_private__['_changed_symbols']
+        changed = set(pending)
+        pending.clear()
+        return changed
+
+    @staticmethod
+    def _price_stock(stock: Stock, now_ns: int) -> Tuple[Optional[float], Optional[int]]:
+        """Return the VWSP of the stock at `now_ns` and when it next changes by itself."""
+
+        return stock._volume_weighted_stock_price_ns(now_ns), stock._next_change_ns(now_ns)
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    """
+    Pause the cyclic garbage collector while building many objects at once.
+
+    Every stock holds several containers, so adding tens of thousands of them triggers
+    full collections that cost more than building the stocks.
+    """
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _screen_dividend(stock: Stock) -> Optional[float]:
+    """The dividend of a stock, None if it is undefined, for a preferred stock without a
+    fixed dividend."""
+
+    try:
+        return stock.dividend()
+    except ValueError:
+        return None
+
+
+def _in_range(value: Optional[float], low: Optional[float], high: Optional[float]) -> bool:
+    return value is not None and (low is None or value >= low) \
+        and (high is None or value <= high)
+
 
 StockMarket.model_rebuild()
\ No newline at end of file
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional, Set
+
+
+class MarketUpdate(NamedTuple):
+    """
+    New value pushed to a subscriber: the VWSP of `symbol`, or the GBCE All Share Index
+    when `symbol` is None. The value is None when it became undefined.
+    """
+
+    symbol: Optional[str]
+    value: Optional[float]
+    timestamp_ns: int
+
+
+UpdateCallback = Callable[[MarketUpdate], None]
+
+# Placeholder for values never published to a subscriber
+_UNPUBLISHED = object()
+
+
+class Subscription:
+    """
+    Registration for pushed updates of the VWSP of some symbols, or of the index.
+
+    Changes are collected in `pending` as they happen, and published at most once
+    every `min_interval_ns`, one update per changed value, however many trades moved it.
+    """
+
+    __slots__ = ("symbols", "index", "callback", "min_interval_ns", "pending",
+                 "last_published_ns", "_last_values")
+
+    def __init__(self, callback: UpdateCallback, symbols: Optional[FrozenSet[str]] = None,
+                 index: bool = False, min_interval: timedelta = timedelta(0)) -> None:
+        self.symbols = symbols or frozenset()
+        self.index = index
+        self.callback = callback
+        self.min_interval_ns = min_interval // timedelta(microseconds=1) * 1000
+        # Symbols whose VWSP may have changed since the last publication, None for the index
+        self.pending: Set[Optional[str]] = set(self.symbols)
+        if index:
+            self.pending.add(None)
+        self.last_published_ns: Optional[int] = None
+        self._last_values: Dict[Optional[str], Optional[float]] = {}
+
+    def due(self, now_ns: int) -> bool:
+        """Whether the subscription has changes to publish at `now_ns`."""
+
+        return bool(self.pending) and (self.last_published_ns is None
+                                       or now_ns - self.last_published_ns >= self.min_interval_ns)
+
+    def changed(self, key: Optional[str], value: Optional[float]) -> bool:
+        """Record `value` as published for `key`, returning whether it is a new value."""
+
+        if self._last_values.get(key, _UNPUBLISHED) == value:
+            return False
+        self._last_values[key] = value
+        return True
@@ -16,11 +16,11 @@ class Trade(BaseModel):
     timestamp: datetime = Field(description="Time of trade")
     quantity: int = Field(description="Quantity of trade")
     side: TradeSide = Field(description="Side of trade. Should be 'buy' or 'sell'")
-    trade_price: float = Field(description="Price of trade")
+    trade_price: float = Field(allow_inf_nan=False, description="Price of trade, "
+                                                                "must be finite")
 
     @field_validator('side', mode='before')
     def validate_side(cls, v):
-        print(v)
         if v not in ['BUY', 'SELL']:
             raise ValueError("Side must be 'BUY' or 'SELL'")
         return v
@@ -0,0 +1,264 @@
+import os
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Collection, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+from src.models.trade_store import TRADE_ID_SIZE, to_epoch_ns
+
+# Column names of a trade batch, in the order used for tuple records
+TRADE_COLUMNS = ("symbol", "quantity", "trade_price", "side", "timestamp")
+REQUIRED_TRADE_COLUMNS = TRADE_COLUMNS[:4]
+
+_INT_ADAPTER = TypeAdapter(int)
+_FLOAT_ADAPTER = TypeAdapter(float)
+_DATETIME_ADAPTER = TypeAdapter(datetime)
+
+INT64_MIN, INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+TradeBatch = Union[Mapping[str, Sequence[Any]], Iterable[Union[Sequence[Any], Mapping[str, Any]]]]
+
+
+class TradeReject(BaseModel):
+    """
+    A trade of a batch that was not recorded
+    """
+
+    row: int = Field(description="Position of the trade in the batch")
+    reason: str = Field(description="Why the trade was rejected")
+
+
+class TradeBatchResult(BaseModel):
+    """
+    Outcome of recording a batch of trades
+    """
+
+    accepted: int = Field(default=0, description="Number of trades recorded")
+    rejected: List[TradeReject] = Field(default_factory=list,
+                                        description="Trades that were not recorded")
+
+
+class ValidatedTrades:
+    """
+    Columns of a trade batch converted to typed NumPy arrays.
+
+    `valid` masks the rows that passed validation, the other columns hold placeholder
+    values for rejected rows.
+    """
+
+    __slots__ = ("symbols", "quantities", "trade_prices", "sides", "timestamps", "valid")
+
+    def __init__(self, symbols: np.ndarray, quantities: np.ndarray, trade_prices: np.ndarray,
+                 sides: np.ndarray, timestamps: np.ndarray, valid: np.ndarray) -> None:
+        self.symbols = symbols
+        self.quantities = quantities
+        self.trade_prices = trade_prices
+        self.sides = sides
+        self.timestamps = timestamps
+        self.valid = valid
+
+    def groups(self) -> Iterable[Tuple[str, np.ndarray]]:
+        """
+        Yield every symbol of the valid rows with the positions of its rows, sorted by
+        timestamp.
+        """
+
+        rows = np.flatnonzero(self.valid)
+        if not len(rows):
+            return
+        symbols, codes = np.unique(self.symbols[rows], return_inverse=True)
+        order = np.lexsort((self.timestamps[rows], codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(symbols) + 1))
+        for code, symbol in enumerate(symbols):
+            yield symbol, rows[order[bounds[code]:bounds[code + 1]]]
+
+
+def to_columns(trades: TradeBatch) -> Dict[str, Sequence[Any]]:
+    """
+    Normalise a trade batch to a mapping of column name to column values.
+
+    The batch is either a mapping of columns (lists, arrays or NumPy arrays) or an
+    iterable of records, each a (symbol, quantity, trade_price, side[, timestamp])
+    tuple or a mapping with those keys.
+    """
+
+    if isinstance(trades, Mapping):
+        missing = [name for name in REQUIRED_TRADE_COLUMNS if name not in trades]
+        if missing:
+            raise ValueError(f"Trade batch is missing columns: {', '.join(missing)}")
+        columns = {name: trades[name] for name in TRADE_COLUMNS if name in trades}
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Trade batch columns must all have the same length")
+        return columns
+
+    columns: Dict[str, List[Any]] = {name: [] for name in TRADE_COLUMNS}
+    for record in trades:
+        if isinstance(record, Mapping):
+            values = [record.get(name) for name in TRADE_COLUMNS]
+        else:
+            values = list(record) + [None] * (len(TRADE_COLUMNS) - len(record))
+        for name, value in zip(TRADE_COLUMNS, values):
+            columns[name].append(value)
+    if all(timestamp is None for timestamp in columns["timestamp"]):
+        del columns["timestamp"]
+    return columns
+
+
+def _coerce_elements(values: Sequence[Any], adapter: TypeAdapter, dtype,
+                     valid: np.ndarray, reasons: Dict[int, str], name: str) -> np.ndarray:
+    """Convert a column one element at a time, rejecting the rows that fail."""
+
+    column = np.zeros(len(values), dtype=dtype)
+    for row, value in enumerate(values):
+        try:
+            column[row] = adapter.validate_python(value)
+        except (ValidationError, OverflowError):
+            if valid[row]:
+                valid[row] = False
+                reasons[row] = f"Invalid {name}: {value!r}"
+    return column
+
+
+def _quantity_column(values: Sequence[Any], valid: np.ndarray,
+                     reasons: Dict[int, str]) -> np.ndarray:
+    """Convert the quantity column to int64, accepting integral floats like pydantic."""
+
+    column = np.asarray(values)
+    if column.dtype.kind in "iu":
+        return column.astype(np.int64, copy=False)
+    if column.dtype.kind == "f":
+        integral = np.isfinite(column) & (column == np.trunc(column)) \
+            & (column >= INT64_MIN) & (column < INT64_MAX)
+        for row in np.flatnonzero(valid & ~integral):
+            valid[row] = False
+            reasons[int(row)] = f"Invalid quantity: {column[row]!r}"
+        return np.where(integral, column, 0).astype(np.int64)
+    if column.dtype.kind == "U":
+        try:
+            return column.astype(np.int64)
+        except (ValueError, OverflowError):
+            pass
+    return _coerce_elements(values, _INT_ADAPTER, np.int64, valid, reasons, "quantity")
+
+
+def _price_column(values: Sequence[Any], valid: np.ndarray,
+                  reasons: Dict[int, str]) -> np.ndarray:
+    """Convert the trade price column to float64, rejecting non-finite prices."""
+
+    column = np.asarray(values)
+    if column.dtype.kind in "iuf":
+        column = column.astype(np.float64, copy=False)
+    elif column.dtype.kind == "U":
+        try:
+            column = column.astype(np.float64)
+        except ValueError:
+            column = None
+    else:
+        column = None
+    if column is None:
+        column = _coerce_elements(values, _FLOAT_ADAPTER, np.float64, valid, reasons,
+                                  "trade price")
+    # A single infinite or NaN price would poison the running sums of its stock
+    for row in np.flatnonzero(valid & ~np.isfinite(column)):
+        valid[row] = False
+        reasons[int(row)] = f"Invalid trade price: {float(column[row])!r}"
+    return column
+
+
+def _side_column(values: Sequence[Any], valid: np.ndarray,
+                 reasons: Dict[int, str]) -> np.ndarray:
+    """Convert the side column to side flags, only 'BUY' and 'SELL' are accepted."""
+
+    column = np.asarray(values, dtype=object)
+    sell = column == "SELL"
+    known = sell | (column == "BUY")
+    for row in np.flatnonzero(valid & ~known):
+        valid[row] = False
+        reasons[int(row)] = "Side must be 'BUY' or 'SELL'"
+    return sell.astype(np.int8)
+
+
+def _timestamp_column(values: Sequence[Any], default_timestamp_ns: int, valid: np.ndarray,
+                      reasons: Dict[int, str]) -> np.ndarray:
+    """
+    Convert the timestamp column to int64 epoch nanoseconds.
+
+    Accepts datetimes, NumPy datetime64 values and integer epoch nanoseconds. Missing
+    (None) timestamps are replaced with `default_timestamp_ns`.
+    """
+
+    column = np.asarray(values)
+    if column.dtype.kind == "M":
+        return column.astype("datetime64[ns]").view(np.int64)
+    if column.dtype.kind in "iu":
+        return column.astype(np.int64, copy=False)
+    if column.dtype.kind == "U":
+        try:
+            return column.astype(np.int64)
+        except (ValueError, OverflowError):
+            pass
+
+    timestamps = np.zeros(len(values), dtype=np.int64)
+    for row, value in enumerate(values):
+        try:
+            if value is None:
+                timestamps[row] = default_timestamp_ns
+            elif isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+                timestamps[row] = value
+            else:
+                timestamps[row] = to_epoch_ns(_DATETIME_ADAPTER.validate_python(value))
+        except (ValidationError, OverflowError):
+            if valid[row]:
+                valid[row] = False
+                reasons[row] = f"Invalid timestamp: {value!r}"
+    return timestamps
+
+
+def validate_trades(columns: Dict[str, Sequence[Any]], symbols: Collection[str],
+                    default_timestamp_ns: int) -> Tuple[ValidatedTrades, List[TradeReject]]:
+    """
+    Validate the columns of a trade batch in one pass.
+
+    Numeric columns are checked and converted with NumPy, falling back to converting
+    element by element only for columns holding mixed Python objects. Rows that fail
+    a check are masked out and reported instead of failing the batch. Rows without a
+    timestamp get `default_timestamp_ns`.
+    """
+
+    size = len(columns["symbol"])
+    valid = np.ones(size, dtype=bool)
+    reasons: Dict[int, str] = {}
+
+    symbol_column = np.asarray(columns["symbol"], dtype=object)
+    known = np.fromiter((symbol in symbols for symbol in symbol_column), dtype=bool,
+                        count=size)
+    for row in np.flatnonzero(~known):
+        valid[row] = False
+        reasons[int(row)] = "Stock symbol not found"
+
+    quantities = _quantity_column(columns["quantity"], valid, reasons)
+    trade_prices = _price_column(columns["trade_price"], valid, reasons)
+    sides = _side_column(columns["side"], valid, reasons)
+
+    if "timestamp" in columns:
+        timestamps = _timestamp_column(columns["timestamp"], default_timestamp_ns, valid,
+                                       reasons)
+    else:
+        timestamps = np.full(size, default_timestamp_ns, dtype=np.int64)
+
+    rejected = [TradeReject(row=row, reason=reason) for row, reason in sorted(reasons.items())]
+    return ValidatedTrades(symbol_column, quantities, trade_prices, sides, timestamps,
+                           valid), rejected
+
+
+def new_trade_ids(count: int) -> bytes:
+    """Generate `count` random version 4 UUIDs as raw bytes, in one call."""
+
+    ids = np.frombuffer(os.urandom(count * TRADE_ID_SIZE), dtype=np.uint8) \
+        .reshape(count, TRADE_ID_SIZE).copy()
+    ids[:, 6] = (ids[:, 6] & 0x0F) | 0x40
+    ids[:, 8] = (ids[:, 8] & 0x3F) | 0x80
+    return ids.tobytes()
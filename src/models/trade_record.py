@@ -0,0 +1,107 @@
+import math
+import uuid
+from typing import Any, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from pydantic import TypeAdapter
+
+from src.models.trade import Trade
+from src.models.trade_batch import new_trade_ids
+from src.models.trade_side import TradeSide
+from src.models.trade_store import from_epoch_ns, to_epoch_ns
+
+# Random trade IDs are generated in blocks, one os.urandom call per trade would cost
+# more than the rest of building a record
+_TRADE_ID_BLOCK = 4096
+_trade_ids: Iterator[int] = iter(())
+
+_INT_ADAPTER = TypeAdapter(int)
+_FLOAT_ADAPTER = TypeAdapter(float)
+
+# Quantities are stored as signed 64 bit integers
+MAX_QUANTITY = 2 ** 63 - 1
+
+
+class TradeRecord(NamedTuple):
+    """
+    Lightweight, immutable trade for internal and already validated feeds.
+
+    Unlike `Trade` it is not validated, has its random UUID as an integer and a
+    timestamp in epoch nanoseconds instead of an aware datetime, so building one costs
+    about as much as building a tuple. Convert it with
+    `to_trade` where a `Trade` model is needed.
+    """
+
+    trade_id: int
+    timestamp_ns: int
+    quantity: int
+    trade_price: float
+    side: TradeSide
+
+    @classmethod
+    def create(cls, timestamp_ns: int, quantity: int, trade_price: float, side: TradeSide,
+               trade_id: Optional[int] = None) -> "TradeRecord":
+        """Build a trade record, taking the next trade ID if none is given."""
+
+        return cls(_next_trade_id() if trade_id is None else trade_id, timestamp_ns, quantity,
+                   trade_price, side)
+
+    @classmethod
+    def validate(cls, timestamp_ns: int, quantity: Any, trade_price: Any,
+                 side: Any) -> "TradeRecord":
+        """
+        Build a trade record from untrusted values, applying the same checks as `Trade`.
+
+        Plain ints and floats are taken as they are, anything else is coerced the way
+        pydantic coerces `Trade` fields. Raises a ValueError for invalid values.
+        """
+
+        if side not in ("BUY", "SELL"):
+            raise ValueError("Side must be 'BUY' or 'SELL'")
+        if type(quantity) is not int:
+            quantity = _INT_ADAPTER.validate_python(quantity)
+        if not -MAX_QUANTITY <= quantity <= MAX_QUANTITY:
+            raise ValueError("Quantity is out of range")
+        if type(trade_price) is not float:
+            trade_price = _FLOAT_ADAPTER.validate_python(trade_price)
+        if not math.isfinite(trade_price):
+            raise ValueError("Trade price must be finite")
+        return cls(_next_trade_id(), timestamp_ns, quantity, trade_price, TradeSide(side))
+
+    @classmethod
+    def from_trade(cls, trade: Trade) -> "TradeRecord":
+        """Build a trade record from a `Trade`, keeping its trade ID."""
+
+        trade_id = trade.trade_id.int if trade.trade_id is not None else _next_trade_id()
+        return cls(trade_id, to_epoch_ns(trade.timestamp), trade.quantity, trade.trade_price,
+                   TradeSide(trade.side))
+
+    @property
+    def trade_uuid(self) -> uuid.UUID:
+        """Trade ID as the UUID used by `Trade`."""
+
+        return uuid.UUID(int=self.trade_id)
+
+    def to_trade(self) -> Trade:
+        """Build the validated `Trade` model for the record."""
+
+        return Trade(trade_id=self.trade_uuid, timestamp=from_epoch_ns(self.timestamp_ns),
+                     quantity=self.quantity, side=self.side, trade_price=self.trade_price)
+
+
+def _next_trade_id() -> int:
+    """
+    Return a random version 4 UUID as an integer, so IDs of trades recorded after a
+    journal recovery or snapshot load never repeat the recovered ones.
+    """
+
+    global _trade_ids
+    trade_id = next(_trade_ids, None)
+    if trade_id is None:
+        # High and low 64 bits of every ID, combined as Python ints
+        halves = np.frombuffer(new_trade_ids(_TRADE_ID_BLOCK), dtype='>u8') \
+            .reshape(-1, 2).astype(object)
+        _trade_ids = iter((halves[:, 0] * (1 << 64) + halves[:, 1]).tolist())
+        trade_id = next(_trade_ids)
+    return trade_id
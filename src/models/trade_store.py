@@ -0,0 +1,265 @@
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Iterator, List, Optional, Union, overload
+
+import numpy as np
+import pytz
+
+from src.models.trade import Trade
+from src.models.trade_side import TradeSide
+
+if TYPE_CHECKING:
+    from src.models.trade_record import TradeRecord
+
+# Time zone that trades built from the store are reported in
+DISPLAY_TIMEZONE = pytz.timezone('US/Eastern')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Side flags stored in the side column
+SIDE_FLAGS = {TradeSide.BUY: 0, TradeSide.SELL: 1}
+FLAG_SIDES = {flag: side for side, flag in SIDE_FLAGS.items()}
+
+TRADE_ID_SIZE = 16
+
+
+def to_epoch_ns(timestamp: datetime) -> int:
+    """
+    Convert a datetime to integer nanoseconds since the UNIX epoch.
+
+    Naive datetimes are taken to be in UTC.
+    """
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def from_epoch_ns(timestamp_ns: int, tz=DISPLAY_TIMEZONE) -> datetime:
+    """Convert integer nanoseconds since the UNIX epoch to an aware datetime in `tz`."""
+
+    return (EPOCH + timedelta(microseconds=timestamp_ns // 1000)).astimezone(tz)
+
+
+class TradeStore(Sequence):
+    """
+    Columnar, array-backed store of the trades of a single stock.
+
+    Every trade is kept as one entry in parallel typed arrays (epoch nanosecond
+    timestamps, quantities, prices and side flags) plus 16 bytes of trade ID, ordered by
+    timestamp. Indexing the store builds `Trade` objects on demand, so callers that only
+    need aggregates never pay for them.
+    """
+
+    __slots__ = ("timestamps", "quantities", "prices", "sides", "trade_ids")
+
+    def __init__(self) -> None:
+        self.timestamps = array('q')
+        self.quantities = array('q')
+        self.prices = array('d')
+        self.sides = array('b')
+        self.trade_ids = bytearray()
+
+    @classmethod
+    def from_buffers(cls, timestamps, quantities, prices, sides,
+                     trade_ids) -> "TradeStore":
+        """
+        Build a store reading its columns from existing buffers, such as a memory-mapped
+        snapshot, without copying them. The columns are copied into arrays the first
+        time trades are added or dropped.
+        """
+
+        store = cls.__new__(cls)
+        store.timestamps = memoryview(timestamps).cast('B').cast('q')
+        store.quantities = memoryview(quantities).cast('B').cast('q')
+        store.prices = memoryview(prices).cast('B').cast('d')
+        store.sides = memoryview(sides).cast('B').cast('b')
+        store.trade_ids = memoryview(trade_ids).cast('B')
+        return store
+
+    def _own_columns(self) -> None:
+        """Copy columns read from buffers into arrays, so they can be modified."""
+
+        for name in ("timestamps", "quantities", "prices", "sides"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.format, column))
+        self.trade_ids = bytearray(self.trade_ids)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @overload
+    def __getitem__(self, index: int) -> Trade: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Trade]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Trade, List[Trade]]:
+        if isinstance(index, slice):
+            return [self._build_trade(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trade index out of range")
+        return self._build_trade(index)
+
+    def __iter__(self) -> Iterator[Trade]:
+        for i in range(len(self)):
+            yield self._build_trade(i)
+
+    def __repr__(self) -> str:
+        return f"TradeStore(trades={len(self)}, nbytes={self.nbytes})"
+
+    def _build_trade(self, index: int) -> Trade:
+        """Build the `Trade` object stored at the given position."""
+
+        offset = index * TRADE_ID_SIZE
+        return Trade(
+            trade_id=uuid.UUID(bytes=bytes(self.trade_ids[offset:offset + TRADE_ID_SIZE])),
+            timestamp=from_epoch_ns(self.timestamps[index]),
+            quantity=self.quantities[index],
+            side=FLAG_SIDES[self.sides[index]],
+            trade_price=self.prices[index],
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes used by the trade columns."""
+
+        columns = (self.timestamps, self.quantities, self.prices, self.sides)
+        return sum(column.itemsize * len(column) for column in columns) + len(self.trade_ids)
+
+    @property
+    def bytes_per_trade(self) -> Optional[float]:
+        """Average number of bytes used per stored trade, None for an empty store."""
+
+        if not self:
+            return None
+        return self.nbytes / len(self)
+
+    def append(self, trade: Trade) -> int:
+        """Store a `Trade` and return the position it was stored at."""
+
+        trade_id = trade.trade_id if trade.trade_id is not None else uuid.uuid4()
+        return self.record(to_epoch_ns(trade.timestamp), trade.quantity, trade.trade_price,
+                           SIDE_FLAGS[TradeSide(trade.side)], trade_id.bytes)
+
+    def append_record(self, trade: "TradeRecord") -> int:
+        """Store a `TradeRecord` and return the position it was stored at."""
+
+        return self.record(trade.timestamp_ns, trade.quantity, trade.trade_price,
+                           SIDE_FLAGS[trade.side], trade.trade_id.to_bytes(TRADE_ID_SIZE, 'big'))
+
+    def record(self, timestamp_ns: int, quantity: int, trade_price: float, side: int,
+               trade_id: bytes) -> int:
+        """
+        Store a trade given as raw column values and return its position.
+
+        Trades arriving in timestamp order are appended, older trades are inserted at the
+        position that keeps the timestamp column sorted.
+        """
+
+        timestamps = self.timestamps
+        if type(timestamps) is memoryview:
+            self._own_columns()
+            timestamps = self.timestamps
+        if not timestamps or timestamp_ns >= timestamps[-1]:
+            timestamps.append(timestamp_ns)
+            self.quantities.append(quantity)
+            self.prices.append(trade_price)
+            self.sides.append(side)
+            self.trade_ids += trade_id
+            return len(timestamps) - 1
+
+        position = bisect_right(timestamps, timestamp_ns)
+        timestamps.insert(position, timestamp_ns)
+        self.quantities.insert(position, quantity)
+        self.prices.insert(position, trade_price)
+        self.sides.insert(position, side)
+        offset = position * TRADE_ID_SIZE
+        self.trade_ids[offset:offset] = trade_id
+        return position
+
+    def can_extend(self, timestamp_ns: int) -> bool:
+        """Check whether trades starting at `timestamp_ns` can be appended at the end."""
+
+        return not self.timestamps or timestamp_ns >= self.timestamps[-1]
+
+    def extend(self, timestamps, quantities, trade_prices, sides, trade_ids: bytes) -> int:
+        """
+        Append trades given as whole columns and return the position of the first one.
+
+        Columns are buffers matching the column types (int64 timestamps and quantities,
+        float64 prices, int8 side flags), sorted by timestamp and starting no earlier
+        than the last stored trade (see `can_extend`).
+        """
+
+        if type(self.timestamps) is memoryview:
+            self._own_columns()
+        position = len(self.timestamps)
+        self.timestamps.frombytes(memoryview(timestamps).cast('B'))
+        self.quantities.frombytes(memoryview(quantities).cast('B'))
+        self.prices.frombytes(memoryview(trade_prices).cast('B'))
+        self.sides.frombytes(memoryview(sides).cast('B'))
+        self.trade_ids += trade_ids
+        return position
+
+    def merge(self, timestamps, quantities, trade_prices, sides, trade_ids: bytes) -> int:
+        """
+        Merge trades given as whole columns into the store and return the position of the
+        first stored trade that moved or was added.
+
+        Columns are NumPy arrays as for `extend`, sorted by timestamp, but may start
+        before the last stored trade, e.g. late trades from another feed. Only the stored
+        trades from the oldest merged one on are rewritten, so trades that are a little
+        late cost the trades they land in front of, not a copy of the store, and a batch
+        costs one pass rather than one insertion per trade. Merged trades go after stored
+        trades with the same timestamp.
+        """
+
+        if type(self.timestamps) is memoryview:
+            self._own_columns()
+        position = bisect_right(self.timestamps, int(timestamps[0]))
+        columns = (("timestamps", timestamps, np.int64), ("quantities", quantities, np.int64),
+                   ("prices", trade_prices, np.float64), ("sides", sides, np.int8))
+        order = None
+        for name, values, dtype in columns:
+            column = getattr(self, name)
+            # Copied so the column has no exported buffer when it is resized
+            merged = np.concatenate((np.frombuffer(column, dtype=dtype)[position:].copy(),
+                                     np.asarray(values, dtype=dtype)))
+            if order is None:
+                order = np.argsort(merged, kind="stable")
+            del column[position:]
+            column.frombytes(merged[order].tobytes())
+        id_dtype = np.dtype(("V", TRADE_ID_SIZE))
+        merged_ids = np.concatenate((
+            np.frombuffer(self.trade_ids, dtype=id_dtype)[position:].copy(),
+            np.frombuffer(trade_ids, dtype=id_dtype)))
+        del self.trade_ids[position * TRADE_ID_SIZE:]
+        self.trade_ids += merged_ids[order].tobytes()
+        return position
+
+    def drop_front(self, count: int) -> "TradeStore":
+        """Remove the `count` oldest trades and return them as a new store."""
+
+        dropped = TradeStore()
+        if count <= 0:
+            return dropped
+        if type(self.timestamps) is memoryview:
+            self._own_columns()
+        for name in ("timestamps", "quantities", "prices", "sides"):
+            column = getattr(self, name)
+            setattr(dropped, name, column[:count])
+            del column[:count]
+        dropped.trade_ids = self.trade_ids[:count * TRADE_ID_SIZE]
+        del self.trade_ids[:count * TRADE_ID_SIZE]
+        return dropped
+
+    def bisect(self, timestamp_ns: int) -> int:
+        """Return the position of the first trade at or after `timestamp_ns`."""
+
+        return bisect_left(self.timestamps, timestamp_ns)
@@ -0,0 +1,182 @@
+from bisect import bisect_left
+from operator import mul
+from typing import Optional
+
+import numpy as np
+
+from src.models.order_flow import OrderFlow, side_sums
+from src.models.trade_store import TradeStore
+
+
+class TradeWindow:
+    """
+    Rolling aggregate of the trades of a `TradeStore` that fall inside a trailing time
+    window.
+
+    The window is a cursor over the time-ordered store together with running sums of
+    notional (trade_price * quantity) and quantity, and of the notional, quantity and
+    number of the SELL trades among them for the order flow. New trades are added to the
+    sums as they are stored and expired trades are evicted by moving the cursor forward,
+    so computing the VWSP is O(1) amortized no matter how many trades were recorded
+    before the window.
+    """
+
+    __slots__ = ("store", "lag_ns", "start", "seen", "_total_trade_value", "_total_quantity",
+                 "_sell_trade_value", "_sell_quantity", "_sell_count", "_threshold")
+
+    def __init__(self, store: TradeStore, lag_ns: int, now_ns: Optional[int] = None) -> None:
+        """
+        Build the window over the trades already in the store. Given `now_ns` only the
+        trades inside the window at that time are summed, the others never are.
+        """
+
+        self.store = store
+        self.lag_ns = lag_ns
+        # Position of the oldest trade inside the window
+        self.start = 0
+        # Number of stored trades the window has been told about
+        self.seen = len(store)
+        # Highest threshold the window was advanced to, trades before it were evicted
+        self._threshold: Optional[int] = None
+        if now_ns is not None:
+            self._threshold = now_ns - lag_ns
+            self.start = store.bisect(self._threshold)
+        quantities, prices = store.quantities[self.start:], store.prices[self.start:]
+        self._total_trade_value = float(sum(map(mul, prices, quantities)))
+        self._total_quantity = sum(quantities)
+        self._sell_trade_value, self._sell_quantity, self._sell_count = \
+            side_sums(quantities, prices, store.sides[self.start:])
+
+    def __len__(self) -> int:
+        return len(self.store) - self.start
+
+    def add(self, position: int) -> None:
+        """Add the trade just stored at `position` to the window."""
+
+        self.seen += 1
+        store = self.store
+        if self._threshold is not None and store.timestamps[position] < self._threshold:
+            # Already outside of the window, it was stored in front of the cursor
+            self.start += 1
+            return
+        quantity = store.quantities[position]
+        trade_value = store.prices[position] * quantity
+        self._total_trade_value += trade_value
+        self._total_quantity += quantity
+        if store.sides[position]:
+            self._sell_trade_value += trade_value
+            self._sell_quantity += quantity
+            self._sell_count += 1
+
+    def extend(self, position: int, count: int) -> None:
+        """Add `count` trades just appended to the end of the store at `position`."""
+
+        self.seen += count
+        store = self.store
+        end = position + count
+        if self._threshold is not None:
+            # Appended trades older than the threshold are still in front of the cursor
+            first_in_window = bisect_left(store.timestamps, self._threshold, position, end)
+            self.start += first_in_window - position
+            position = first_in_window
+        quantities, prices = store.quantities[position:end], store.prices[position:end]
+        self._total_trade_value += sum(map(mul, prices, quantities))
+        self._total_quantity += sum(quantities)
+        self._add_sells(*side_sums(quantities, prices, store.sides[position:end]))
+
+    def _add_sells(self, trade_value: float, quantity: int, count: int) -> None:
+        """Add to the sums of the SELL trades in the window."""
+
+        self._sell_trade_value += trade_value
+        self._sell_quantity += quantity
+        self._sell_count += count
+
+    def insert(self, timestamps: np.ndarray, quantities: np.ndarray,
+               trade_prices: np.ndarray, sides: np.ndarray) -> None:
+        """
+        Add trades given as NumPy columns that were just merged into the store, anywhere
+        relative to the stored trades (see `TradeStore.merge`).
+        """
+
+        self.seen += len(timestamps)
+        if self._threshold is not None:
+            inside = timestamps >= self._threshold
+            # Trades older than the threshold were stored in front of the cursor
+            self.start += len(timestamps) - int(np.count_nonzero(inside))
+            quantities, trade_prices, sides = \
+                quantities[inside], trade_prices[inside], sides[inside]
+        self._total_trade_value += float(np.dot(trade_prices, quantities))
+        self._total_quantity += int(quantities.sum())
+        sold = sides == 1
+        if sold.any():
+            self._add_sells(float(np.dot(trade_prices[sold], quantities[sold])),
+                            int(quantities[sold].sum()), int(np.count_nonzero(sold)))
+
+    def drop_front(self, count: int) -> None:
+        """
+        Account for the `count` oldest trades being removed from the store. They must
+        all be in front of the cursor, i.e. already evicted from the window.
+        """
+
+        if count > self.start:
+            raise ValueError("Cannot drop trades that are still inside the window")
+        self.start -= count
+        self.seen -= count
+
+    def can_answer(self, now_ns: int) -> bool:
+        """
+        Check whether the window still holds every trade needed for the given time.
+
+        Eviction only moves forward in time, so a query for an earlier time than the
+        window was already advanced to has to be answered from the store itself.
+        """
+
+        return self._threshold is None or now_ns - self.lag_ns >= self._threshold
+
+    def advance(self, now_ns: int) -> None:
+        """Evict the trades that are older than the window relative to `now_ns`."""
+
+        threshold = now_ns - self.lag_ns
+        if self._threshold is not None and threshold <= self._threshold:
+            return
+        self._threshold = threshold
+        store = self.store
+        timestamps, quantities, prices = store.timestamps, store.quantities, store.prices
+        start, end = self.start, len(store)
+        evicted = bisect_left(timestamps, threshold, start, end)
+        if evicted > start:
+            expired, expired_prices = quantities[start:evicted], prices[start:evicted]
+            self._total_trade_value -= sum(map(mul, expired_prices, expired))
+            self._total_quantity -= sum(expired)
+            trade_value, quantity, count = side_sums(expired, expired_prices,
+                                                     store.sides[start:evicted])
+            self._add_sells(-trade_value, -quantity, -count)
+        self.start = start = evicted
+        if start == end:
+            # Drop any floating point residue left over by the subtractions
+            self._total_trade_value = 0.0
+            self._total_quantity = 0
+        if not self._sell_count:
+            self._sell_trade_value = 0.0
+
+    def volume_weighted_stock_price(self, now_ns: int) -> Optional[float]:
+        """
+        Advance the window to `now_ns` and return the VWSP of the trades inside it.
+
+        Returns None if there are no trades in the window or their quantities do not sum to
+        a positive total, like `PrefixSums.volume_weighted_stock_price`.
+        """
+
+        self.advance(now_ns)
+        if self.start == len(self.store) or self._total_quantity <= 0:
+            return None
+        return self._total_trade_value / self._total_quantity
+
+    def order_flow(self, now_ns: int) -> OrderFlow:
+        """Advance the window to `now_ns` and return the order flow of its trades."""
+
+        self.advance(now_ns)
+        sell_volume, sell_value = self._sell_quantity, self._sell_trade_value
+        return OrderFlow(self._total_quantity - sell_volume, sell_volume,
+                         self._total_trade_value - sell_value, sell_value,
+                         len(self) - self._sell_count, self._sell_count)
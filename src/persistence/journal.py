@@ -0,0 +1,310 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from src.models.stock_market import StockMarket
+from src.models.trade_record import TradeRecord
+from src.models.trade_store import SIDE_FLAGS
+from src.persistence.snapshot import fsync_directory, load_snapshot, read_snapshot_metadata, \
+    write_snapshot
+
+log = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+# Trades in a journal, one 48 byte little-endian record each
+JOURNAL_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("quantity", "<i8"),
+    ("trade_price", "<f8"),
+    ("trade_id", "V16"),
+    ("symbol", "S5"),
+    ("side", "i1"),
+    ("padding", "V2"),
+])
+_RECORD = struct.Struct("<qqd16s5sb2x")
+
+# A journal starts with its magic and generation, a uint64 bumped by every checkpoint
+JOURNAL_MAGIC = b"SSSMJRN1"
+_JOURNAL_HEADER = struct.Struct("<8sQ")
+
+DEFAULT_MAX_BATCH = 4096
+# Longest a trade waits for the fsync of its group, in seconds
+DEFAULT_MAX_DELAY = 0.005
+
+
+class JournalContents(NamedTuple):
+    """Generation of a journal and its trade records, a view of the memory-mapped file."""
+
+    generation: int
+    records: np.ndarray
+
+
+def read_journal(path: PathLike) -> Optional[JournalContents]:
+    """
+    Memory-map a journal, returning None if it does not exist. The records are not
+    copied, a partly written record at the end is ignored.
+    """
+
+    path = Path(path)
+    if not path.exists():
+        return None
+    with path.open("rb") as file:
+        if os.fstat(file.fileno()).st_size < _JOURNAL_HEADER.size:
+            raise ValueError(f"Truncated header in {path}")
+        memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, generation = _JOURNAL_HEADER.unpack_from(memory)
+    if magic != JOURNAL_MAGIC:
+        memory.close()
+        raise ValueError(f"Not a trade journal: {path}")
+    count = (len(memory) - _JOURNAL_HEADER.size) // JOURNAL_DTYPE.itemsize
+    return JournalContents(generation, np.frombuffer(memory, dtype=JOURNAL_DTYPE, count=count,
+                                                     offset=_JOURNAL_HEADER.size))
+
+
+def to_records(symbol: str, timestamps, quantities, trade_prices, sides,
+               trade_ids: bytes) -> np.ndarray:
+    """Build journal records for trades of one stock given as columns."""
+
+    records = np.zeros(len(timestamps), dtype=JOURNAL_DTYPE)
+    records["timestamp"] = timestamps
+    records["quantity"] = quantities
+    records["trade_price"] = trade_prices
+    records["side"] = sides
+    records["symbol"] = symbol.encode("ascii")
+    records["trade_id"] = np.frombuffer(trade_ids, dtype="V16")
+    return records
+
+
+class TradeJournal:
+    """
+    Append-only write-ahead journal of recorded trades.
+
+    Appended trades are buffered and written with a single write and fsync per group:
+    once `max_batch` trades are waiting, or at the latest `max_delay` seconds after
+    being appended, from a background thread. A crash loses at most the trades of the
+    group not yet committed. Call `commit` to make every appended trade durable.
+
+    Opening an existing journal keeps its records, dropping a partly written one at the
+    end. Safe to use from several threads.
+    """
+
+    def __init__(self, path: PathLike, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_delay: Optional[float] = DEFAULT_MAX_DELAY, fsync: bool = True) -> None:
+        self.path = Path(path)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.committed = 0
+        self._pending: List[bytes] = []
+        self._pending_count = 0
+        # Guards the pending buffer, appenders never wait for a write to the file
+        self._lock = threading.Lock()
+        # Serialises writes to the file, so groups are written in the order taken
+        self._io_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        contents = read_journal(self.path)
+        if contents is None:
+            self.generation = 0
+            self._file = self.path.open("wb")
+            self._write_header()
+            fsync_directory(self.path)
+        else:
+            self.generation = contents.generation
+            self.committed = len(contents.records)
+            del contents
+            self._file = self.path.open("r+b")
+            self._file.truncate(_JOURNAL_HEADER.size + self.committed * JOURNAL_DTYPE.itemsize)
+            self._file.seek(0, os.SEEK_END)
+
+        self._flusher: Optional[threading.Thread] = None
+        if max_delay is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically,
+                                             name="trade-journal", daemon=True)
+            self._flusher.start()
+
+    def __enter__(self) -> "TradeJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _write_header(self) -> None:
+        self._file.write(_JOURNAL_HEADER.pack(JOURNAL_MAGIC, self.generation))
+        self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, symbol: str, trade: TradeRecord) -> None:
+        """Append a trade recorded for the given stock."""
+
+        record = _RECORD.pack(trade.timestamp_ns, trade.quantity, trade.trade_price,
+                              trade.trade_id.to_bytes(16, 'big'), symbol.encode("ascii"),
+                              SIDE_FLAGS[trade.side])
+        self._buffer(record, 1)
+
+    def append_columns(self, symbol: str, timestamps, quantities, trade_prices, sides,
+                       trade_ids: bytes) -> None:
+        """Append trades recorded for the given stock, given as columns."""
+
+        if len(timestamps):
+            self._buffer(to_records(symbol, timestamps, quantities, trade_prices, sides,
+                                    trade_ids).tobytes(), len(timestamps))
+
+    def _buffer(self, data: bytes, count: int) -> None:
+        with self._lock:
+            if self._file is None:
+                raise ValueError("Trade journal is closed")
+            self._pending.append(data)
+            self._pending_count += count
+            full = self._pending_count >= self.max_batch
+        if full:
+            self.commit()
+
+    def commit(self) -> int:
+        """Write and fsync every appended trade, returning how many were committed."""
+
+        with self._io_lock:
+            with self._lock:
+                pending, count = self._pending, self._pending_count
+                self._pending, self._pending_count = [], 0
+            if not count or self._file is None:
+                return 0
+            self._file.write(b"".join(pending))
+            self._sync()
+            self.committed += count
+        return count
+
+    def reset(self, generation: int) -> None:
+        """Empty the journal, starting the given generation. Used by checkpoints."""
+
+        with self._io_lock, self._lock:
+            self._pending, self._pending_count = [], 0
+            self._file.seek(0)
+            self._file.truncate()
+            self.generation = generation
+            self.committed = 0
+            self._write_header()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.max_delay):
+            try:
+                self.commit()
+            except Exception:
+                log.exception("Trade journal commit failed")
+
+    def close(self) -> None:
+        """Commit the trades waiting for it and close the journal."""
+
+        if self._file is None:
+            return
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.commit()
+        with self._io_lock, self._lock:
+            self._file.close()
+            self._file = None
+
+
+def checkpoint(market: StockMarket, journal: TradeJournal, path: PathLike) -> int:
+    """Write a snapshot of the market as its checkpoint, then empty the journal.
+
+    Bounds the replay time of recovery to the trades recorded since the checkpoint.
+    Trades must not be recorded meanwhile. The snapshot (see `write_snapshot`) replaces
+    the previous one atomically and is tagged with the journal generation that follows
+    it: if the process dies before the journal was emptied, recovery sees the stale
+    generation and skips it. Returns the number of trades written.
+    """
+    journal.commit()
+    generation = journal.generation + 1
+    write_snapshot(market, path, extra={"journal_generation": generation})
+    journal.reset(generation)
+
+    written = sum(len(stock.trades) for stock in market.stocks.values())
+    log.info("Checkpointed %d trades to %s", written, path)
+    return written
+
+
+def replay_records(market: StockMarket, records: np.ndarray) -> int:
+    """
+    Record journal records into the market, in bulk per stock, returning their number.
+    Raises a ValueError for records of a stock the market does not have.
+    """
+
+    if not len(records):
+        return 0
+    # Symbols are at most 5 bytes, padded to 8 they sort and group as integers
+    codes = records["symbol"].astype("S8").view("<u8")
+    symbols, groups = np.unique(codes, return_inverse=True)
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(len(symbols) + 1))
+
+    for group, code in enumerate(symbols):
+        symbol = code.tobytes().rstrip(b"\0").decode()
+        stock = market.stocks.get(symbol)
+        if stock is None:
+            raise ValueError(f"Stock symbol not found: {symbol}")
+        rows = order[bounds[group]:bounds[group + 1]]
+        timestamps = records["timestamp"][rows]
+        if np.any(timestamps[1:] < timestamps[:-1]):
+            rows = rows[np.argsort(timestamps, kind="stable")]
+            timestamps = records["timestamp"][rows]
+        stock.record_trade_columns(
+            timestamps, records["quantity"][rows], records["trade_price"][rows],
+            records["side"][rows], records["trade_id"][rows].tobytes())
+    return len(records)
+
+
+def recover_market(journal_path: PathLike, checkpoint_path: Optional[PathLike] = None,
+                   market: Optional[StockMarket] = None,
+                   now: Optional[datetime] = None) -> StockMarket:
+    """Rebuild a market from its last checkpoint and the journal that follows it.
+
+    The checkpoint is loaded from its snapshot without copying its trades, and the
+    journal is memory-mapped and recorded in bulk per stock. Without a `market`, the
+    market of the checkpoint is returned, otherwise the checkpoint's stocks are added
+    to `market`, which must hold every other stock the journal has trades for. The
+    index and the VWSP windows are rebuilt for `now`, the time of the market's clock by
+    default, summing only the trades inside them. Attach a `TradeJournal` to the market to keep journaling.
+    """
+    replayed = 0
+    checkpoint_generation = None
+    if checkpoint_path is not None and Path(checkpoint_path).exists():
+        checkpoint_generation = read_snapshot_metadata(checkpoint_path)["extra"].get(
+            "journal_generation")
+        restored = load_snapshot(checkpoint_path)
+        if market is None:
+            market = restored
+        else:
+            for stock in restored.stocks.values():
+                market.add_stock(stock)
+        replayed += sum(len(stock.trades) for stock in restored.stocks.values())
+    if market is None:
+        market = StockMarket()
+
+    journal = read_journal(journal_path)
+    if journal is not None:
+        if checkpoint_generation is not None and journal.generation < checkpoint_generation:
+            # The checkpoint was written but the journal not emptied, finish the job
+            log.info("Emptying journal %s, its trades are all in the checkpoint", journal_path)
+            del journal
+            with TradeJournal(journal_path, max_delay=None) as stale:
+                stale.reset(checkpoint_generation)
+        else:
+            replayed += replay_records(market, journal.records)
+
+    market.all_share_index(now)
+    log.info("Recovered %d trades", replayed)
+    return market
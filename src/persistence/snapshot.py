@@ -0,0 +1,159 @@
+import json
+import logging
+import mmap
+import os
+import struct
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Optional, Type, Union
+
+import numpy as np
+
+from src.models.bar import Bar
+from src.models.stock_market import StockMarket
+from src.models.trade_store import TRADE_ID_SIZE, TradeStore
+
+log = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+SNAPSHOT_MAGIC = b"SSSMSNP1"
+SNAPSHOT_VERSION = 1
+# Magic, version and length of the JSON metadata that follows
+_HEADER = struct.Struct("<8sIQ")
+# Columns start on cache line boundaries
+_ALIGNMENT = 64
+
+# Trade columns of a snapshot, in file order, with their item size
+SNAPSHOT_COLUMNS = (
+    ("timestamps", np.dtype("<i8")),
+    ("quantities", np.dtype("<i8")),
+    ("prices", np.dtype("<f8")),
+    ("trade_ids", np.dtype(("V", TRADE_ID_SIZE))),
+    ("sides", np.dtype("i1")),
+)
+
+
+def _aligned(offset: int) -> int:
+    return offset + -offset % _ALIGNMENT
+
+
+def fsync_directory(path: Path) -> None:
+    """Make the creation or renaming of a file in the directory durable."""
+
+    descriptor = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _column(store: TradeStore, name: str) -> memoryview:
+    """Raw bytes of a column of a store."""
+
+    return memoryview(getattr(store, name)).cast('B')
+
+
+def write_snapshot(market: StockMarket, path: PathLike,
+                   extra: Optional[Dict[str, Any]] = None) -> int:
+    """Write the market's stocks and trades to a snapshot file, returning its size.
+
+    The stocks' static data, the market's settings, the compacted bars and `extra` are
+    stored as JSON, followed by the trades of every stock as whole columns: each column
+    holds the trades of all stocks back to back, in the order of `market.stocks`. The
+    file is written to a temporary name, fsynced and renamed, so a crash never leaves a
+    partial snapshot behind. Trades must not be recorded meanwhile.
+    """
+    path = Path(path)
+    stores = [stock.trades for stock in market.stocks.values()]
+    total = sum(len(store) for store in stores)
+
+    offsets = {}
+    offset = 0
+    for name, dtype in SNAPSHOT_COLUMNS:
+        offsets[name] = offset
+        offset = _aligned(offset + total * dtype.itemsize)
+    metadata = json.dumps({
+        "market": market.model_dump(mode="json"),
+        "trades": [len(store) for store in stores],
+        "bars": [[bar.model_dump() for bar in stock.bars] for stock in market.stocks.values()],
+        "columns": offsets,
+        "extra": extra or {},
+    }).encode()
+    data_start = _aligned(_HEADER.size + len(metadata))
+
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("wb") as file:
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(metadata)))
+        file.write(metadata)
+        for name, _ in SNAPSHOT_COLUMNS:
+            file.seek(data_start + offsets[name])
+            for store in stores:
+                file.write(_column(store, name))
+        file.truncate(data_start + offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    fsync_directory(path)
+
+    log.info("Wrote snapshot of %d stocks and %d trades to %s", len(stores), total, path)
+    return data_start + offset
+
+
+def _read_metadata(data: bytes, path: PathLike) -> Dict[str, Any]:
+    magic, version, length = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"Not a market snapshot: {path}")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}: {path}")
+    return json.loads(data[_HEADER.size:_HEADER.size + length])
+
+
+def read_snapshot_metadata(path: PathLike) -> Dict[str, Any]:
+    """Read the JSON metadata of a snapshot, without its trades."""
+
+    with Path(path).open("rb") as file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Not a market snapshot: {path}")
+        return _read_metadata(header + file.read(_HEADER.unpack(header)[2]), path)
+
+
+def load_snapshot(path: PathLike, market_type: Type[StockMarket] = StockMarket) \
+        -> StockMarket:
+    """Restore a market written by `write_snapshot`.
+
+    The file is memory-mapped read-only and every stock's trade store reads its
+    columns straight from the mapping: nothing is copied until trades are added to or
+    evicted from a stock, which then copies that stock's columns only. Processes
+    loading the same snapshot share its pages through the page cache. The VWSP windows
+    and the index are rebuilt on first use.
+    """
+    with Path(path).open("rb") as file:
+        memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    metadata = _read_metadata(memory, path)
+    market = market_type.model_validate(metadata["market"])
+
+    data_start = _aligned(_HEADER.size + _HEADER.unpack_from(memory)[2])
+    total = sum(metadata["trades"])
+    columns = {name: np.frombuffer(memory, dtype=dtype, count=total,
+                                   offset=data_start + metadata["columns"][name])
+               for name, dtype in SNAPSHOT_COLUMNS}
+
+    start = 0
+    for stock, count, bars in zip(market.stocks.values(), metadata["trades"],
+                                  metadata["bars"]):
+        end = start + count
+        if count:
+            stock._trades = TradeStore.from_buffers(
+                columns["timestamps"][start:end], columns["quantities"][start:end],
+                columns["prices"][start:end], columns["sides"][start:end],
+                columns["trade_ids"][start:end])
+            stock._rebuild_bar_series()
+        if bars:
+            stock._bars = deque(Bar(**bar) for bar in bars)
+        start = end
+
+    log.info("Loaded snapshot of %d stocks and %d trades from %s", len(market.stocks),
+             total, path)
+    return market
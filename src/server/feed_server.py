@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from src.models.stock_market import StockMarket
+from src.server.protocol import MAX_LINE_LENGTH, ProtocolError, QueryRequest, TradeRequest, \
+    format_ack, format_error, format_result, parse_request
+
+log = logging.getLogger(__name__)
+
+# Bytes read from a connection at a time, every complete line read is processed at once
+READ_SIZE = 64 * 1024
+
+
+class FeedServer:
+    """
+    asyncio TCP server feeding trades into a market and answering queries about it.
+
+    Speaks the newline delimited protocol of `src.server.protocol`. Connections are read
+    in chunks, and the trades read from every connection in one turn of the event loop
+    are recorded in a single `record_trades` call, each connection's run acknowledged
+    by one line, so clients can pipeline requests without waiting for answers. A
+    connection is not read again until its answers have been sent, which pushes back
+    on clients that do not read them.
+
+    The market is only used from the event loop's thread.
+    """
+
+    def __init__(self, market: StockMarket, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.market = market
+        self.host = host
+        self.port = port
+        self.trades_recorded = 0
+        # Runs of trades waiting to be recorded, with the future their rejects are set on
+        self._pending: List[Tuple[List[TradeRequest], asyncio.Future]] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> Tuple[str, int]:
+        """Start listening, returning the address actually bound."""
+
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        log.info("Trade feed server listening on %s:%d", self.host, self.port)
+        return self.host, self.port
+
+    async def serve_forever(self) -> None:
+        """Start the server if needed and serve until cancelled."""
+
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections."""
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Process the requests of one connection until it closes."""
+
+        peer = writer.get_extra_info("peername")
+        log.debug("Feed connection from %s", peer)
+        number = 0
+        pending = b""
+        try:
+            while data := await reader.read(READ_SIZE):
+                pending += data
+                *lines, pending = pending.split(b"\n")
+                if len(pending) > MAX_LINE_LENGTH:
+                    writer.write(format_error(number + 1, "Request line too long"))
+                    break
+                number, responses = await self.process(number, lines)
+                if responses:
+                    writer.write(b"".join(responses))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            log.debug("Feed connection from %s closed", peer)
+
+    async def process(self, number: int, lines: List[bytes]) -> Tuple[int, List[bytes]]:
+        """
+        Process request lines following request `number`, returning the number of the
+        last request and the response lines.
+        """
+
+        responses: List[bytes] = []
+        trades: List[TradeRequest] = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            number += 1
+            try:
+                request = parse_request(number, line)
+            except ProtocolError as error:
+                responses.append(format_error(number, str(error)))
+                continue
+            if isinstance(request, TradeRequest):
+                trades.append(request)
+                continue
+            # Queries see every trade sent before them
+            await self._record(trades, responses)
+            trades = []
+            responses.append(self._answer(request))
+        await self._record(trades, responses)
+        return number, responses
+
+    async def _record(self, trades: List[TradeRequest], responses: List[bytes]) -> None:
+        """Record a run of trade requests and acknowledge it."""
+
+        if not trades:
+            return
+        future = asyncio.get_running_loop().create_future()
+        if not self._pending:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._pending.append((trades, future))
+        for row, reason in await future:
+            responses.append(format_error(trades[row].number, reason))
+        responses.append(format_ack(trades[-1].number))
+
+    def _flush(self) -> None:
+        """
+        Record the trades submitted by every connection since the last flush in one
+        batch, and hand each connection the rows of its trades that were rejected.
+        """
+
+        pending, self._pending = self._pending, []
+        trades = [trade for run, _ in pending for trade in run]
+        try:
+            result = self.market.record_trades({
+                "symbol": [trade.symbol for trade in trades],
+                "quantity": [trade.quantity for trade in trades],
+                "trade_price": [trade.trade_price for trade in trades],
+                "side": [trade.side for trade in trades],
+            })
+        except Exception as error:
+            for _, future in pending:
+                future.set_exception(error)
+            return
+        self.trades_recorded += result.accepted
+
+        rejected = iter(result.rejected)
+        reject = next(rejected, None)
+        offset = 0
+        for run, future in pending:
+            end = offset + len(run)
+            rows = []
+            while reject is not None and reject.row < end:
+                rows.append((reject.row - offset, reject.reason))
+                reject = next(rejected, None)
+            future.set_result(rows)
+            offset = end
+
+    def _answer(self, query: QueryRequest) -> bytes:
+        """Answer a query."""
+
+        if query.name == "INDEX":
+            return format_result(query.number, self.market.all_share_index())
+        stock = self.market.stocks.get(query.symbol)
+        if stock is None:
+            return format_error(query.number, "Stock symbol not found")
+        try:
+            if query.name == "VWSP":
+                value = stock.volume_weighted_stock_price()
+            elif query.name == "DY":
+                value = stock.dividend_yield(query.price)
+            else:
+                value = stock.pe_ratio(query.price)
+        except ValueError as error:
+            return format_error(query.number, str(error))
+        return format_result(query.number, value)
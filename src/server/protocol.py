@@ -0,0 +1,107 @@
+"""
+Newline delimited text protocol of the trade feed server.
+
+Every request is one line of space separated fields, numbered from 1 per connection
+in the order sent (blank lines are ignored):
+
+    T <symbol> <quantity> <trade_price> <side>   record a trade
+    Q VWSP <symbol>                              volume weighted stock price
+    Q DY <symbol> <price>                        dividend yield
+    Q PE <symbol> <price>                        P/E ratio
+    Q INDEX                                      GBCE All Share Index
+
+Trades are not answered one by one. Once the server has recorded the trades it has
+read, it sends a cumulative acknowledgement with the number of the last one, after an
+error line for each trade that was rejected. Queries are answered in order with the
+number of the query:
+
+    A <number>               every trade up to <number> was processed
+    R <number> <value>       answer to a query, NONE if the value is undefined
+    E <number> <reason>      the request was rejected
+"""
+from typing import NamedTuple, Optional, Tuple, Union
+
+TRADE = b"T"
+QUERY = b"Q"
+
+QUERIES = {"VWSP": 1, "DY": 2, "PE": 2, "INDEX": 0}
+
+# Longest request line accepted, longer lines close the connection
+MAX_LINE_LENGTH = 1024
+
+
+class ProtocolError(ValueError):
+    """A request line that cannot be parsed."""
+
+
+class TradeRequest(NamedTuple):
+    """Trade to record, fields are validated by the market."""
+
+    number: int
+    symbol: str
+    quantity: str
+    trade_price: str
+    side: str
+
+
+class QueryRequest(NamedTuple):
+    """Query for one of `QUERIES`, with its symbol and price where it takes them."""
+
+    number: int
+    name: str
+    symbol: Optional[str] = None
+    price: Optional[float] = None
+
+
+Request = Union[TradeRequest, QueryRequest]
+
+
+def parse_request(number: int, line: bytes) -> Request:
+    """Parse a request line, without its line break. Raises a ProtocolError if invalid."""
+
+    fields = line.decode("ascii", errors="replace").split()
+    kind = fields[0] if fields else ""
+    if kind == "T":
+        if len(fields) != 5:
+            raise ProtocolError("Trade needs symbol, quantity, trade price and side")
+        return TradeRequest(number, *fields[1:])
+    if kind == "Q":
+        if len(fields) < 2 or fields[1] not in QUERIES:
+            raise ProtocolError(f"Query must be one of {', '.join(QUERIES)}")
+        name, arguments = fields[1], fields[2:]
+        if len(arguments) != QUERIES[name]:
+            raise ProtocolError(f"Query {name} takes {QUERIES[name]} arguments")
+        symbol = arguments[0] if arguments else None
+        price = None
+        if len(arguments) > 1:
+            try:
+                price = float(arguments[1])
+            except ValueError:
+                raise ProtocolError(f"Invalid price: {arguments[1]!r}") from None
+        return QueryRequest(number, name, symbol, price)
+    raise ProtocolError(f"Unknown request {kind!r}")
+
+
+def format_ack(number: int) -> bytes:
+    """Acknowledge every trade up to request `number`."""
+
+    return b"A %d\n" % number
+
+
+def format_result(number: int, value: Optional[float]) -> bytes:
+    """Answer query `number`."""
+
+    return b"R %d %s\n" % (number, b"NONE" if value is None else repr(value).encode())
+
+
+def format_error(number: int, reason: str) -> bytes:
+    """Reject request `number`, the reason is kept on one line."""
+
+    return b"E %d %s\n" % (number, " ".join(reason.split()).encode("ascii", "replace"))
+
+
+def parse_response(line: bytes) -> Tuple[str, int, Optional[str]]:
+    """Split a response line into its kind, request number and rest, for clients."""
+
+    kind, number, *rest = line.split(b" ", 2)
+    return kind.decode(), int(number), rest[0].decode().rstrip("\n") if rest else None
@@ -1,12 +1,23 @@
 import logging
-import time
+from pathlib import Path
+from typing import Union
 
-from src.models.stock import Stock
-from src.models.stock_market import StockMarket
-from src.models.stock_type import StockType
+from src.feeds.reference_data import iter_stocks, read_market_definition, \
+    validate_stock_definitions
+from src.models.stock_market import StockMarket, paused_gc
 
 log = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+# Stocks of the sample market
+SAMPLE_STOCKS = [
+    {"symbol": "TEA", "type": "COMMON", "last_dividend": 0, "par_value": 100},
+    {"symbol": "POP", "type": "COMMON", "last_dividend": 8, "par_value": 100},
+    {"symbol": "ALE", "type": "COMMON", "last_dividend": 23, "par_value": 60},
+    {"symbol": "JOE", "type": "COMMON", "last_dividend": 13, "par_value": 250},
+    {"symbol": "GIN", "type": "PREFERRED", "last_dividend": 8, "fixed_dividend": 0.02,
+     "par_value": 100},
+]
 
 
 def set_up_stock_market() -> StockMarket:
@@ -18,23 +29,29 @@ def set_up_stock_market() -> StockMarket:
     """
 
     market = StockMarket()
-    market.add_stock(Stock(symbol="TEA", type=StockType.COMMON, last_dividend=0,
-                           par_value=100))
-    market.add_stock(Stock(symbol="POP", type=StockType.COMMON, last_dividend=8,
-                           par_value=100))
-    market.add_stock(Stock(symbol="ALE", type=StockType.COMMON, last_dividend=23,
-                           par_value=60))
-    market.add_stock(Stock(symbol="JOE", type=StockType.COMMON, last_dividend=13,
-                           par_value=250))
-    market.add_stock(Stock(symbol="GIN", type=StockType.PREFERRED, last_dividend=8,
-                           fixed_dividend=0.02, par_value=100))
+    market.add_stocks(iter_stocks(validate_stock_definitions(SAMPLE_STOCKS)))
 
     log.info("Stock market initialized")
-    log.info(f"Supported stocks: {','.join(market.get_supported_stocks())}")
-
-    # Adding delay for logs to show up in order as it is a CLI
-    time.sleep(0.5)
+    log.info("Supported stocks: %s", ','.join(market.get_supported_stocks()))
 
     return market
 
 
+def load_stock_market(path: Union[str, Path]) -> StockMarket:
+    """
+    Loads a stock market from a stock definition file, see `read_market_definition`.
+
+    Every definition is validated before any stock is built, and stocks are built
+    without validating them again, so large universes load quickly.
+
+    Returns:
+        StockMarket: A StockMarket object with the defined stocks, without trades.
+    """
+
+    with paused_gc():
+        stocks, settings = read_market_definition(path)
+        market = StockMarket.model_validate(settings)
+        market.add_stocks(iter_stocks(validate_stock_definitions(stocks)))
+
+    log.info("Loaded %d stocks from %s", len(market.stocks), path)
+    return market
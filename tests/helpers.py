@@ -0,0 +1,20 @@
+from bisect import bisect_right
+from typing import Optional
+
+from src.models.stock import STOCK_DEFAULT_TIME_LAG_NS, Stock
+
+
+def scan_volume_weighted_stock_price(stock: Stock, now_ns: int) -> Optional[float]:
+    """
+    Reference VWSP of a stock at `now_ns`, scanning every trade of its window, to check
+    the rolling window and prefix sums against.
+    """
+
+    store = stock.trades
+    start = store.bisect(now_ns - STOCK_DEFAULT_TIME_LAG_NS)
+    end = bisect_right(store.timestamps, now_ns, start)
+    quantities = store.quantities[start:end]
+    total_quantity = sum(quantities)
+    if total_quantity <= 0:
+        return None
+    return sum(p * q for p, q in zip(store.prices[start:end], quantities)) / total_quantity
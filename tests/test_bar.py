@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.models.bar import Bar, BarSeries, build_bars
+
+MINUTE_NS = 60 * 1_000_000_000
+
+
+class TestBar:
+    """Unit tests for Bar and build_bars"""
+
+    def test_build_bars(self) -> None:
+        """
+        Test that trades are grouped into bars by interval with OHLCV values.
+        """
+
+        timestamps = np.array([0, 10, 20, MINUTE_NS + 5, 3 * MINUTE_NS], dtype=np.int64)
+        quantities = np.array([100, 50, 10, 20, 5], dtype=np.int64)
+        trade_prices = np.array([10.0, 12.0, 9.0, 11.0, 13.0])
+        sides = np.array([0, 1, 0, 1, 0], dtype=np.int8)
+
+        bars = build_bars(timestamps, quantities, trade_prices, sides, MINUTE_NS)
+
+        assert [bar.start_ns for bar in bars] == [0, MINUTE_NS, 3 * MINUTE_NS]
+        first = bars[0]
+        assert (first.open, first.high, first.low, first.close) == (10.0, 12.0, 9.0, 9.0)
+        assert first.volume == 160
+        assert first.buy_volume == 110
+        assert first.sell_volume == 50
+        assert first.trade_count == 3
+        assert math.isclose(first.vwap, (1000.0 + 600.0 + 90.0) / 160)
+        assert bars[1].sell_volume == 20
+        assert bars[2].trade_count == 1
+
+    def test_build_bars_empty(self) -> None:
+        """No trades build no bars."""
+
+        empty = np.array([], dtype=np.int64)
+        assert build_bars(empty, empty, np.array([]), np.array([], dtype=np.int8),
+                          MINUTE_NS) == []
+
+    def test_merge(self) -> None:
+        """
+        Test that merging a later bar of the same interval combines the summaries.
+        """
+
+        bar = Bar(start_ns=0, duration_ns=MINUTE_NS, open=10.0, high=12.0, low=9.0, close=11.0,
+                  volume=10, notional=105.0, buy_volume=10, trade_count=2)
+        bar.merge(Bar(start_ns=0, duration_ns=MINUTE_NS, open=8.0, high=8.5, low=8.0,
+                      close=8.5, volume=10, notional=82.5, sell_volume=10, trade_count=2))
+
+        assert (bar.open, bar.high, bar.low, bar.close) == (10.0, 12.0, 8.0, 8.5)
+        assert bar.volume == 20
+        assert bar.trade_count == 4
+        assert (bar.buy_volume, bar.sell_volume) == (10, 10)
+        assert math.isclose(bar.vwap, 187.5 / 20)
+
+    def test_vwap_without_volume(self) -> None:
+        """A bar without volume has no VWAP."""
+
+        bar = Bar(start_ns=0, duration_ns=MINUTE_NS, open=1.0, high=1.0, low=1.0, close=1.0)
+        assert bar.vwap is None
+
+
+class TestBarSeries:
+    """Unit tests for BarSeries"""
+
+    def test_add(self) -> None:
+        """
+        Test that trades added one by one build the same bars as build_bars.
+        """
+
+        rng = np.random.default_rng(7)
+        timestamps = np.sort(rng.integers(0, 10 * MINUTE_NS, 500))
+        quantities = rng.integers(1, 100, 500)
+        trade_prices = rng.uniform(90.0, 110.0, 500)
+        sides = rng.integers(0, 2, 500).astype(np.int8)
+
+        series = BarSeries(MINUTE_NS, 100)
+        for row in zip(timestamps.tolist(), quantities.tolist(), trade_prices.tolist(),
+                       sides.tolist()):
+            series.add(*row)
+
+        expected = build_bars(timestamps, quantities, trade_prices, sides, MINUTE_NS)
+        assert len(series) == len(expected)
+        for bar, expected_bar in zip(series.latest(), expected):
+            assert bar.model_dump(exclude={"notional"}) == \
+                expected_bar.model_dump(exclude={"notional"})
+            assert math.isclose(bar.notional, expected_bar.notional)
+
+    def test_add_columns(self) -> None:
+        """
+        Test that batches of trades are folded into the bars already kept.
+        """
+
+        series = BarSeries(MINUTE_NS, 10)
+        series.add(5, 10, 10.0, 0)
+        series.add_columns(np.array([10, MINUTE_NS], dtype=np.int64), np.array([20, 30]),
+                           np.array([12.0, 8.0]), np.array([1, 0], dtype=np.int8))
+
+        first, second = series.latest()
+        assert (first.open, first.high, first.close, first.volume) == (10.0, 12.0, 12.0, 30)
+        assert (first.buy_volume, first.sell_volume, first.trade_count) == (10, 20, 2)
+        assert (second.start_ns, second.open, second.volume) == (MINUTE_NS, 8.0, 30)
+
+    def test_late_trades(self) -> None:
+        """
+        Test that late trades update the bar of their interval, keeping open and close
+        by timestamp, or get a bar of their own in order.
+        """
+
+        series = BarSeries(MINUTE_NS, 3)
+        series.add(MINUTE_NS + 20, 1, 10.0, 0)
+        series.add(3 * MINUTE_NS, 1, 11.0, 0)
+        series.add(MINUTE_NS + 10, 1, 9.0, 1)
+        series.add(2 * MINUTE_NS, 1, 12.0, 0)
+
+        bars = series.latest()
+        assert [bar.start_ns for bar in bars] == [MINUTE_NS, 2 * MINUTE_NS, 3 * MINUTE_NS]
+        assert (bars[0].open, bars[0].close, bars[0].low, bars[0].sell_volume) == \
+            (9.0, 10.0, 9.0, 1)
+
+        # Older than every bar kept, in a full ring
+        series.add(5, 1, 1.0, 0)
+        assert [bar.start_ns for bar in series.latest()] == \
+            [MINUTE_NS, 2 * MINUTE_NS, 3 * MINUTE_NS]
+
+    def test_ring_buffer(self) -> None:
+        """
+        Test that only the latest bars are kept, and read newest last.
+        """
+
+        series = BarSeries(MINUTE_NS, 3)
+        for minute in range(5):
+            series.add(minute * MINUTE_NS, 1, float(minute), 0)
+
+        assert [bar.close for bar in series.latest()] == [2.0, 3.0, 4.0]
+        assert [bar.close for bar in series.latest(2)] == [3.0, 4.0]
+        assert series.latest(0) == []
+
+    def test_invalid(self) -> None:
+        """Bar series need a positive interval and capacity."""
+
+        with pytest.raises(ValueError):
+            BarSeries(0, 10)
+        with pytest.raises(ValueError):
+            BarSeries(MINUTE_NS, 0)
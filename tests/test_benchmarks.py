@@ -0,0 +1,68 @@
+import json
+
+from benchmarks.suite import compare, main, run, synthetic_market, synthetic_symbol
+
+
+def document(**metrics) -> dict:
+    """Results document with one record_trade result."""
+
+    result = {"benchmark": "record_trade", "symbols": 5, "trades": 1_000, "ops": 100,
+              "ops_per_sec": 1_000.0, "p50_ns": 1_000.0, "p99_ns": 2_000.0,
+              "peak_memory_bytes": 1_000}
+    result.update(metrics)
+    return {"version": 1, "results": [result]}
+
+
+class TestBenchmarkSuite:
+    """Unit tests for the benchmark suite"""
+
+    def test_synthetic_market(self) -> None:
+        """
+        Test that synthetic markets have the requested number of valid stocks.
+        """
+
+        assert synthetic_market(3).get_supported_stocks() == ["TEA", "POP", "ALE"]
+        market = synthetic_market(30)
+        assert len(market.stocks) == 30
+        assert synthetic_symbol(0) == "AAAA"
+        assert synthetic_symbol(27) == "AABB"
+
+    def test_run(self) -> None:
+        """
+        Test that a run reports every metric of every benchmark.
+        """
+
+        results = run([(5, 1_000)], ops=50)["results"]
+        assert {result["benchmark"] for result in results} == {
+            "record_trade", "volume_weighted_stock_price", "volume_weighted_stock_price_1m",
+            "volume_weighted_stock_prices_4_windows", "order_flow", "all_share_index",
+            "dividend_yield", "pe_ratio"}
+        for result in results:
+            assert result["ops_per_sec"] > 0
+            assert result["p50_ns"] <= result["p99_ns"]
+            assert result["peak_memory_bytes"] > 0
+
+    def test_compare(self) -> None:
+        """
+        Test that only changes for the worse beyond the threshold are regressions.
+        """
+
+        baseline = document()
+        assert compare(baseline, document(ops_per_sec=950.0), 0.1) == []
+        assert compare(baseline, document(ops_per_sec=2_000.0, p99_ns=1_000.0), 0.1) == []
+        regressions = compare(baseline, document(ops_per_sec=800.0, p99_ns=3_000.0), 0.1)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("record_trade[symbols=5,trades=1000] ops_per_sec")
+
+    def test_compare_command(self, tmp_path, capsys) -> None:
+        """
+        Test that the compare command fails on a regression.
+        """
+
+        baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+        baseline.write_text(json.dumps(document()))
+        current.write_text(json.dumps(document(p50_ns=1_500.0)))
+
+        assert main(["compare", str(baseline), str(baseline)]) == 0
+        assert main(["compare", str(baseline), str(current)]) == 1
+        assert "REGRESSION" in capsys.readouterr().out
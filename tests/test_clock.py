@@ -0,0 +1,104 @@
+import math
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from src.models.clock import SYSTEM_CLOCK, Clock, SimulatedClock, SystemClock
+from src.models.concurrent_market import ConcurrentStockMarket
+from src.models.retention import RetentionPolicy
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade_side import TradeSide
+from src.models.trade_store import to_epoch_ns
+
+START = pytz.timezone('US/Eastern').localize(datetime(2025, 3, 3, 9, 30))
+
+
+class TestClock:
+    """Unit tests for the market clocks"""
+
+    def test_clock_needs_now_ns(self) -> None:
+        """
+        Test that a clock without `now_ns` cannot be created.
+
+        Should raise a TypeError which pytest would catch
+        """
+
+        class Stopped(Clock):
+            pass
+
+        with pytest.raises(TypeError):
+            Stopped()
+
+    def test_system_clock(self) -> None:
+        """
+        Test that the system clock follows the wall clock and never goes backwards.
+        """
+
+        clock = SystemClock()
+        readings = [clock.now_ns() for _ in range(1_000)]
+        assert readings == sorted(readings)
+        assert abs(readings[-1] - time.time_ns()) < 1_000_000_000
+        assert clock.now().tzinfo is not None
+        assert clock.now(pytz.utc).utcoffset() == timedelta(0)
+
+    def test_simulated_clock(self) -> None:
+        """
+        Test that a simulated clock only moves forward, when told to.
+        """
+
+        clock = SimulatedClock(START)
+        assert clock.now() == START
+        clock.advance(timedelta(minutes=1))
+        clock.advance(500)
+        clock.sleep(0.25)
+        assert clock.now_ns() == to_epoch_ns(START) + 60_250_000_500
+        assert clock.monotonic() == clock.now_ns() / 1e9
+        clock.set(START + timedelta(hours=1))
+        assert clock.now() == START + timedelta(hours=1)
+        with pytest.raises(ValueError):
+            clock.set(START)
+        with pytest.raises(ValueError):
+            clock.advance(timedelta(seconds=-1))
+
+    @pytest.mark.parametrize("market_type", [StockMarket, ConcurrentStockMarket])
+    def test_market_on_simulated_clock(self, market_type) -> None:
+        """
+        Test that a market stamps trades and answers queries at the time of its clock,
+        so the VWSP window can be stepped through without waiting.
+        """
+
+        clock = SimulatedClock(START)
+        market = market_type(clock=clock,
+                             retention=RetentionPolicy(max_age=timedelta(minutes=30)))
+        market.add_stock(Stock(symbol="TEA", type=StockType.COMMON, last_dividend=8.0,
+                               par_value=100.0))
+        stock = market.stocks["TEA"]
+
+        market.record_trade("TEA", 100, 50.0, TradeSide.BUY)
+        clock.advance(timedelta(minutes=10))
+        market.record_trades([("TEA", 100, 150.0, "SELL")])
+        assert [trade.timestamp for trade in stock.trades] == \
+            [START, START + timedelta(minutes=10)]
+        assert stock.volume_weighted_stock_price() == 100.0
+        assert math.isclose(market.all_share_index(), 100.0)
+
+        clock.advance(timedelta(minutes=6))
+        assert stock.volume_weighted_stock_price() == 150.0
+        assert math.isclose(market.all_share_index(), 150.0)
+        assert market.order_flow()["TEA"].sell_volume == 100
+
+        clock.advance(timedelta(minutes=30))
+        assert market.all_share_index() is None
+        assert market.enforce_retention() == 2
+        assert "clock" not in market.model_dump()
+
+    def test_stock_without_market(self) -> None:
+        """Test that a stock outside any market reads the system clock."""
+
+        stock = Stock(symbol="TEA", type=StockType.COMMON, last_dividend=8.0, par_value=100.0)
+        assert stock._clock is SYSTEM_CLOCK
+        assert StockMarket().clock is SYSTEM_CLOCK
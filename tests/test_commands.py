@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from src.cli.commands import app
+from src.util import load_stock_market
+
+TRADES = (
+    "timestamp,symbol,quantity,trade_price,side\n"
+    "2025-03-03T14:30:00+00:00,TEA,100,80.0,BUY\n"
+    "2025-03-03T14:31:00+00:00,POP,10,100.0,SELL\n"
+    "2025-03-03T14:32:00+00:00,TEA,100,90.0,BUY\n"
+)
+
+
+@pytest.fixture
+def market_file(tmp_path):
+    """Write a market definition with two stocks."""
+
+    path = tmp_path / "market.json"
+    path.write_text(json.dumps({"stocks": {
+        "TEA": {"symbol": "TEA", "type": "COMMON", "last_dividend": 0, "par_value": 100},
+        "POP": {"symbol": "POP", "type": "COMMON", "last_dividend": 8, "par_value": 100},
+    }}))
+    return path
+
+
+class TestHeadlessCommands:
+    """Unit tests for the quote and index commands"""
+
+    def test_load_stock_market(self, tmp_path, market_file) -> None:
+        """Test loading a market from a list of stocks, or from a market with settings."""
+
+        assert load_stock_market(market_file).get_supported_stocks() == ["TEA", "POP"]
+
+        path = tmp_path / "list.json"
+        path.write_text(json.dumps([{"symbol": "GIN", "type": "PREFERRED",
+                                     "last_dividend": 8, "fixed_dividend": 0.02,
+                                     "par_value": 100}]))
+        assert load_stock_market(path).stocks["GIN"].dividend() == 2.0
+
+        path.write_text("42")
+        with pytest.raises(ValueError):
+            load_stock_market(path)
+
+    def test_quote_from_stdin(self, market_file) -> None:
+        """
+        Test quoting stocks from trades piped in, at the time of the last trade, with a
+        given price for the dividend yield and P/E ratio.
+        """
+
+        result = CliRunner().invoke(app, ["quote", "-m", str(market_file), "-t", "-",
+                                          "-p", "pop=160"], input=TRADES)
+        assert result.exit_code == 0, result.output
+        rows = {row["symbol"]: row for row in json.loads(result.stdout)}
+        assert rows["TEA"] == {"symbol": "TEA", "vwsp": 85.0, "price": 85.0,
+                               "dividend_yield": 0.0, "pe_ratio": None}
+        assert rows["POP"] == {"symbol": "POP", "vwsp": 100.0, "price": 160.0,
+                               "dividend_yield": 0.05, "pe_ratio": 20.0}
+
+    def test_index_csv(self, market_file, tmp_path) -> None:
+        """Test printing the index as CSV, at a given time."""
+
+        tape = tmp_path / "trades.csv"
+        tape.write_text(TRADES)
+        result = CliRunner().invoke(app, ["index", "-m", str(market_file), "-t", str(tape),
+                                          "--now", "2025-03-03T14:40:00", "-f", "csv"])
+        assert result.exit_code == 0, result.output
+        [row] = csv.DictReader(io.StringIO(result.stdout))
+        assert row["time"] == "2025-03-03T09:40:00-05:00"
+        assert float(row["all_share_index"]) == pytest.approx((85.0 * 100.0) ** 0.5)
+
+        # The trades have left the VWSP window by then
+        result = CliRunner().invoke(app, ["index", "-m", str(market_file), "-t", str(tape),
+                                          "--now", "2025-03-03T15:00:00+00:00"])
+        assert json.loads(result.stdout)[0]["all_share_index"] is None
+
+    def test_invalid_input(self, market_file) -> None:
+        """Test that unknown stocks, bad prices and bad rows are reported."""
+
+        runner = CliRunner()
+        result = runner.invoke(app, ["quote", "-m", str(market_file), "-s", "GIN"])
+        assert result.exit_code != 0
+        assert "GIN" in result.output
+
+        for price in ("TEA=-1", "TEA=cheap", "TEA=nan", "TEA"):
+            result = runner.invoke(app, ["quote", "-m", str(market_file), "-p", price])
+            assert result.exit_code != 0
+            assert price in result.output
+
+        result = runner.invoke(app, ["index", "-m", str(market_file), "-t", "-"],
+                               input="symbol,quantity,trade_price,side\nGIN,1,1,BUY\n")
+        assert result.exit_code == 0
+        assert "Rejected trade row" in result.output
@@ -0,0 +1,199 @@
+import math
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from src.models.concurrent_market import ConcurrentStockMarket
+from src.models.retention import RetentionPolicy
+from src.models.stock import Stock
+from src.models.stock_type import StockType
+from src.models.trade_store import to_epoch_ns
+from tests.helpers import scan_volume_weighted_stock_price
+
+SYMBOLS = [f"S{index:02d}" for index in range(20)]
+WRITERS = 8
+TRADES_PER_WRITER = 2_000
+
+
+@pytest.fixture
+def market() -> ConcurrentStockMarket:
+    """Set up a concurrent market with twenty stocks and few lock stripes."""
+
+    market = ConcurrentStockMarket(lock_stripes=4)
+    for symbol in SYMBOLS:
+        market.add_stock(Stock(symbol=symbol, type=StockType.COMMON, last_dividend=8.0,
+                               par_value=100.0))
+    return market
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads as often as possible to shake out races."""
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+class TestConcurrentStockMarket:
+    """Unit and stress tests for ConcurrentStockMarket"""
+
+    def test_lock_striping(self, market) -> None:
+        """
+        Test that a symbol always maps to the same one of the market's locks.
+        """
+
+        assert market.lock_for("S00") is market.lock_for("S00")
+        assert {id(market.lock_for(symbol)) for symbol in SYMBOLS} \
+            <= {id(lock) for lock in market._stripes}
+
+    def test_window_snapshot(self, market) -> None:
+        """
+        Test that a snapshot holds the trades of the window and their VWSP.
+        """
+
+        market.record_trade("S00", 100, 10.0, "BUY")
+        market.record_trade("S00", 300, 20.0, "SELL")
+
+        snapshot = market.window_snapshot("S00")
+        assert [trade.quantity for trade in snapshot.trades] == [100, 300]
+        assert math.isclose(snapshot.volume_weighted_stock_price, 17.5)
+        assert math.isclose(market.volume_weighted_stock_price("S00"), 17.5)
+        assert market.window_snapshot("S01").trades == []
+        with pytest.raises(ValueError):
+            market.window_snapshot("NOPE")
+
+    def test_stress_writers_and_readers(self, market, fast_switching) -> None:
+        """
+        Test that many writer threads and index readers leave the market consistent:
+        every trade is recorded and the incremental index matches a full recomputation.
+        """
+
+        errors = []
+        writing = threading.Event()
+        writing.set()
+
+        def writer(offset: int) -> None:
+            try:
+                for i in range(TRADES_PER_WRITER):
+                    symbol = SYMBOLS[(offset + i) % len(SYMBOLS)]
+                    market.record_trade(symbol, 1 + i % 50, 10.0 + offset + i % 7,
+                                        "BUY" if i % 2 else "SELL")
+                    if i % 500 == 0:
+                        market.record_trades({"symbol": [symbol] * 3, "quantity": [1, 2, 3],
+                                              "trade_price": [5.0, 6.0, 7.0],
+                                              "side": ["BUY"] * 3})
+            except Exception as error:  # pragma: no cover - reported below
+                errors.append(error)
+
+        def reader() -> None:
+            try:
+                while writing.is_set():
+                    value = market.all_share_index()
+                    assert value is None or (math.isfinite(value) and value > 0)
+                    volumes = [row.window_volume for row in market.top_stocks("window_volume", 5)]
+                    assert volumes == sorted(volumes, reverse=True)
+                    snapshot = market.window_snapshot(SYMBOLS[0])
+                    if snapshot.trades:
+                        notional = sum(trade.trade_price * trade.quantity
+                                       for trade in snapshot.trades)
+                        volume = sum(trade.quantity for trade in snapshot.trades)
+                        assert math.isclose(snapshot.volume_weighted_stock_price,
+                                            notional / volume)
+            except Exception as error:  # pragma: no cover - reported below
+                errors.append(error)
+
+        writers = [threading.Thread(target=writer, args=(offset,)) for offset in range(WRITERS)]
+        readers = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        assert errors == []
+        total = sum(len(stock.trades) for stock in market.stocks.values())
+        assert total == WRITERS * (TRADES_PER_WRITER + 3 * (TRADES_PER_WRITER // 500))
+
+        now = datetime.now(pytz.timezone('US/Eastern'))
+        prices = [scan_volume_weighted_stock_price(stock, to_epoch_ns(now))
+                  for stock in market.stocks.values()]
+        expected = math.exp(sum(math.log(price) for price in prices) / len(prices))
+        assert math.isclose(market.all_share_index(now), expected, rel_tol=1e-9)
+        top = market.top_stocks("vwsp", len(SYMBOLS), now=now)
+        assert [row.vwsp for row in top] == pytest.approx(sorted(prices, reverse=True))
+
+    def test_retention_while_writing(self, market, fast_switching) -> None:
+        """
+        Test that retention can run in a housekeeping thread while trades are recorded.
+        """
+
+        market.retention = RetentionPolicy(max_trades=10)
+        stop = threading.Event()
+        evicted = []
+
+        def housekeeping() -> None:
+            while not stop.is_set():
+                evicted.append(market.enforce_retention(
+                    datetime.now(pytz.timezone('US/Eastern')) + timedelta(minutes=30)))
+
+        thread = threading.Thread(target=housekeeping)
+        thread.start()
+        for i in range(2_000):
+            market.record_trade(SYMBOLS[i % len(SYMBOLS)], 10, 10.0, "BUY")
+        stop.set()
+        thread.join()
+
+        remaining = sum(len(stock.trades) for stock in market.stocks.values())
+        assert remaining + sum(evicted) == 2_000
+
+    def test_publish_while_writing(self, market, fast_switching) -> None:
+        """
+        Test that updates can be published, and subscriptions added and removed, while
+        trades are recorded and the index is updated, with every subscriber ending on
+        the final values.
+        """
+
+        received = {}
+
+        def receive(update) -> None:
+            received[update.symbol] = update.value
+
+        subscription = market.subscribe(receive, SYMBOLS, index=True)
+        stop = threading.Event()
+        errors = []
+
+        def run(action) -> None:
+            try:
+                while not stop.is_set():
+                    action()
+            except Exception as error:
+                errors.append(error)
+
+        def churn() -> None:
+            market.unsubscribe(market.subscribe(lambda update: None, SYMBOLS[:3]))
+
+        threads = [threading.Thread(target=run, args=(action,))
+                   for action in (market.publish_updates, market.all_share_index, churn)]
+        for thread in threads:
+            thread.start()
+        for i in range(2_000):
+            market.record_trade(SYMBOLS[i % len(SYMBOLS)], 10, 10.0 + i % 7, "BUY")
+        stop.set()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+        market.all_share_index()
+        market.publish_updates()
+        assert len(market._subscriptions) == 1
+        for symbol in SYMBOLS:
+            assert received[symbol] == market.volume_weighted_stock_price(symbol)
+        assert math.isclose(received[None], market.all_share_index())
+        market.unsubscribe(subscription)
@@ -0,0 +1,131 @@
+import asyncio
+import math
+
+import pytest
+
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.server.feed_server import FeedServer
+from src.server.protocol import ProtocolError, QueryRequest, TradeRequest, parse_request, \
+    parse_response
+
+
+@pytest.fixture
+def market() -> StockMarket:
+    """Set up a stock market with two stocks."""
+
+    market = StockMarket()
+    market.add_stock(Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                           par_value=100.0))
+    market.add_stock(Stock(symbol="XYZ", type=StockType.PREFERRED, last_dividend=8.0,
+                           fixed_dividend=0.02, par_value=100.0))
+    return market
+
+
+class TestProtocol:
+    """Unit tests for the feed protocol"""
+
+    def test_parse_requests(self) -> None:
+        """Trades and queries are parsed with their request number."""
+
+        assert parse_request(1, b"T ABC 100 10.5 BUY") == TradeRequest(1, "ABC", "100", "10.5",
+                                                                       "BUY")
+        assert parse_request(2, b"Q DY ABC 20") == QueryRequest(2, "DY", "ABC", 20.0)
+        assert parse_request(3, b"Q INDEX") == QueryRequest(3, "INDEX")
+
+    @pytest.mark.parametrize("line", [b"X", b"T ABC 100", b"Q FOO", b"Q VWSP", b"Q PE ABC x"])
+    def test_parse_invalid_requests(self, line: bytes) -> None:
+        """
+        Test that malformed lines are refused.
+
+        Should raise a ProtocolError which pytest would catch
+        """
+
+        with pytest.raises(ProtocolError):
+            parse_request(1, line)
+
+
+class TestFeedServer:
+    """Unit tests for FeedServer"""
+
+    def test_process_batches_trades(self, market) -> None:
+        """
+        Test that a run of trades is acknowledged once, with errors for the rejected
+        ones, and that a query sees the trades sent before it.
+        """
+
+        server = FeedServer(market)
+        number, responses = asyncio.run(server.process(0, [
+            b"T ABC 100 10.0 BUY", b"T ABC 300 20.0 SELL", b"", b"T NOPE 1 1.0 BUY",
+            b"Q VWSP ABC", b"T XYZ 10 5.0 HOLD", b"Q PE ABC 0", b"bogus",
+        ]))
+
+        assert number == 7
+        assert [parse_response(line) for line in responses] == [
+            ("E", 3, "Stock symbol not found"),
+            ("A", 3, None),
+            ("R", 4, "17.5"),
+            ("E", 5, "Side must be 'BUY' or 'SELL'"),
+            ("A", 5, None),
+            ("E", 6, "Price must be positive"),
+            ("E", 7, "Unknown request 'bogus'"),
+        ]
+        assert server.trades_recorded == 2
+
+    def test_connections_share_batches(self, market, monkeypatch) -> None:
+        """
+        Test that trades of connections processed in the same loop turn are recorded in
+        one batch, with rejects reported to the right connection.
+        """
+
+        batches = []
+        record_trades = StockMarket.record_trades
+        monkeypatch.setattr(StockMarket, "record_trades",
+                            lambda self, trades: batches.append(trades)
+                            or record_trades(self, trades))
+        server = FeedServer(market)
+
+        async def scenario() -> list:
+            return await asyncio.gather(
+                server.process(0, [b"T ABC 1 1.0 BUY", b"T ABC 1 1.0 SELL"]),
+                server.process(0, [b"T XYZ 1 1.0 BUY", b"T XYZ x 1.0 BUY"]))
+
+        first, second = asyncio.run(scenario())
+        assert len(batches) == 1
+        assert first == (2, [b"A 2\n"])
+        assert second == (2, [b"E 2 Invalid quantity: 'x'\n", b"A 2\n"])
+
+    def test_tcp_round_trip(self, market) -> None:
+        """
+        Test pipelined requests from several clients over TCP.
+        """
+
+        async def client(port: int, count: int) -> list:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"".join(b"T ABC %d 10.0 BUY\n" % (i + 1) for i in range(count)))
+            writer.write(b"Q VWSP ABC\nQ DY XYZ 4\nQ INDEX\n")
+            await writer.drain()
+            responses = []
+            while len([r for r in responses if r[0] == "R"]) < 3:
+                responses.append(parse_response(await reader.readline()))
+            writer.close()
+            await writer.wait_closed()
+            return responses
+
+        async def scenario() -> list:
+            server = FeedServer(market)
+            _, port = await server.start()
+            try:
+                return await asyncio.gather(*(client(port, 500) for _ in range(20)))
+            finally:
+                await server.close()
+
+        for responses in asyncio.run(scenario()):
+            acks = [number for kind, number, _ in responses if kind == "A"]
+            assert acks[-1] == 500
+            results = [(number, value) for kind, number, value in responses if kind == "R"]
+            assert [number for number, _ in results] == [501, 502, 503]
+            assert math.isclose(float(results[0][1]), 10.0)
+            assert math.isclose(float(results[1][1]), 0.5)
+        assert len(market.stocks["ABC"].trades) == 20 * 500
@@ -0,0 +1,258 @@
+import math
+import time
+from pathlib import Path
+
+import pytest
+
+from src.feeds.reference_data import validate_stock_definitions
+from src.models.concurrent_market import ConcurrentStockMarket
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade_record import TradeRecord
+from src.models.trade_side import TradeSide
+from src.models.trade_store import from_epoch_ns
+from src.persistence.journal import JOURNAL_DTYPE, TradeJournal, checkpoint, read_journal, \
+    recover_market
+from src.util import set_up_stock_market
+from tests.helpers import scan_volume_weighted_stock_price
+
+START_NS = 1_740_823_200_000_000_000
+
+
+def columns(count: int, start_ns: int = START_NS, symbols=("TEA", "POP", "GIN")) -> dict:
+    """One trade a second from `start_ns`, cycling through `symbols`."""
+
+    return {
+        "symbol": [symbols[i % len(symbols)] for i in range(count)],
+        "quantity": [10 + i for i in range(count)],
+        "trade_price": [100.0 + i % 7 for i in range(count)],
+        "side": ["BUY" if i % 2 else "SELL" for i in range(count)],
+        "timestamp": [start_ns + i * 1_000_000_000 for i in range(count)],
+    }
+
+
+def trade_rows(market: StockMarket) -> dict:
+    """Raw columns of every stock's trades, to compare markets."""
+
+    return {symbol: (list(stock.trades.timestamps), list(stock.trades.quantities),
+                     list(stock.trades.prices), list(stock.trades.sides),
+                     bytes(stock.trades.trade_ids))
+            for symbol, stock in market.stocks.items()}
+
+
+class TestTradeJournal:
+    """Unit tests for the write-ahead trade journal and recovery"""
+
+    @pytest.fixture
+    def journal_path(self, tmp_path: Path) -> Path:
+        return tmp_path / "trades.journal"
+
+    def test_journals_recorded_trades(self, journal_path: Path) -> None:
+        """
+        Test that trades recorded one by one and in batches are journaled.
+        """
+
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trade("TEA", 10, 100.0, TradeSide.BUY)
+            market.record_trades(columns(5))
+        records = read_journal(journal_path).records
+
+        assert len(records) == 6
+        assert records[0]["symbol"] == b"TEA"
+        assert records[0]["quantity"] == 10
+        assert records[0]["side"] == 0
+        assert sorted(records["symbol"][1:].tolist()) == [b"GIN", b"POP", b"POP", b"TEA",
+                                                          b"TEA"]
+
+    def test_group_commit(self, journal_path: Path) -> None:
+        """
+        Test that trades are written once a batch is full, or by the commit thread.
+        """
+
+        market = set_up_stock_market()
+        journal = TradeJournal(journal_path, max_batch=3, max_delay=None)
+        market.attach_journal(journal)
+        market.record_trade("TEA", 10, 100.0, TradeSide.BUY)
+        market.record_trade("TEA", 10, 100.0, TradeSide.BUY)
+        assert journal.committed == 0
+        market.record_trade("TEA", 10, 100.0, TradeSide.BUY)
+        assert journal.committed == 3
+        assert len(read_journal(journal_path).records) == 3
+        journal.close()
+
+        with TradeJournal(journal_path, max_delay=0.001) as journal:
+            market.attach_journal(journal)
+            market.record_trade("POP", 10, 100.0, TradeSide.SELL)
+            deadline = time.monotonic() + 5
+            while journal.committed < 4 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            assert journal.committed == 4
+
+    def test_recovers_market(self, journal_path: Path) -> None:
+        """
+        Test that recovery rebuilds the trades, VWSPs and index of the market.
+        """
+
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(2_000))
+        now = from_epoch_ns(START_NS + 1_999 * 1_000_000_000)
+
+        recovered = recover_market(journal_path, market=set_up_stock_market(), now=now)
+
+        assert trade_rows(recovered) == trade_rows(market)
+        for symbol in ("TEA", "POP", "GIN"):
+            assert math.isclose(recovered.stocks[symbol].volume_weighted_stock_price(now),
+                                scan_volume_weighted_stock_price(
+                                    market.stocks[symbol], START_NS + 1_999 * 1_000_000_000))
+        assert math.isclose(recovered.all_share_index(now), market.all_share_index(now))
+
+    def test_recovery_sorts_out_of_order_records(self, journal_path: Path) -> None:
+        """
+        Test that records journaled out of timestamp order are recovered in order.
+        """
+
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(3, START_NS + 10_000_000_000, symbols=("TEA",)))
+            market.record_trades(columns(3, START_NS, symbols=("TEA",)))
+
+        recovered = recover_market(journal_path, market=set_up_stock_market())
+        timestamps = list(recovered.stocks["TEA"].trades.timestamps)
+        assert timestamps == sorted(timestamps)
+        assert trade_rows(recovered) == trade_rows(market)
+
+    def test_ignores_torn_tail(self, journal_path: Path) -> None:
+        """
+        Test that a partly written last record is dropped, and overwritten on reopening.
+        """
+
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(4))
+        with journal_path.open("ab") as file:
+            file.write(b"\1" * (JOURNAL_DTYPE.itemsize // 2))
+
+        assert len(read_journal(journal_path).records) == 4
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            assert journal.committed == 4
+            market.attach_journal(journal)
+            market.record_trade("TEA", 10, 100.0, TradeSide.BUY)
+        assert journal_path.stat().st_size % JOURNAL_DTYPE.itemsize == 16
+        assert len(read_journal(journal_path).records) == 5
+
+    def test_checkpoint_bounds_replay(self, tmp_path: Path, journal_path: Path) -> None:
+        """
+        Test that a checkpoint empties the journal, and recovery replays both.
+        """
+
+        checkpoint_path = tmp_path / "market.checkpoint"
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(100))
+            assert checkpoint(market, journal, checkpoint_path) == 100
+            assert journal.generation == 1
+            assert len(read_journal(journal_path).records) == 0
+            market.record_trades(columns(10, START_NS + 100 * 1_000_000_000))
+
+        assert len(read_journal(journal_path).records) == 10
+        recovered = recover_market(journal_path, checkpoint_path)
+        assert recovered.get_supported_stocks() == market.get_supported_stocks()
+        assert recovered.stocks["GIN"].model_dump() == market.stocks["GIN"].model_dump()
+        assert trade_rows(recovered) == trade_rows(market)
+
+    def test_skips_journal_older_than_checkpoint(self, tmp_path: Path,
+                                                 journal_path: Path) -> None:
+        """
+        Test that a journal the checkpoint already holds is not replayed twice, and
+        is emptied.
+        """
+
+        checkpoint_path = tmp_path / "market.checkpoint"
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(20))
+        stale = journal_path.read_bytes()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            checkpoint(market, journal, checkpoint_path)
+        # The process died after writing the checkpoint, before emptying the journal
+        journal_path.write_bytes(stale)
+
+        recovered = recover_market(journal_path, checkpoint_path)
+        assert trade_rows(recovered) == trade_rows(market)
+        contents = read_journal(journal_path)
+        assert contents.generation == 1
+        assert len(contents.records) == 0
+
+    def test_unknown_symbol(self, journal_path: Path) -> None:
+        """
+        Test that recovery fails for trades of a stock the market does not have.
+        """
+
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(3))
+
+        with pytest.raises(ValueError, match="Stock symbol not found: GIN"):
+            recover_market(journal_path, market=StockMarket(stocks={
+                symbol: stock for symbol, stock in set_up_stock_market().stocks.items()
+                if symbol != "GIN"}))
+
+    def test_symbols_fit_records(self, journal_path: Path) -> None:
+        """
+        Test that a stock whose symbol does not fit a journal record is refused when it
+        is defined, and that such a symbol is never appended.
+        """
+
+        market = set_up_stock_market()
+        with pytest.raises(ValueError, match="symbol"):
+            market.add_stock(Stock(symbol="ÄÄÄ", type=StockType.COMMON, last_dividend=0,
+                                   par_value=100))
+        with pytest.raises(ValueError, match="symbol"):
+            validate_stock_definitions([{"symbol": "ÄÄÄ", "type": "COMMON",
+                                         "last_dividend": 0, "par_value": 100}])
+
+        trade = TradeRecord.validate(START_NS, 10, 100.0, TradeSide.BUY)
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            with pytest.raises(ValueError):
+                journal.append("ÄÄÄ", trade)
+        assert len(read_journal(journal_path).records) == 0
+
+    def test_concurrent_market(self, journal_path: Path) -> None:
+        """
+        Test that ConcurrentStockMarket journals trades too.
+        """
+
+        market = ConcurrentStockMarket(stocks=set_up_stock_market().stocks)
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trade("ALE", 5, 60.0, TradeSide.SELL)
+            market.record_trades(columns(3))
+        assert len(read_journal(journal_path).records) == 4
+
+    def test_window_rebuilt_for_recovery_time(self, journal_path: Path) -> None:
+        """
+        Test that a window rebuilt at a time only sums the trades inside it.
+        """
+
+        market = set_up_stock_market()
+        with TradeJournal(journal_path, max_delay=None) as journal:
+            market.attach_journal(journal)
+            market.record_trades(columns(3_600, symbols=("TEA",)))
+        now_ns = START_NS + 3_599 * 1_000_000_000
+        recovered = recover_market(journal_path, market=set_up_stock_market(),
+                                   now=from_epoch_ns(now_ns))
+
+        assert recovered.stocks["TEA"]._window.start == 3_600 - 15 * 60 - 1
+        assert math.isclose(
+            recovered.stocks["TEA"].volume_weighted_stock_price(from_epoch_ns(now_ns)),
+            scan_volume_weighted_stock_price(market.stocks["TEA"], now_ns))
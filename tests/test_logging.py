@@ -0,0 +1,103 @@
+import logging
+import timeit
+from typing import ClassVar
+
+import pytest
+
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade import Trade
+from src.models.trade_side import TradeSide
+
+
+class ExpensiveReprStock(Stock):
+    """Stock that counts how often it is formatted for logging"""
+
+    repr_calls: ClassVar[int] = 0
+
+    def __repr__(self) -> str:
+        type(self).repr_calls += 1
+        return super().__repr__()
+
+
+@pytest.fixture
+def market() -> StockMarket:
+    """Set up a stock market with one stock that counts repr calls."""
+
+    ExpensiveReprStock.repr_calls = 0
+    market = StockMarket()
+    market.add_stock(ExpensiveReprStock(symbol="ABC", type=StockType.COMMON,
+                                        last_dividend=8.0, par_value=100.0))
+    return market
+
+
+def exercise(market: StockMarket) -> None:
+    """Run every instrumented hot path once."""
+
+    stock = market.stocks["ABC"]
+    market.record_trade(symbol="ABC", quantity=100, trade_price=80.0, side=TradeSide.BUY)
+    stock.dividend_yield(80.0)
+    stock.pe_ratio(80.0)
+    stock.volume_weighted_stock_price()
+    market.all_share_index()
+
+
+class TestLogging:
+    """Tests for hot path logging"""
+
+    def test_no_logging_at_info(self, market, caplog, monkeypatch) -> None:
+        """
+        Test that hot paths emit nothing and format nothing when DEBUG is off.
+        """
+
+        caplog.set_level(logging.INFO)
+        formatted = []
+        monkeypatch.setattr(Trade, "__repr__", lambda trade: formatted.append(trade) or "")
+        exercise(market)
+
+        assert caplog.records == []
+        assert formatted == []
+        assert ExpensiveReprStock.repr_calls == 0
+
+    def test_logging_at_debug(self, market, caplog) -> None:
+        """
+        Test that hot paths log their calculations when DEBUG is on.
+        """
+
+        caplog.set_level(logging.DEBUG)
+        exercise(market)
+        messages = caplog.text
+        assert "Recorded trade for ABC" in messages
+        assert "Calculated dividend yield for stock with Symbol: ABC" in messages
+        assert "Calculated P/E Ratio for stock with Symbol: ABC" in messages
+        assert "Calculated volume weighted stock price for stock with Symbol: ABC" in messages
+        assert "GBCE All Share Index Calculated Value" in messages
+
+    def test_trade_validation_does_not_print(self, capsys) -> None:
+        """Test that building a trade writes nothing to stdout."""
+
+        Trade(timestamp="2025-03-03T09:30:00-05:00", quantity=1, side="BUY", trade_price=1.0)
+        assert capsys.readouterr().out == ""
+
+    def test_logging_cost_per_trade(self, market, caplog) -> None:
+        """
+        Test that recording trades with DEBUG off costs about the same as with logging
+        disabled altogether.
+        """
+
+        caplog.set_level(logging.INFO)
+        stock = market.stocks["ABC"]
+        trade = Trade(timestamp="2025-03-03T09:30:00-05:00", quantity=1, side="BUY",
+                      trade_price=1.0)
+
+        def record() -> None:
+            stock.record_trade(trade)
+
+        enabled = min(timeit.repeat(record, number=2000, repeat=5))
+        logging.disable(logging.CRITICAL)
+        try:
+            disabled = min(timeit.repeat(record, number=2000, repeat=5))
+        finally:
+            logging.disable(logging.NOTSET)
+        assert enabled < disabled * 1.5 + 1e-3
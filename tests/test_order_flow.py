@@ -0,0 +1,31 @@
+from array import array
+
+from src.models.order_flow import OrderFlow, summarize
+
+
+class TestOrderFlow:
+    """Unit tests for OrderFlow"""
+
+    def test_summarize(self) -> None:
+        """
+        Test splitting trade columns by side, and the figures derived from the split.
+        """
+
+        flow = summarize(array('q', [10, 30, 20, 40]), array('d', [100.0, 110.0, 90.0, 95.0]),
+                         array('b', [0, 1, 0, 1]))
+        assert (flow.buy_volume, flow.sell_volume) == (30, 70)
+        assert (flow.buy_trade_count, flow.sell_trade_count) == (2, 2)
+        assert flow.buy_vwsp == (1000.0 + 1800.0) / 30
+        assert flow.sell_vwsp == (3300.0 + 3800.0) / 70
+        assert flow.volume == 100 and flow.trade_count == 4
+        assert flow.imbalance == -0.4
+
+    def test_empty(self) -> None:
+        """
+        Test that a flow without trades on a side has no price for it.
+        """
+
+        flow = summarize(array('q', [10]), array('d', [100.0]), array('b', [0]))
+        assert flow.sell_vwsp is None and flow.imbalance == 1.0
+        assert OrderFlow().imbalance is None
+        assert OrderFlow().buy_vwsp is None
@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+from src.models.prefix_sums import TradePrefixSums
+from src.models.trade_store import TradeStore
+
+SECOND_NS = 1_000_000_000
+
+
+def scan(store: TradeStore, start_ns: int, end_ns: float = math.inf):
+    """VWSP of the trades from `start_ns` to `end_ns`, added up trade by trade."""
+
+    rows = [(price, quantity) for timestamp, price, quantity
+            in zip(store.timestamps, store.prices, store.quantities)
+            if start_ns <= timestamp <= end_ns]
+    if not rows:
+        return None
+    return sum(price * quantity for price, quantity in rows) / sum(q for _, q in rows)
+
+
+class TestTradePrefixSums:
+    """Unit tests for TradePrefixSums"""
+
+    def test_windows(self) -> None:
+        """
+        Test that every window is priced from the same sums, extended lazily.
+        """
+
+        store = TradeStore()
+        for i in range(200):
+            store.record(i * SECOND_NS, 1 + i % 9, 100.0 + i % 13, 0, bytes(16))
+        sums = TradePrefixSums(store)
+        sums.sync()
+        for start in (0, 50, 199):
+            assert math.isclose(sums.volume_weighted_stock_price(start * SECOND_NS),
+                                scan(store, start * SECOND_NS))
+        assert sums.volume_weighted_stock_price(200 * SECOND_NS) is None
+
+        store.record(200 * SECOND_NS, 5, 1.0, 1, bytes(16))
+        sums.sync()
+        assert sums.valid == 201
+        assert math.isclose(sums.volume_weighted_stock_price(150 * SECOND_NS),
+                            scan(store, 150 * SECOND_NS))
+
+    def test_insert_and_drop(self) -> None:
+        """
+        Test that sums stay right after an out of order insert and an eviction.
+        """
+
+        store = TradeStore()
+        for i in range(100):
+            store.record(i * SECOND_NS, 10, float(i), 0, bytes(16))
+        sums = TradePrefixSums(store)
+        sums.sync()
+
+        position = store.record(50 * SECOND_NS - 1, 1_000, 7.0, 0, bytes(16))
+        sums.invalidate(position)
+        assert sums.valid == 50
+        sums.sync()
+        assert math.isclose(sums.volume_weighted_stock_price(40 * SECOND_NS),
+                            scan(store, 40 * SECOND_NS))
+
+        store.drop_front(30)
+        sums.drop_front(30)
+        assert math.isclose(sums.volume_weighted_stock_price(0), scan(store, 0))
+        assert math.isclose(sums.volume_weighted_stock_price(60 * SECOND_NS),
+                            scan(store, 60 * SECOND_NS))
+
+    def test_point_in_time(self) -> None:
+        """
+        Test windows ending before the last trade, one at a time and as a series.
+        """
+
+        store = TradeStore()
+        for i in range(0, 300, 3):
+            store.record(i * SECOND_NS, 1 + i % 7, 100.0 + i % 11, 0, bytes(16))
+        sums = TradePrefixSums(store)
+        sums.sync()
+        lag_ns = 20 * SECOND_NS
+
+        times_ns = np.arange(-10, 320, 7, dtype=np.int64) * SECOND_NS
+        series = sums.volume_weighted_stock_prices_at(times_ns, lag_ns)
+        for time_ns, price in zip(times_ns.tolist(), series):
+            expected = scan(store, time_ns - lag_ns, time_ns)
+            assert sums.volume_weighted_stock_price(time_ns - lag_ns, time_ns) == \
+                (None if expected is None else price)
+            if expected is None:
+                assert np.isnan(price)
+            else:
+                assert math.isclose(price, expected)
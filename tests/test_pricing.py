@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.models.pricing import dividend_yields, pe_ratios
+
+
+class TestPricing:
+    """Unit tests for vectorized dividend yield and P/E Ratio calculations"""
+
+    def test_dividend_yields(self) -> None:
+        """Test dividend yields are computed for every price."""
+
+        result = dividend_yields(8.0, [80.0, 100.0, 160.0])
+        assert np.allclose(result, [0.1, 0.08, 0.05])
+
+    def test_broadcast_per_stock(self) -> None:
+        """
+        Test that one dividend per stock is broadcast over a grid of prices.
+        """
+
+        dividends = np.array([[8.0], [2.0]])
+        prices = np.array([[80.0, 40.0], [100.0, 50.0]])
+        assert np.allclose(dividend_yields(dividends, prices), [[0.1, 0.2], [0.02, 0.04]])
+        assert np.allclose(pe_ratios(dividends, prices), [[10.0, 5.0], [50.0, 25.0]])
+
+    def test_pe_ratios_zero_dividend(self) -> None:
+        """
+        Test that P/E Ratios for a zero dividend are NaN.
+        """
+
+        dividends = np.array([[0.0], [4.0]])
+        ratios = pe_ratios(dividends, np.full((2, 3), 80.0))
+        assert np.isnan(ratios[0]).all()
+        assert np.allclose(ratios[1], 20.0)
+
+    @pytest.mark.parametrize("prices", [[80.0, 0.0], [80.0, -1.0], [np.nan]])
+    def test_non_positive_prices(self, prices) -> None:
+        """
+        Test that non-positive prices are refused.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            dividend_yields(8.0, prices)
+        with pytest.raises(ValueError):
+            pe_ratios(8.0, prices)
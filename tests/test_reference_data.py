@@ -0,0 +1,86 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from src.feeds.reference_data import iter_stocks, read_market_definition, \
+    validate_stock_definitions
+from src.models.concurrent_market import ConcurrentStockMarket
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade_side import TradeSide
+from src.util import SAMPLE_STOCKS, load_stock_market
+
+CSV_DEFINITIONS = (
+    "symbol,type,last_dividend,fixed_dividend,par_value\n"
+    "TEA,COMMON,0,,100\n"
+    "GIN,PREFERRED,8,0.02,100\n"
+)
+
+
+class TestReferenceData:
+    """Unit tests for loading stock definitions"""
+
+    def test_formats(self, tmp_path) -> None:
+        """Test that CSV, NPZ and JSON files define the same stocks."""
+
+        csv_path = tmp_path / "stocks.csv"
+        csv_path.write_text(CSV_DEFINITIONS)
+        npz_path = tmp_path / "stocks.npz"
+        np.savez(npz_path, symbol=np.array(["TEA", "GIN"]),
+                 type=np.array(["COMMON", "PREFERRED"]), last_dividend=np.array([0.0, 8.0]),
+                 fixed_dividend=np.array([np.nan, 0.02]), par_value=np.array([100.0, 100.0]))
+        json_path = tmp_path / "stocks.json"
+        json_path.write_text(json.dumps({"max_lateness": 5, "stocks": [
+            {"symbol": "TEA", "type": "COMMON", "last_dividend": 0, "par_value": 100},
+            {"symbol": "GIN", "type": "PREFERRED", "last_dividend": 8, "fixed_dividend": 0.02,
+             "par_value": 100}]}))
+
+        expected = [Stock(symbol="TEA", type=StockType.COMMON, last_dividend=0, par_value=100),
+                    Stock(symbol="GIN", type=StockType.PREFERRED, last_dividend=8,
+                          fixed_dividend=0.02, par_value=100)]
+        for path in (csv_path, npz_path, json_path):
+            market = load_stock_market(path)
+            assert [stock.model_dump() for stock in market.stocks.values()] == \
+                [stock.model_dump() for stock in expected]
+        assert market.max_lateness.total_seconds() == 5
+
+    def test_validation(self, tmp_path) -> None:
+        """
+        Test that every invalid definition is reported by position, with the `Stock`
+        field constraints, and that files without the required columns are refused.
+        """
+
+        rows = [*SAMPLE_STOCKS,
+                {"symbol": "TOOLONG", "type": "COMMON", "last_dividend": 0, "par_value": 1},
+                {"symbol": "BAD", "type": "OTHER", "last_dividend": -1, "par_value": 0,
+                 "fixed_dividend": 0}]
+        with pytest.raises(ValueError) as error:
+            validate_stock_definitions(rows)
+        message = str(error.value)
+        assert "5 validation errors" in message
+        assert "5.symbol" in message
+        assert all(f"6.{field}" in message
+                   for field in ("type", "last_dividend", "par_value", "fixed_dividend"))
+
+        path = tmp_path / "stocks.csv"
+        path.write_text("symbol,type,par_value\nTEA,COMMON,100\n")
+        with pytest.raises(ValueError, match="missing columns: last_dividend"):
+            read_market_definition(path)
+        with pytest.raises(ValueError, match="not a CSV"):
+            read_market_definition(tmp_path / "stocks.txt")
+
+    @pytest.mark.parametrize("market_class", [StockMarket, ConcurrentStockMarket])
+    def test_add_stocks(self, market_class) -> None:
+        """Test that stocks built from definitions are priced and indexed by the market."""
+
+        market = market_class()
+        market.add_stocks(iter_stocks(validate_stock_definitions(SAMPLE_STOCKS)))
+        assert market.get_supported_stocks() == ["TEA", "POP", "ALE", "JOE", "GIN"]
+        assert market.stocks["GIN"].dividend() == 2.0
+
+        market.record_trade("POP", 10, 100.0, TradeSide.BUY)
+        market.record_trade("GIN", 10, 144.0, TradeSide.SELL)
+        assert math.isclose(market.all_share_index(), 120.0)
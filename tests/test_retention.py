@@ -0,0 +1,136 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from src.models.retention import RetentionPolicy
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade import Trade
+from src.models.trade_side import TradeSide
+
+START = datetime(2025, 3, 1, 10, 0, tzinfo=pytz.utc)
+
+
+def trades_every_minute(count: int) -> list:
+    """One BUY trade a minute from START, priced 1, 2, 3, ..."""
+
+    return [Trade(timestamp=START + timedelta(minutes=minute), quantity=10,
+                  side=TradeSide.BUY, trade_price=float(minute + 1))
+            for minute in range(count)]
+
+
+class TestRetention:
+    """Unit tests for trade retention and compaction"""
+
+    @pytest.fixture
+    def stock(self) -> Stock:
+        """Set up a stock with one trade a minute for an hour."""
+
+        return Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                     par_value=100.0, trades=trades_every_minute(60))
+
+    def test_evicts_by_age(self, stock: Stock) -> None:
+        """
+        Test that trades older than max_age are evicted and compacted into bars.
+        """
+
+        now = START + timedelta(minutes=59)
+        vwsp = stock.volume_weighted_stock_price(now)
+
+        evicted = stock.evict_trades(RetentionPolicy(max_age=timedelta(minutes=30)), now)
+
+        assert evicted == 29
+        assert len(stock.trades) == 31
+        assert stock.trades[0].timestamp == START + timedelta(minutes=29)
+        assert len(stock.bars) == 29
+        assert stock.bars[0].start == START
+        assert stock.bars[0].close == 1.0
+        assert math.isclose(stock.volume_weighted_stock_price(now), vwsp)
+
+    def test_keeps_trades_inside_window(self, stock: Stock) -> None:
+        """
+        Test that trades of the active VWSP window are kept, whatever the policy.
+        """
+
+        now = START + timedelta(minutes=59)
+        vwsp = stock.volume_weighted_stock_price(now)
+
+        evicted = stock.evict_trades(RetentionPolicy(max_trades=0), now)
+
+        assert evicted == 44
+        assert len(stock.trades) == 16
+        assert math.isclose(stock.volume_weighted_stock_price(now), vwsp)
+
+    def test_evicts_by_count_without_compaction(self, stock: Stock) -> None:
+        """
+        Test that max_trades keeps the newest trades and compaction can be turned off.
+        """
+
+        policy = RetentionPolicy(max_trades=20, compact_to_bars=False)
+        assert stock.evict_trades(policy, START + timedelta(minutes=59)) == 40
+        assert len(stock.trades) == 20
+        assert stock.bars == []
+
+    def test_bars_are_merged_and_bounded(self) -> None:
+        """
+        Test that trades of one minute evicted in two passes end in the same bar, and
+        that only the newest max_bars bars are kept.
+        """
+
+        stock = Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                      par_value=100.0)
+        for second in (0, 30, 70, 130):
+            stock.record_trade(Trade(timestamp=START + timedelta(seconds=second), quantity=10,
+                                     side=TradeSide.SELL, trade_price=float(second)))
+        policy = RetentionPolicy(max_age=timedelta(seconds=1), max_bars=2)
+        late = START + timedelta(hours=1)
+
+        stock.evict_trades(policy, START + timedelta(minutes=15, seconds=10))
+        assert len(stock.bars) == 1
+        stock.evict_trades(policy, late)
+        assert len(stock.trades) == 0
+
+        bars = stock.bars
+        assert len(bars) == 2
+        assert bars[0].start == START + timedelta(minutes=1)
+        assert bars[0].trade_count == 1
+        assert bars[1].sell_volume == 10
+
+    def test_merges_bar_of_same_minute(self) -> None:
+        """
+        Test that a later eviction pass merges into the last bar of the same minute.
+        """
+
+        stock = Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                      par_value=100.0)
+        for second in (0, 30):
+            stock.record_trade(Trade(timestamp=START + timedelta(seconds=second), quantity=10,
+                                     side=TradeSide.BUY, trade_price=float(second + 1)))
+        policy = RetentionPolicy(max_age=timedelta(seconds=1))
+
+        stock.evict_trades(policy, START + timedelta(minutes=15, seconds=10))
+        stock.evict_trades(policy, START + timedelta(minutes=16))
+
+        assert len(stock.bars) == 1
+        assert stock.bars[0].trade_count == 2
+        assert (stock.bars[0].open, stock.bars[0].close) == (1.0, 31.0)
+
+    def test_market_enforce_retention(self) -> None:
+        """
+        Test that the market enforces its policy on every stock, and not without one.
+        """
+
+        market = StockMarket()
+        for symbol in ("ABC", "XYZ"):
+            market.add_stock(Stock(symbol=symbol, type=StockType.COMMON, last_dividend=8.0,
+                                   par_value=100.0, trades=trades_every_minute(60)))
+        now = START + timedelta(minutes=59)
+
+        assert market.enforce_retention(now) == 0
+        market.retention = RetentionPolicy(max_trades=30)
+        assert market.enforce_retention(now) == 60
+        assert all(len(stock.trades) == 30 for stock in market.stocks.values())
+        assert market.all_share_index(now) is not None
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from src.engine.ring_buffer import TRADE_RING_DTYPE, TradeRing
+
+
+def records(start: int, count: int) -> np.ndarray:
+    """Ring records with consecutive timestamps from `start`."""
+
+    block = np.zeros(count, dtype=TRADE_RING_DTYPE)
+    block["timestamp"] = np.arange(start, start + count)
+    block["symbol"] = b"TEA"
+    return block
+
+
+class TestTradeRing:
+    """Unit tests for TradeRing"""
+
+    @pytest.fixture
+    def ring(self):
+        """A ring of 8 records, freed after the test."""
+
+        ring = TradeRing.create(8)
+        yield ring
+        ring.close()
+
+    def test_capacity_must_be_power_of_two(self) -> None:
+        """
+        Test that a capacity that is not a power of two is refused.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            TradeRing.create(6)
+
+    def test_write_until_full(self, ring) -> None:
+        """
+        Test that writes stop when the ring is full and resume once records are read.
+        """
+
+        assert ring.write(records(0, 5)) == 5
+        assert ring.write(records(5, 5)) == 3
+        assert len(ring) == 8
+        assert ring.read(4)["timestamp"].tolist() == [0, 1, 2, 3]
+        assert ring.write(records(8, 5)) == 4
+        assert ring.read()["timestamp"].tolist() == list(range(4, 12))
+        assert len(ring.read()) == 0
+
+    def test_wraps_around(self, ring) -> None:
+        """
+        Test that records are read back in order across many wrap-arounds.
+        """
+
+        seen = []
+        for start in range(0, 100, 6):
+            assert ring.write(records(start, 6)) == 6
+            seen.extend(ring.read()["timestamp"].tolist())
+        assert seen == list(range(0, 102))
+
+    def test_attach(self, ring) -> None:
+        """
+        Test that a ring attached by name sees the records of the creator.
+        """
+
+        ring.write(records(0, 3))
+        other = TradeRing.attach(ring.name, ring.capacity)
+        try:
+            block = other.read()
+            assert block["timestamp"].tolist() == [0, 1, 2]
+            assert block["symbol"].tolist() == [b"TEA"] * 3
+            assert len(ring) == 0
+        finally:
+            other.close()
@@ -0,0 +1,89 @@
+import random
+
+from src.models.screen import MarketScreen, ScreenMetric, SortedIndex
+
+
+class TestSortedIndex:
+    """Unit tests for SortedIndex class"""
+
+    def test_empty(self) -> None:
+        """Test reading an index without symbols."""
+
+        index = SortedIndex()
+        assert list(index) == list(reversed(index)) == []
+        assert list(index.between(None, None)) == list(index.between(1.0, 2.0)) == []
+
+    def test_matches_sorted_list(self) -> None:
+        """
+        Test that random adds and removes, over many chunks and with many equal values,
+        keep the symbols sorted by value from either end and within a range.
+        """
+
+        rng = random.Random(7)
+        index, expected = SortedIndex(), set()
+        for step in range(20_000):
+            if expected and rng.random() < 0.4:
+                pair = rng.choice(sorted(expected)) if step % 500 == 0 else expected.pop()
+                expected.discard(pair)
+                index.remove(*pair)
+            else:
+                pair = (rng.randint(0, 5_000) / 10, f"S{step}")
+                expected.add(pair)
+                index.add(*pair)
+
+        ordered = sorted(expected)
+        assert len(index) == len(ordered)
+        assert [value for value, _ in index] == [value for value, _ in ordered]
+        assert sorted(index) == ordered
+        assert [value for value, _ in reversed(index)] == [value for value, _ in ordered][::-1]
+        assert sorted(index.between(100.0, 250.5)) == \
+            [pair for pair in ordered if 100.0 <= pair[0] <= 250.5]
+        assert sorted(index.between(None, 10.0)) == [pair for pair in ordered if pair[0] <= 10.0]
+        assert list(index.between(1_000.0, None)) == []
+
+        rebuilt = SortedIndex.from_pairs(ordered)
+        rebuilt.add(0.0, "FIRST")
+        rebuilt.remove(*ordered[-1])
+        assert sorted(rebuilt) == [(0.0, "FIRST")] + ordered[:-1]
+
+
+class TestMarketScreen:
+    """Unit tests for MarketScreen class"""
+
+    def test_metrics_and_top(self) -> None:
+        """
+        Test the metrics derived from a stock's VWSP, and ranking stocks by them.
+        """
+
+        screen = MarketScreen()
+        screen.update("TEA", 0.0, 100.0, 10)
+        screen.update("POP", 8.0, 160.0, 30)
+        screen.update("ALE", 23.0, None, 0)
+
+        pop = screen.rows["POP"]
+        assert (pop.dividend_yield, pop.pe_ratio, pop.vwsp_change) == (0.05, 20.0, None)
+        assert screen.rows["TEA"].pe_ratio is None
+        assert screen.rows["ALE"].vwsp is None
+
+        assert [row.symbol for row in screen.top(ScreenMetric.VWSP, 5)] == ["POP", "TEA"]
+        assert [row.symbol for row in screen.top(ScreenMetric.WINDOW_VOLUME, 2, True)] == \
+            ["ALE", "TEA"]
+        assert [row.symbol for row in screen.top(ScreenMetric.PE_RATIO, 5)] == ["POP"]
+
+    def test_reference_and_remove(self) -> None:
+        """
+        Test that the VWSP change follows the reference price, and removing a stock
+        takes it out of every index.
+        """
+
+        screen = MarketScreen()
+        screen.update("TEA", 1.0, 110.0, 10)
+        screen.set_reference("TEA", 100.0)
+        assert abs(screen.rows["TEA"].vwsp_change - 0.1) < 1e-12
+        screen.update("TEA", 1.0, 90.0, 20)
+        assert abs(screen.rows["TEA"].vwsp_change + 0.1) < 1e-12
+        assert screen.select(ScreenMetric.VWSP_CHANGE, None, 0.0)[0].symbol == "TEA"
+
+        screen.remove("TEA")
+        assert screen.rows == {}
+        assert all(screen.top(metric, 10) == [] for metric in ScreenMetric)
@@ -0,0 +1,189 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+import pytz
+
+from src.engine.sharded_market import ShardedStockMarket, shard_for
+from src.models.stock import Stock
+from src.models.stock_type import StockType
+from src.models.trade_store import to_epoch_ns
+from src.util import set_up_stock_market
+
+NOW = datetime.now(pytz.timezone('US/Eastern'))
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """A single process market with the trades the sharded market is fed."""
+
+    market = set_up_stock_market()
+    rng = np.random.default_rng(7)
+    count = 5_000
+    columns = {
+        "symbol": rng.choice(np.array(market.get_supported_stocks(), dtype=object), count),
+        "quantity": rng.integers(1, 1_000, count),
+        "trade_price": rng.uniform(50.0, 150.0, count),
+        "side": rng.choice(np.array(["BUY", "SELL"], dtype=object), count),
+        "timestamp": np.sort(rng.integers(to_epoch_ns(NOW - timedelta(minutes=30)),
+                                          to_epoch_ns(NOW), count)),
+    }
+    market.record_trades(columns)
+    return market, columns
+
+
+@pytest.fixture(scope="module")
+def sharded(reference):
+    """A market of three shards fed the reference trades."""
+
+    market, columns = reference
+    with ShardedStockMarket(market.stocks.values(), shards=3) as sharded:
+        sharded.record_trades(columns)
+        yield sharded
+
+
+class TestShardedStockMarket:
+    """Unit tests for ShardedStockMarket"""
+
+    def test_shard_for_is_stable(self) -> None:
+        """Symbols always map to the same shard."""
+
+        assert shard_for("TEA", 4) == shard_for("TEA", 4)
+        assert 0 <= shard_for("GIN", 3) < 3
+
+    def test_trades_reach_their_shards(self, reference, sharded) -> None:
+        """
+        Test that every trade is recorded once, for the right stock.
+        """
+
+        market, _ = reference
+        assert sharded.trade_counts() == {symbol: len(stock.trades)
+                                          for symbol, stock in market.stocks.items()}
+
+    def test_index_matches_single_market(self, reference, sharded) -> None:
+        """
+        Test that the index combined from the shards equals the single market's index.
+        """
+
+        market, _ = reference
+        assert math.isclose(sharded.all_share_index(NOW), market.all_share_index(NOW),
+                            rel_tol=1e-12)
+        for symbol, stock in market.stocks.items():
+            assert math.isclose(sharded.volume_weighted_stock_price(symbol, NOW),
+                                stock.volume_weighted_stock_price(NOW))
+
+
+    def test_index_series_matches_single_market(self, reference, sharded) -> None:
+        """
+        Test that the index series combined from the shards equals the single market's.
+        """
+
+        market, _ = reference
+        start, end = NOW - timedelta(minutes=40), NOW
+        times_ns, values = sharded.all_share_index_series(start, end)
+        expected_times_ns, expected = market.all_share_index_series(start, end)
+        assert np.array_equal(times_ns, expected_times_ns)
+        assert np.allclose(values, expected, equal_nan=True)
+
+    def test_order_flow_matches_single_market(self, reference, sharded) -> None:
+        """
+        Test that the order flow gathered from the shards equals the single market's.
+        """
+
+        market, _ = reference
+        flows = sharded.order_flow(NOW)
+        expected = market.order_flow(NOW)
+        assert flows.keys() == expected.keys()
+        for symbol, flow in flows.items():
+            assert flow.buy_volume == expected[symbol].buy_volume
+            assert flow.sell_trade_count == expected[symbol].sell_trade_count
+            assert math.isclose(flow.sell_notional, expected[symbol].sell_notional)
+
+    def test_failed_broadcast_keeps_answers_in_step(self, reference, sharded) -> None:
+        """
+        Test that a command failing on every shard does not leave answers behind for
+        the next command.
+        """
+
+        market, _ = reference
+        with pytest.raises(RuntimeError, match="Series end must not be before its start"):
+            sharded.all_share_index_series(NOW, NOW - timedelta(seconds=5))
+        assert math.isclose(sharded.all_share_index(NOW), market.all_share_index(NOW))
+
+    def test_record_trade(self, sharded) -> None:
+        """
+        Test that single trades are validated before they are sent to a shard.
+
+        Should raise ValueErrors which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            sharded.record_trade("NOPE", 10, 1.0, "BUY")
+        with pytest.raises(ValueError):
+            sharded.record_trade("TEA", 10, 1.0, "HOLD")
+
+        before = sharded.trade_counts()["TEA"]
+        sharded.record_trade("TEA", 10, 1.0, "BUY")
+        assert sharded.trade_counts()["TEA"] == before + 1
+
+    def test_record_trade_out_of_order(self, sharded) -> None:
+        """
+        Test that trades stamped by the caller reach the shard with their timestamps,
+        an earlier trade recorded after a later one included.
+        """
+
+        sharded.add_stock(Stock(symbol="OOO", type=StockType.COMMON, last_dividend=1.0,
+                                par_value=10.0))
+        sharded.record_trade("OOO", 10, 30.0, "BUY", timestamp=NOW - timedelta(minutes=1))
+        sharded.record_trade("OOO", 30, 10.0, "SELL", timestamp=NOW - timedelta(minutes=20))
+        sharded.record_trade("OOO", 10, 20.0, "BUY", timestamp=NOW - timedelta(minutes=2))
+        assert sharded.trade_counts()["OOO"] == 3
+        assert sharded.volume_weighted_stock_price("OOO", NOW) == 25.0
+        assert sharded.volume_weighted_stock_price(
+            "OOO", NOW - timedelta(minutes=10)) == 10.0
+
+    def test_add_stock(self, sharded) -> None:
+        """
+        Test that stocks can be added once the shards are running.
+        """
+
+        sharded.add_stock(Stock(symbol="NEW", type=StockType.COMMON, last_dividend=1.0,
+                                par_value=10.0))
+        sharded.record_trade("NEW", 10, 20.0, "SELL")
+        assert "NEW" in sharded.get_supported_stocks()
+        assert sharded.volume_weighted_stock_price("NEW") == 20.0
+
+    def test_add_stock_symbol_fits_ring(self, sharded) -> None:
+        """
+        Test that a stock whose symbol does not fit a ring record is refused by the
+        parent, before any trade of it is sent to a shard.
+        """
+
+        stock = Stock.from_validated({"symbol": "ÄÄÄ", "type": StockType.COMMON,
+                                      "last_dividend": 1.0, "fixed_dividend": None,
+                                      "par_value": 10.0})
+        with pytest.raises(ValueError, match="trade ring"):
+            sharded.add_stock(stock)
+        with pytest.raises(ValueError, match="trade ring"):
+            ShardedStockMarket([stock], shards=1)
+        assert "ÄÄÄ" not in sharded.get_supported_stocks()
+        with pytest.raises(ValueError):
+            sharded.record_trade("ÄÄÄ", 10, 20.0, "SELL")
+
+    def test_top_stocks_matches_single_market(self, reference, sharded) -> None:
+        """
+        Test that the top stocks and screens merged from the shards equal the single
+        market's.
+        """
+
+        market, _ = reference
+        for metric in ("vwsp", "dividend_yield", "window_volume"):
+            assert [row.symbol for row in sharded.top_stocks(metric, 3, now=NOW)] == \
+                [row.symbol for row in market.top_stocks(metric, 3, now=NOW)]
+        criteria = {"vwsp": (90.0, None), "pe_ratio": (None, 100.0)}
+        assert sharded.screen_stocks(criteria, now=NOW) == \
+            market.screen_stocks(criteria, now=NOW)
+        sharded.set_reference_prices({"TEA": 100.0}, now=NOW)
+        tea = sharded.screen_stocks({"vwsp_change": (None, None)}, now=NOW)
+        assert [row.symbol for row in tea] == ["TEA"]
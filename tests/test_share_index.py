@@ -0,0 +1,73 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from src.models.share_index import ShareIndex
+from src.models.trade_side import TradeSide
+from src.util import set_up_stock_market
+
+
+class TestShareIndex:
+    """Unit tests for ShareIndex class"""
+
+    def test_empty_index(self) -> None:
+        """An index without contributing stocks has no value."""
+
+        assert ShareIndex().value() is None
+
+    def test_geometric_mean(self) -> None:
+        """Test that the index is the geometric mean of the contributing prices."""
+
+        index = ShareIndex()
+        prices = {"TEA": 80.0, "POP": 120.0, "ALE": 60.5}
+        for symbol, price in prices.items():
+            index.update(symbol, price)
+
+        expected = math.prod(prices.values()) ** (1 / len(prices))
+        assert len(index) == 3
+        assert math.isclose(index.value(), expected, rel_tol=1e-12)
+
+    def test_update_replaces_and_removes(self) -> None:
+        """
+        Test that updating a stock replaces its price and None removes it.
+        """
+
+        index = ShareIndex()
+        index.update("TEA", 10.0)
+        index.update("POP", 1000.0)
+        index.update("POP", 40.0)
+        assert math.isclose(index.value(), 20.0)
+
+        index.update("POP", None)
+        assert len(index) == 1
+        assert math.isclose(index.value(), 10.0)
+
+    def test_many_constituents_do_not_overflow(self) -> None:
+        """
+        Test that thousands of large prices do not overflow the way a product would.
+        """
+
+        index = ShareIndex()
+        for i in range(5000):
+            index.update(f"S{i}", 1e300)
+        assert math.isclose(index.value(), 1e300, rel_tol=1e-9)
+
+
+class TestMarketIndexExpiry:
+    """Regression tests for scheduling the expiry of a stock's VWSP in the index"""
+
+    def test_expiry_after_window_moved_ahead(self) -> None:
+        """
+        Test that a stock leaves the index once its trades expire, even when a direct
+        query moved its rolling window past the index time in between.
+        """
+
+        start = datetime(2025, 3, 3, 14, 30, tzinfo=timezone.utc)
+        market = set_up_stock_market()
+        market.record_trade("POP", 10, 100.0, TradeSide.BUY, timestamp=start)
+        market.record_trade("POP", 10, 120.0, TradeSide.BUY,
+                            timestamp=start + timedelta(minutes=10))
+
+        assert math.isclose(market.all_share_index(start + timedelta(minutes=1)), 100.0)
+        market.stocks["POP"].volume_weighted_stock_price(start + timedelta(minutes=30))
+        assert math.isclose(market.all_share_index(start + timedelta(minutes=16)), 120.0)
+        assert market.all_share_index(start + timedelta(minutes=40)) is None
@@ -0,0 +1,159 @@
+import math
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from src.models.concurrent_market import ConcurrentStockMarket
+from src.models.retention import RetentionPolicy
+from src.models.stock_market import StockMarket
+from src.models.trade_side import TradeSide
+from src.models.trade_store import from_epoch_ns
+from src.persistence.snapshot import load_snapshot, read_snapshot_metadata, write_snapshot
+from src.util import set_up_stock_market
+
+START_NS = 1_740_823_200_000_000_000
+
+
+def record_minutes(market: StockMarket, minutes: int) -> None:
+    """Record one trade per stock and second for `minutes` minutes from START_NS."""
+
+    count = minutes * 60
+    symbols = market.get_supported_stocks()
+    market.record_trades({
+        "symbol": [symbol for _ in range(count) for symbol in symbols],
+        "quantity": [1 + i % 50 for i in range(count) for _ in symbols],
+        "trade_price": [90.0 + i % 20 for i in range(count) for _ in symbols],
+        "side": ["BUY" if i % 3 else "SELL" for i in range(count) for _ in symbols],
+        "timestamp": [START_NS + i * 1_000_000_000 for i in range(count) for _ in symbols],
+    })
+
+
+def trade_columns(market: StockMarket) -> dict:
+    """Raw columns of every stock's trades, to compare markets."""
+
+    return {symbol: (list(stock.trades.timestamps), list(stock.trades.quantities),
+                     list(stock.trades.prices), list(stock.trades.sides),
+                     bytes(stock.trades.trade_ids))
+            for symbol, stock in market.stocks.items()}
+
+
+class TestSnapshot:
+    """Unit tests for binary market snapshots"""
+
+    @pytest.fixture
+    def market(self) -> StockMarket:
+        """Set up a market with half an hour of trades for every stock."""
+
+        market = set_up_stock_market()
+        record_minutes(market, 30)
+        return market
+
+    def test_round_trip(self, market: StockMarket, tmp_path: Path) -> None:
+        """
+        Test that a restored market has the stocks, trades, VWSPs and index of the
+        original.
+        """
+
+        path = tmp_path / "market.snapshot"
+        size = write_snapshot(market, path)
+        assert size == path.stat().st_size
+        assert size < 41 * 5 * 1_800 + 4096
+
+        restored = load_snapshot(path)
+        assert [stock.model_dump() for stock in restored.stocks.values()] == \
+            [stock.model_dump() for stock in market.stocks.values()]
+        assert trade_columns(restored) == trade_columns(market)
+        assert restored.stocks["POP"].trades[100] == market.stocks["POP"].trades[100]
+        now = from_epoch_ns(START_NS + 1_799 * 1_000_000_000)
+        for symbol in market.stocks:
+            assert math.isclose(restored.stocks[symbol].volume_weighted_stock_price(now),
+                                market.stocks[symbol].volume_weighted_stock_price(now))
+        assert math.isclose(restored.all_share_index(now), market.all_share_index(now))
+
+    def test_loads_without_copying(self, market: StockMarket, tmp_path: Path) -> None:
+        """
+        Test that trades are read from the snapshot until a stock changes, and that
+        changing it leaves the snapshot and the other stocks alone.
+        """
+
+        path = tmp_path / "market.snapshot"
+        write_snapshot(market, path)
+        restored = load_snapshot(path)
+        assert all(isinstance(stock.trades.timestamps, memoryview)
+                   for stock in restored.stocks.values())
+
+        restored.record_trade("TEA", 7, 99.0, TradeSide.BUY)
+        assert len(restored.stocks["TEA"].trades) == 1_801
+        assert not isinstance(restored.stocks["TEA"].trades.timestamps, memoryview)
+        assert isinstance(restored.stocks["POP"].trades.timestamps, memoryview)
+        assert trade_columns(load_snapshot(path)) == trade_columns(market)
+
+    def test_settings_and_bars(self, market: StockMarket, tmp_path: Path) -> None:
+        """
+        Test that the retention policy and compacted bars are restored, and that a
+        restored market can evict trades.
+        """
+
+        market.retention = RetentionPolicy(max_age=timedelta(minutes=20))
+        now = from_epoch_ns(START_NS + 1_799 * 1_000_000_000)
+        market.enforce_retention(now)
+        path = tmp_path / "market.snapshot"
+        write_snapshot(market, path, extra={"note": "end of day"})
+
+        restored = load_snapshot(path)
+        assert restored.retention == market.retention
+        assert restored.stocks["ALE"].bars == market.stocks["ALE"].bars
+        assert trade_columns(restored) == trade_columns(market)
+        assert read_snapshot_metadata(path)["extra"] == {"note": "end of day"}
+
+        later = from_epoch_ns(START_NS + 2_399 * 1_000_000_000)
+        assert restored.enforce_retention(later) == market.enforce_retention(later)
+        assert trade_columns(restored) == trade_columns(market)
+
+    def test_market_type(self, market: StockMarket, tmp_path: Path) -> None:
+        """
+        Test that a snapshot can be restored as a ConcurrentStockMarket.
+        """
+
+        path = tmp_path / "market.snapshot"
+        write_snapshot(market, path)
+        restored = load_snapshot(path, ConcurrentStockMarket)
+        assert isinstance(restored, ConcurrentStockMarket)
+        assert trade_columns(restored) == trade_columns(market)
+
+    def test_empty_market(self, tmp_path: Path) -> None:
+        """
+        Test that markets without stocks or trades round-trip.
+        """
+
+        path = tmp_path / "market.snapshot"
+        write_snapshot(StockMarket(), path)
+        assert load_snapshot(path).stocks == {}
+        write_snapshot(set_up_stock_market(), path)
+        assert trade_columns(load_snapshot(path)) == trade_columns(set_up_stock_market())
+
+    def test_rejects_other_files(self, tmp_path: Path) -> None:
+        """
+        Test that loading a file that is not a snapshot fails.
+        """
+
+        path = tmp_path / "market.snapshot"
+        path.write_bytes(b"{}" * 20)
+        with pytest.raises(ValueError, match="Not a market snapshot"):
+            load_snapshot(path)
+
+    def test_rebuilds_tracked_bars(self, tmp_path: Path) -> None:
+        """
+        Test that the bars a market tracks are rebuilt from the restored trades.
+        """
+
+        market = StockMarket(stocks=set_up_stock_market().stocks,
+                             bar_intervals=[timedelta(minutes=1)], bar_capacity=10)
+        record_minutes(market, 30)
+        path = tmp_path / "market.snapshot"
+        write_snapshot(market, path)
+
+        restored = load_snapshot(path)
+        assert restored.latest_bars(timedelta(minutes=1), 10) == \
+            market.latest_bars(timedelta(minutes=1), 10)
@@ -3,6 +3,7 @@
 import math
 from datetime import datetime, timedelta
 
+import numpy as np
 import pytest
 import pytz
 
@@ -10,6 +11,8 @@ from src.models.stock import Stock
 from src.models.stock_type import StockType
 from src.models.trade import Trade
 from src.models.trade_side import TradeSide
+from src.models.trade_store import to_epoch_ns
+from tests.helpers import scan_volume_weighted_stock_price
 
 
 class TestStock:
@@ -163,3 +166,209 @@ class TestStock:
         result = common_stock.volume_weighted_stock_price(now=now)
         assert math.isclose(result, expected_vwsp, rel_tol=1e-4)
 
+    def test_volume_weighted_stock_price_window_moves_forward(self, common_stock) -> None:
+        """
+        Test that trades leave the VWSP window as time moves forward.
+
+        Queries the same stock at increasing times and verifies each result matches a
+        full scan of the recorded trades.
+        """
+
+        start = datetime.now(pytz.timezone('US/Eastern'))
+        for minute in range(30):
+            common_stock.record_trade(Trade(timestamp=start + timedelta(minutes=minute),
+                                            quantity=10 + minute, side=TradeSide.BUY,
+                                            trade_price=50.0 + minute))
+
+        for minute in range(0, 60, 5):
+            now = start + timedelta(minutes=minute)
+            expected = scan_volume_weighted_stock_price(common_stock, to_epoch_ns(now))
+            result = common_stock.volume_weighted_stock_price(now=now)
+            if expected is None:
+                assert result is None
+            else:
+                assert math.isclose(result, expected, rel_tol=1e-9)
+
+    def test_volume_weighted_stock_price_earlier_now(self, common_stock) -> None:
+        """
+        Test that querying an earlier time after a later one still uses the right trades,
+        leaving out those after it.
+        """
+
+        now = datetime.now(pytz.timezone('US/Eastern'))
+        common_stock.record_trade(Trade(timestamp=now - timedelta(minutes=40), quantity=100,
+                                        side=TradeSide.BUY, trade_price=70.0))
+        common_stock.record_trade(Trade(timestamp=now, quantity=100, side=TradeSide.BUY,
+                                        trade_price=90.0))
+
+        assert math.isclose(common_stock.volume_weighted_stock_price(now=now), 90.0)
+        earlier = now - timedelta(minutes=30)
+        assert math.isclose(common_stock.volume_weighted_stock_price(now=earlier), 70.0)
+
+    def test_volume_weighted_stock_price_trades_appended_directly(self, common_stock) -> None:
+        """
+        Test that trades appended to the trades list directly are taken into account.
+        """
+
+        now = datetime.now(pytz.timezone('US/Eastern'))
+        assert common_stock.volume_weighted_stock_price(now=now) is None
+        common_stock.trades.append(Trade(timestamp=now, quantity=100, side=TradeSide.SELL,
+                                         trade_price=75.0))
+        assert math.isclose(common_stock.volume_weighted_stock_price(now=now), 75.0)
+
+    def test_trades_passed_to_constructor(self) -> None:
+        """
+        Test that trades passed when creating a stock are recorded.
+        """
+
+        trade = Trade(timestamp=datetime.now(pytz.timezone('US/Eastern')), quantity=100,
+                      side=TradeSide.BUY, trade_price=80.0)
+        stock = Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                      par_value=100.0, trades=[trade])
+        assert list(stock.trades) == [trade]
+
+    def test_dividend_yields_match_scalar(self, common_stock, preferred_stock) -> None:
+        """
+        Test that batch dividend yields and P/E ratios match the scalar versions.
+        """
+
+        prices = np.linspace(1.0, 200.0, 1000)
+        for stock in (common_stock, preferred_stock):
+            expected_yields = [stock.dividend_yield(price) for price in prices]
+            expected_ratios = [stock.pe_ratio(price) for price in prices]
+            assert np.allclose(stock.dividend_yields(prices), expected_yields)
+            assert np.allclose(stock.pe_ratios(prices), expected_ratios)
+
+    def test_pe_ratios_zero_dividend(self, common_stock) -> None:
+        """
+        Test that batch P/E ratios are NaN where the scalar version returns None.
+        """
+
+        common_stock.last_dividend = 0.0
+        assert np.isnan(common_stock.pe_ratios([80.0, 90.0])).all()
+
+    def test_dividend_yields_invalid_price(self, common_stock) -> None:
+        """
+        Test batch dividend yields with an invalid price.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            common_stock.dividend_yields([80.0, 0.0])
+
+    def test_dividend_yields_missing_fixed_for_preferred(self, preferred_stock) -> None:
+        """
+        Test batch dividend yields from missing fixed dividend.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        preferred_stock.fixed_dividend = None
+        with pytest.raises(ValueError):
+            preferred_stock.dividend_yields([80.0])
+
+    def test_track_bars(self, common_stock) -> None:
+        """
+        Test that tracked bars are built from the trades already recorded, then kept up
+        to date by every trade recorded.
+        """
+
+        start = datetime(2025, 3, 3, 9, 30, tzinfo=pytz.utc)
+        for seconds in (0, 30, 65):
+            common_stock.record_trade(Trade(timestamp=start + timedelta(seconds=seconds),
+                                            quantity=10, side=TradeSide.BUY,
+                                            trade_price=100.0 + seconds))
+        common_stock.track_bars(timedelta(minutes=1), 10)
+        assert [bar.volume for bar in common_stock.recent_bars(timedelta(minutes=1))] == [20, 10]
+
+        common_stock.record_trade(Trade(timestamp=start + timedelta(seconds=70), quantity=5,
+                                        side=TradeSide.SELL, trade_price=90.0))
+        common_stock.record_trade_columns(
+            np.array([to_epoch_ns(start + timedelta(minutes=3))], dtype=np.int64),
+            np.array([7], dtype=np.int64), np.array([80.0]), np.array([0], dtype=np.int8),
+            bytes(16))
+
+        last_two = common_stock.recent_bars(timedelta(minutes=1), 2)
+        assert last_two[0].start == start + timedelta(minutes=1)
+        assert (last_two[0].low, last_two[0].close, last_two[0].sell_volume) == (90.0, 90.0, 5)
+        assert (last_two[1].start, last_two[1].volume) == (start + timedelta(minutes=3), 7)
+
+        with pytest.raises(ValueError):
+            common_stock.recent_bars(timedelta(seconds=1))
+
+    def test_volume_weighted_stock_price_windows(self, common_stock) -> None:
+        """
+        Test VWSP over other windows than 15 minutes, one at a time and all at once,
+        as trades are recorded in and out of order and evicted.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        for minutes, price in ((90, 50.0), (30, 70.0), (10, 90.0), (3, 100.0), (0.5, 110.0)):
+            common_stock.record_trade(Trade(timestamp=now - timedelta(minutes=minutes),
+                                            quantity=10, side=TradeSide.BUY,
+                                            trade_price=price))
+        windows = [timedelta(minutes=1), timedelta(minutes=5), timedelta(minutes=15),
+                   timedelta(minutes=60)]
+
+        prices = common_stock.volume_weighted_stock_prices(windows, now)
+        assert prices == {windows[0]: 110.0, windows[1]: 105.0, windows[2]: 100.0,
+                          windows[3]: 92.5}
+        assert common_stock.volume_weighted_stock_price(now, windows[1]) == 105.0
+        assert common_stock.volume_weighted_stock_price(now, windows[2]) == \
+            common_stock.volume_weighted_stock_price(now)
+        assert common_stock.volume_weighted_stock_price(now, timedelta(seconds=1)) is None
+
+        common_stock.record_trade(Trade(timestamp=now - timedelta(minutes=2), quantity=30,
+                                        side=TradeSide.SELL, trade_price=120.0))
+        assert common_stock.volume_weighted_stock_price(now, windows[1]) == \
+            (1000.0 + 1100.0 + 3600.0) / 50
+
+        with pytest.raises(ValueError):
+            common_stock.volume_weighted_stock_prices([timedelta(0)], now)
+
+    def test_volume_weighted_stock_price_as_of(self, common_stock) -> None:
+        """
+        Test that the VWSP as of a time leaves out later trades, alone and as a series.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        for minutes, price in ((-20, 60.0), (-5, 80.0), (0, 100.0), (10, 120.0)):
+            common_stock.record_trade(Trade(timestamp=now + timedelta(minutes=minutes),
+                                            quantity=10, side=TradeSide.BUY,
+                                            trade_price=price))
+
+        assert common_stock.volume_weighted_stock_price(now) == 90.0
+        assert common_stock.volume_weighted_stock_price(now - timedelta(minutes=1)) == 80.0
+        assert common_stock.volume_weighted_stock_price(now + timedelta(minutes=12)) == 110.0
+        assert common_stock.volume_weighted_stock_price(now, timedelta(minutes=30)) == 80.0
+        assert common_stock.volume_weighted_stock_price(now - timedelta(minutes=21)) is None
+
+        times = [now + timedelta(minutes=minutes) for minutes in range(-25, 30, 1)]
+        series = common_stock.volume_weighted_stock_price_series([to_epoch_ns(t) for t in times])
+        for time, price in zip(times, series):
+            expected = scan_volume_weighted_stock_price(common_stock, to_epoch_ns(time))
+            if expected is None:
+                assert np.isnan(price)
+            else:
+                assert math.isclose(price, expected)
+        with pytest.raises(ValueError):
+            common_stock.volume_weighted_stock_price_series([0], timedelta(seconds=-1))
+
+    @pytest.mark.parametrize("quantities", [[-10], [10, -10], [10, -30]])
+    def test_volume_weighted_stock_price_non_positive_quantity(self, common_stock,
+                                                               quantities) -> None:
+        """
+        Test that trades whose quantities do not sum to a positive total have no VWSP,
+        in the rolling window and with an explicit window alike.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        for quantity in quantities:
+            common_stock.record_trade(Trade(timestamp=now, quantity=quantity,
+                                            side=TradeSide.BUY, trade_price=5.0))
+
+        assert common_stock.volume_weighted_stock_price(now) is None
+        assert common_stock.volume_weighted_stock_price(now, timedelta(minutes=15)) is None
+        assert common_stock.volume_weighted_stock_price(now, timedelta(minutes=5)) is None
+        assert np.isnan(common_stock.volume_weighted_stock_price_series([to_epoch_ns(now)])[0])
@@ -1,10 +1,19 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
 import pytest
+import pytz
 
+from src.models.screen import ScreenMetric
 from src.models.stock import Stock
 from src.models.stock_market import \
     StockMarket  # assuming StockMarket is defined in src/models/stock_market.py
 from src.models.stock_type import StockType
+from src.models.trade import Trade
 from src.models.trade_side import TradeSide
+from src.models.trade_store import from_epoch_ns, to_epoch_ns
+from src.util import set_up_stock_market
 
 
 class TestStockMarket:
@@ -65,3 +74,388 @@ class TestStockMarket:
 
         assert market.all_share_index() is None
 
+    def test_all_share_index(self, market) -> None:
+        """
+        Test that the index is the geometric mean of the VWSPs of the traded stocks.
+        """
+
+        market.record_trade(symbol="ABC", quantity=100, trade_price=80.0, side=TradeSide.BUY)
+        market.record_trade(symbol="XYZ", quantity=100, trade_price=125.0, side=TradeSide.SELL)
+        assert math.isclose(market.all_share_index(), math.sqrt(80.0 * 125.0))
+
+        market.record_trade(symbol="ABC", quantity=300, trade_price=100.0, side=TradeSide.BUY)
+        assert math.isclose(market.all_share_index(), math.sqrt(95.0 * 125.0))
+
+    def test_all_share_index_window_expiry(self, market) -> None:
+        """
+        Test that stocks whose trades left the VWSP window stop contributing to the index.
+        """
+
+        now = datetime.now(pytz.timezone('US/Eastern'))
+        market.stocks["ABC"].record_trade(Trade(timestamp=now - timedelta(minutes=10),
+                                                quantity=100, side=TradeSide.BUY,
+                                                trade_price=50.0))
+        market.stocks["XYZ"].record_trade(Trade(timestamp=now, quantity=100,
+                                                side=TradeSide.BUY, trade_price=200.0))
+
+        assert math.isclose(market.all_share_index(now=now), 100.0)
+        later = now + timedelta(minutes=10)
+        assert math.isclose(market.all_share_index(now=later), 200.0)
+        assert market.all_share_index(now=later + timedelta(minutes=10)) is None
+        # Going back in time re-prices every stock
+        assert math.isclose(market.all_share_index(now=now), 100.0)
+
+    def test_record_trades(self, market) -> None:
+        """
+        Test recording a batch of trades with rejected rows.
+
+        Valid trades are recorded, invalid ones are reported without failing the batch.
+        """
+
+        result = market.record_trades([("ABC", 100, 80.0, "BUY"),
+                                       ("NONEXISTENT", 100, 80.0, "BUY"),
+                                       ("XYZ", 50, 120.0, TradeSide.SELL),
+                                       ("ABC", 300, 100.0, "HOLD")])
+        assert result.accepted == 2
+        assert [(reject.row, reject.reason) for reject in result.rejected] == [
+            (1, "Stock symbol not found"), (3, "Side must be 'BUY' or 'SELL'")]
+
+        trade = market.stocks["ABC"].trades[0]
+        assert trade.quantity == 100
+        assert trade.trade_price == 80.0
+        assert trade.side == TradeSide.BUY
+        assert market.stocks["XYZ"].trades[0].side == TradeSide.SELL
+        assert math.isclose(market.all_share_index(), math.sqrt(80.0 * 120.0))
+
+    def test_record_trades_columns_with_timestamps(self, market) -> None:
+        """
+        Test recording a batch given as columns, with timestamps out of order.
+
+        Verifies trades are stored in timestamp order and the VWSP only uses the
+        trades inside the window.
+        """
+
+        now = datetime.now(pytz.timezone('US/Eastern'))
+        market.record_trade(symbol="ABC", quantity=100, trade_price=80.0, side=TradeSide.BUY)
+        result = market.record_trades({
+            "symbol": ["ABC", "ABC", "ABC"],
+            "quantity": [100, 200, 50],
+            "trade_price": [90.0, 82.0, 78.0],
+            "side": ["BUY", "SELL", "BUY"],
+            "timestamp": [now - timedelta(minutes=5), now - timedelta(minutes=10),
+                          now - timedelta(minutes=20)],
+        })
+        assert result.accepted == 3
+
+        stock = market.stocks["ABC"]
+        assert [trade.quantity for trade in stock.trades] == [50, 200, 100, 100]
+        expected = (80.0 * 100 + 90.0 * 100 + 82.0 * 200) / 400
+        # The trade recorded without a timestamp is later than `now`
+        assert math.isclose(stock.volume_weighted_stock_price(), expected)
+
+    def test_dividend_yields_and_pe_ratios(self, market) -> None:
+        """
+        Test market-wide batch pricing over a grid of scenario prices per stock.
+        """
+
+        prices = np.array([[80.0, 40.0, 160.0], [100.0, 50.0, 200.0]])
+        yields = market.dividend_yields(prices, symbols=["ABC", "XYZ"])
+        ratios = market.pe_ratios(prices, symbols=["ABC", "XYZ"])
+        assert yields.shape == ratios.shape == (2, 3)
+        for row, symbol in enumerate(["ABC", "XYZ"]):
+            stock = market.stocks[symbol]
+            for column, price in enumerate(prices[row]):
+                assert math.isclose(yields[row, column], stock.dividend_yield(price))
+                assert math.isclose(ratios[row, column], stock.pe_ratio(price))
+
+    def test_dividend_yields_one_price_per_stock(self, market) -> None:
+        """
+        Test market-wide batch pricing with a single price per stock, in market order.
+        """
+
+        yields = market.dividend_yields([80.0, 100.0])
+        assert np.allclose(yields, [market.stocks[symbol].dividend_yield(price) for symbol, price
+                                    in zip(market.get_supported_stocks(), [80.0, 100.0])])
+
+    def test_dividend_yields_shape_mismatch(self, market) -> None:
+        """
+        Test market-wide batch pricing without one row of prices per stock.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            market.dividend_yields([80.0, 100.0, 120.0])
+        with pytest.raises(ValueError):
+            market.pe_ratios([80.0], symbols=["NONEXISTENT"])
+
+    def test_latest_bars(self, market) -> None:
+        """
+        Test that the market keeps bars of its intervals for every stock, including
+        stocks added later, and returns the latest ones.
+        """
+
+        market = StockMarket(stocks=market.stocks,
+                             bar_intervals=[timedelta(seconds=1), timedelta(minutes=1)],
+                             bar_capacity=5)
+        market.add_stock(Stock(symbol="NEW", type=StockType.COMMON, last_dividend=1.0,
+                               par_value=10.0))
+        start = datetime(2025, 3, 3, 9, 30, tzinfo=pytz.utc)
+        market.record_trades({
+            "symbol": ["ABC", "ABC", "NEW", "ABC"],
+            "quantity": [1, 2, 3, 4],
+            "trade_price": [10.0, 11.0, 12.0, 13.0],
+            "side": ["BUY", "SELL", "BUY", "BUY"],
+            "timestamp": [start, start + timedelta(seconds=1), start,
+                          start + timedelta(seconds=2)],
+        })
+
+        bars = market.latest_bars(timedelta(seconds=1), 2)
+        assert set(bars) == set(market.get_supported_stocks())
+        assert [bar.close for bar in bars["ABC"]] == [11.0, 13.0]
+        assert [bar.volume for bar in bars["NEW"]] == [3]
+        assert bars["XYZ"] == []
+        minute = market.latest_bars(timedelta(minutes=1), symbols=["ABC"])
+        assert minute["ABC"][0].volume == 7
+        with pytest.raises(ValueError):
+            market.latest_bars(timedelta(seconds=1), symbols=["NONEXISTENT"])
+
+    def test_volume_weighted_stock_prices(self, market) -> None:
+        """
+        Test market-wide VWSP over shared and per-symbol windows.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        market.record_trades({
+            "symbol": ["ABC", "ABC", "XYZ"],
+            "quantity": [10, 10, 5],
+            "trade_price": [100.0, 200.0, 50.0],
+            "side": ["BUY", "SELL", "BUY"],
+            "timestamp": [now - timedelta(minutes=30), now - timedelta(minutes=2),
+                          now - timedelta(minutes=10)],
+        })
+
+        one, five, hour = timedelta(minutes=1), timedelta(minutes=5), timedelta(hours=1)
+        prices = market.volume_weighted_stock_prices([five], now,
+                                                     symbol_windows={"ABC": [hour]})
+        assert prices == {"ABC": {five: 200.0, hour: 150.0}, "XYZ": {five: None}}
+        assert market.volume_weighted_stock_prices([one], now, symbols=["XYZ"]) == \
+            {"XYZ": {one: None}}
+        with pytest.raises(ValueError):
+            market.volume_weighted_stock_prices([one], now, symbol_windows={"NOPE": [one]})
+
+    def test_all_share_index_as_of(self, market) -> None:
+        """
+        Test the index as of earlier times, and with trades recorded ahead of `now`
+        entering the window later.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        market.record_trades({
+            "symbol": ["ABC", "XYZ", "ABC", "XYZ"],
+            "quantity": [10, 10, 10, 10],
+            "trade_price": [100.0, 400.0, 300.0, 100.0],
+            "side": ["BUY", "BUY", "SELL", "SELL"],
+            "timestamp": [now - timedelta(minutes=10), now - timedelta(minutes=5),
+                          now + timedelta(minutes=1), now + timedelta(minutes=2)],
+        })
+
+        assert math.isclose(market.all_share_index(now), 200.0)
+        assert math.isclose(market.all_share_index(now + timedelta(minutes=1)),
+                            math.sqrt(200.0 * 400.0))
+        assert math.isclose(market.all_share_index(now + timedelta(minutes=3)),
+                            math.sqrt(200.0 * 250.0))
+        # The past is priced without disturbing the maintained index
+        assert math.isclose(market.all_share_index(now - timedelta(minutes=6)), 100.0)
+        assert market.all_share_index(now - timedelta(minutes=30)) is None
+        assert math.isclose(market.all_share_index(now + timedelta(minutes=3)),
+                            math.sqrt(200.0 * 250.0))
+        assert math.isclose(market.all_share_index(now + timedelta(minutes=16)),
+                            math.sqrt(300.0 * 100.0))
+
+    def test_all_share_index_series(self, market) -> None:
+        """
+        Test that the index series matches the index as of each of its times.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        rng = np.random.default_rng(3)
+        count = 500
+        market.record_trades({
+            "symbol": rng.choice(np.array(["ABC", "XYZ"], dtype=object), count),
+            "quantity": rng.integers(1, 100, count),
+            "trade_price": rng.uniform(50.0, 150.0, count),
+            "side": rng.choice(np.array(["BUY", "SELL"], dtype=object), count),
+            "timestamp": [now + timedelta(seconds=int(s))
+                          for s in np.sort(rng.integers(0, 3600, count))],
+        })
+
+        start, end = now - timedelta(minutes=1), now + timedelta(hours=1, minutes=20)
+        times_ns, values = market.all_share_index_series(start, end, timedelta(seconds=30))
+        assert len(times_ns) == 2 * 81 + 1
+        assert times_ns[0] == to_epoch_ns(start) and times_ns[-1] == to_epoch_ns(end)
+        for time_ns, value in zip(times_ns.tolist(), values):
+            expected = market.all_share_index(from_epoch_ns(time_ns))
+            if expected is None:
+                assert np.isnan(value)
+            else:
+                assert math.isclose(value, expected)
+        with pytest.raises(ValueError):
+            market.all_share_index_series(end, start)
+
+    def test_out_of_order_trades(self, market) -> None:
+        """
+        Test recording trades with their own, out of order, timestamps: late trades inside
+        the window correct the VWSP and the index, too late ones are dropped and counted.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        market.max_lateness = timedelta(minutes=5)
+        market.record_trade("ABC", 10, 100.0, TradeSide.BUY, timestamp=now)
+        assert math.isclose(market.all_share_index(now), 100.0)
+
+        market.record_trade("ABC", 10, 200.0, TradeSide.SELL,
+                            timestamp=now - timedelta(minutes=4))
+        assert [trade.trade_price for trade in market.stocks["ABC"].trades] == [200.0, 100.0]
+        assert market.stocks["ABC"].volume_weighted_stock_price(now) == 150.0
+        assert math.isclose(market.all_share_index(now), 150.0)
+
+        with pytest.raises(ValueError):
+            market.record_trade("ABC", 10, 300.0, TradeSide.BUY,
+                                timestamp=now - timedelta(minutes=6))
+
+        result = market.record_trades({
+            "symbol": ["ABC", "XYZ", "XYZ", "ABC", "XYZ"],
+            "quantity": [20, 10, 10, 10, 10],
+            "trade_price": [50.0, 80.0, 90.0, 60.0, 70.0],
+            "side": ["BUY", "BUY", "SELL", "BUY", "SELL"],
+            "timestamp": [now - timedelta(minutes=1), now + timedelta(minutes=2),
+                          now - timedelta(minutes=4), now - timedelta(minutes=8), now],
+        })
+        assert result.accepted == 3
+        assert [reject.row for reject in result.rejected] == [2, 3]
+        assert all("older than the latest trade" in reject.reason for reject in result.rejected)
+        assert [trade.quantity for trade in market.stocks["ABC"].trades] == [10, 20, 10]
+        assert market.stocks["ABC"].volume_weighted_stock_price(now) == 100.0
+        assert market.late_trades() == {"ABC": 2, "XYZ": 1}
+
+    def test_order_flow(self, market) -> None:
+        """
+        Test the order flow of every stock over its VWSP window, read in one call.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        market.record_trades({
+            "symbol": ["ABC", "ABC", "ABC", "XYZ"],
+            "quantity": [30, 10, 20, 5],
+            "trade_price": [100.0, 110.0, 90.0, 50.0],
+            "side": ["BUY", "SELL", "BUY", "SELL"],
+            "timestamp": [now - timedelta(minutes=20), now - timedelta(minutes=10),
+                          now - timedelta(minutes=5), now + timedelta(minutes=1)],
+        })
+
+        flows = market.order_flow(now)
+        assert set(flows) == {"ABC", "XYZ"}
+        abc = flows["ABC"]
+        assert (abc.buy_volume, abc.sell_volume) == (20, 10)
+        assert (abc.buy_vwsp, abc.sell_vwsp) == (90.0, 110.0)
+        assert math.isclose(abc.imbalance, 1 / 3)
+        assert flows["XYZ"].trade_count == 0
+
+        later = market.order_flow(now + timedelta(minutes=8), symbols=["ABC", "XYZ"])
+        assert later["ABC"].buy_trade_count == 1 and later["ABC"].sell_trade_count == 0
+        assert later["XYZ"].imbalance == -1.0
+        assert market.order_flow(now - timedelta(minutes=12))["ABC"].buy_volume == 30
+        with pytest.raises(ValueError):
+            market.order_flow(now, symbols=["NOPE"])
+
+    def test_top_stocks_and_screen(self, market) -> None:
+        """
+        Test ranking and filtering stocks by their metrics, kept up to date as trades
+        are recorded and leave the VWSP window.
+        """
+
+        now = datetime(2025, 3, 3, 12, 0, tzinfo=pytz.utc)
+        market.record_trades({
+            "symbol": ["ABC", "XYZ"],
+            "quantity": [100, 10],
+            "trade_price": [80.0, 200.0],
+            "side": ["BUY", "SELL"],
+            "timestamp": [now - timedelta(minutes=10), now - timedelta(minutes=1)],
+        })
+
+        top = market.top_stocks(ScreenMetric.VWSP, count=1, now=now)
+        assert [row.symbol for row in top] == ["XYZ"]
+        abc = market.top_stocks("dividend_yield", now=now)[0]
+        assert abc.symbol == "ABC" and abc.dividend_yield == 0.1 and abc.pe_ratio == 10.0
+        assert [row.symbol for row in market.top_stocks(ScreenMetric.WINDOW_VOLUME,
+                                                        ascending=True, now=now)] == \
+            ["XYZ", "ABC"]
+
+        market.set_reference_prices(now=now)
+        market.record_trade("ABC", 100, 100.0, TradeSide.BUY,
+                            timestamp=now + timedelta(minutes=1))
+        later = now + timedelta(minutes=2)
+        rows = market.screen_stocks({ScreenMetric.VWSP_CHANGE: (0.05, None),
+                                     ScreenMetric.WINDOW_VOLUME: (200, 200)}, now=later)
+        assert [row.symbol for row in rows] == ["ABC"]
+        assert math.isclose(rows[0].vwsp_change, 90.0 / 80.0 - 1)
+
+        # Only the newest ABC trade is left in the window, XYZ's expired
+        expired = market.top_stocks(ScreenMetric.VWSP, now=now + timedelta(minutes=15))
+        assert [(row.symbol, row.vwsp) for row in expired] == [("ABC", 100.0)]
+        # An earlier time is screened from scratch
+        assert market.top_stocks(ScreenMetric.VWSP, count=1, now=now)[0].symbol == "XYZ"
+        assert market.screen_stocks({ScreenMetric.PE_RATIO: (None, 5.0)}, now=later) == []
+
+        market.set_reference_prices({"XYZ": 100.0}, now=now + timedelta(minutes=15))
+        with pytest.raises(ValueError):
+            market.set_reference_prices({"NOPE": 1.0})
+        with pytest.raises(ValueError):
+            market.screen_stocks({})
+
+    def test_screen_with_undefined_dividend(self) -> None:
+        """
+        Test that a preferred stock without a fixed dividend is screened with an
+        undefined dividend yield and P/E ratio, and leaves the index of every other
+        stock intact.
+        """
+
+        market = set_up_stock_market()
+        market.add_stock(Stock(symbol="PRF", type=StockType.PREFERRED, last_dividend=8.0,
+                               par_value=100.0))
+        symbols = market.get_supported_stocks()
+        for price, symbol in enumerate(symbols, start=1):
+            market.record_trade(symbol, 10, price * 10.0, TradeSide.BUY)
+
+        top = market.top_stocks("dividend_yield", 3)
+        assert "PRF" not in [row.symbol for row in top]
+        prf = market.screen_stocks({ScreenMetric.VWSP: (60.0, 60.0)})
+        assert [(row.symbol, row.dividend_yield, row.pe_ratio) for row in prf] == \
+            [("PRF", None, None)]
+        expected = math.prod(range(10, 70, 10)) ** (1 / 6)
+        assert math.isclose(market.all_share_index(), expected)
+
+        market.record_trade("TEA", 10, 10.0, TradeSide.BUY)
+        assert math.isclose(market.all_share_index(), expected)
+        assert {"ALE", "JOE", "GIN"} <= \
+            {row.symbol for row in market.top_stocks("dividend_yield", 6)}
+
+    def test_failed_index_update_is_retried(self, monkeypatch) -> None:
+        """Test that the stocks left over by a failed index update are updated next time."""
+
+        market = set_up_stock_market()
+        for price, symbol in enumerate(market.get_supported_stocks(), start=1):
+            market.record_trade(symbol, 10, price * 10.0, TradeSide.BUY)
+        price_stock = StockMarket._price_stock
+
+        def failing_price_stock(stock, now_ns):
+            if stock.symbol == "POP":
+                raise RuntimeError("pricing failed")
+            return price_stock(stock, now_ns)
+
+        monkeypatch.setattr(StockMarket, "_price_stock", staticmethod(failing_price_stock))
+        with pytest.raises(RuntimeError):
+            market.all_share_index()
+        monkeypatch.undo()
+        assert math.isclose(market.all_share_index(), math.prod(range(10, 60, 10)) ** (1 / 5))
@@ -0,0 +1,140 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade import Trade
+from src.models.trade_side import TradeSide
+
+START = datetime(2025, 3, 3, 10, 0, tzinfo=pytz.utc)
+
+
+def trade(at: datetime, quantity: int, trade_price: float) -> Trade:
+    """A BUY trade at the given time."""
+
+    return Trade(timestamp=at, quantity=quantity, side=TradeSide.BUY, trade_price=trade_price)
+
+
+@pytest.fixture
+def market() -> StockMarket:
+    """Set up a stock market with two stocks."""
+
+    market = StockMarket()
+    market.add_stock(Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                           par_value=100.0))
+    market.add_stock(Stock(symbol="XYZ", type=StockType.COMMON, last_dividend=8.0,
+                           par_value=100.0))
+    return market
+
+
+class TestSubscriptions:
+    """Unit tests for VWSP and index subscriptions"""
+
+    def test_burst_gives_one_update(self, market) -> None:
+        """
+        Test that a burst of trades is coalesced into a single update per value.
+        """
+
+        updates = []
+        market.subscribe(updates.append, symbols=["ABC"], index=True)
+        assert market.publish_updates(START) == 2
+        assert updates[0].value is None and updates[1].value is None
+        updates.clear()
+
+        for i in range(10_000):
+            market.stocks["ABC"].record_trade(trade(START + timedelta(microseconds=i), 10,
+                                                    10.0 + i % 2))
+        now = START + timedelta(seconds=1)
+        assert market.publish_updates(now) == 2
+        by_symbol = {update.symbol: update.value for update in updates}
+        assert math.isclose(by_symbol["ABC"], 10.5)
+        assert math.isclose(by_symbol[None], 10.5)
+
+        assert market.publish_updates(now + timedelta(seconds=1)) == 0
+
+    def test_only_changed_subscriptions_are_notified(self, market) -> None:
+        """
+        Test that trades on one symbol do not notify the subscribers of another, and
+        that an unchanged value is not published again.
+        """
+
+        abc, xyz = [], []
+        market.subscribe(abc.append, symbols=["ABC"])
+        market.subscribe(xyz.append, symbols=["XYZ"])
+        market.publish_updates(START)
+        abc.clear(), xyz.clear()
+
+        market.stocks["ABC"].record_trade(trade(START, 10, 20.0))
+        market.publish_updates(START + timedelta(seconds=1))
+        assert [update.value for update in abc] == [20.0]
+        assert xyz == []
+
+        market.stocks["ABC"].record_trade(trade(START + timedelta(seconds=1), 10, 20.0))
+        market.publish_updates(START + timedelta(seconds=2))
+        assert len(abc) == 1
+
+    def test_window_expiry_is_pushed(self, market) -> None:
+        """
+        Test that a value leaving the VWSP window is pushed without a new trade.
+        """
+
+        updates = []
+        market.stocks["ABC"].record_trade(trade(START, 10, 20.0))
+        market.subscribe(updates.append, symbols=["ABC"])
+        market.publish_updates(START)
+        market.publish_updates(START + timedelta(minutes=16))
+
+        assert [update.value for update in updates] == [20.0, None]
+
+    def test_max_rate(self, market) -> None:
+        """
+        Test that updates are published at most once per min_interval, and that the
+        changes held back are published once it elapsed.
+        """
+
+        updates = []
+        market.subscribe(updates.append, symbols=["ABC"], min_interval=timedelta(seconds=1))
+        market.publish_updates(START)
+
+        market.stocks["ABC"].record_trade(trade(START, 10, 20.0))
+        assert market.publish_updates(START + timedelta(milliseconds=500)) == 0
+        assert market.publish_updates(START + timedelta(milliseconds=1000)) == 1
+        assert updates[-1].value == 20.0
+
+    def test_unsubscribe(self, market) -> None:
+        """Unsubscribed callbacks are not called again."""
+
+        updates = []
+        subscription = market.subscribe(updates.append, index=True)
+        market.unsubscribe(subscription)
+        market.stocks["ABC"].record_trade(trade(START, 10, 20.0))
+        assert market.publish_updates(START) == 0
+        assert updates == []
+
+    def test_failing_callback(self, market) -> None:
+        """A failing callback does not stop the other subscribers."""
+
+        def fail(update) -> None:
+            raise RuntimeError("subscriber failed")
+
+        updates = []
+        market.subscribe(fail, index=True)
+        market.subscribe(updates.append, index=True)
+        market.publish_updates(START)
+        assert len(updates) == 1
+
+    def test_subscribe_unknown_symbol(self, market) -> None:
+        """
+        Test subscribing to an unknown symbol, or to nothing.
+
+        Should raise ValueErrors which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            market.subscribe(print, symbols=["NOPE"])
+        with pytest.raises(ValueError):
+            market.subscribe(print)
@@ -0,0 +1,169 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from typer.testing import CliRunner
+
+from src.cli.commands import app
+from src.feeds.tape import read_binary_tape, read_csv_tape, read_tape, replay_tape, \
+    write_binary_tape, write_csv_tape
+from src.models.clock import SimulatedClock
+from src.models.retention import RetentionPolicy
+from src.models.stock import Stock
+from src.models.stock_market import StockMarket
+from src.models.stock_type import StockType
+from src.models.trade_side import TradeSide
+from src.models.trade_store import to_epoch_ns
+
+START = pytz.timezone('US/Eastern').localize(datetime(2025, 3, 3, 9, 30))
+
+
+@pytest.fixture
+def market() -> StockMarket:
+    """Set up a stock market with two stocks."""
+
+    market = StockMarket()
+    market.add_stock(Stock(symbol="ABC", type=StockType.COMMON, last_dividend=8.0,
+                           par_value=100.0))
+    market.add_stock(Stock(symbol="XYZ", type=StockType.PREFERRED, last_dividend=8.0,
+                           fixed_dividend=0.02, par_value=100.0))
+    return market
+
+
+@pytest.fixture
+def records() -> list:
+    """One trade a minute for an hour, alternating between the two stocks."""
+
+    return [(START + timedelta(minutes=minute), "ABC" if minute % 2 else "XYZ",
+             10 + minute, 50.0 + minute, TradeSide.SELL if minute % 3 else TradeSide.BUY)
+            for minute in range(60)]
+
+
+@pytest.fixture(params=["csv", "binary"])
+def tape(request, tmp_path, records):
+    """Write the records to a CSV or binary tape."""
+
+    path = tmp_path / f"tape.{request.param}"
+    writer = write_csv_tape if request.param == "csv" else write_binary_tape
+    assert writer(path, records) == len(records)
+    return path
+
+
+class TestTape:
+    """Unit tests for trade tape readers and replay"""
+
+    def test_read_tape_batches(self, tape, records) -> None:
+        """
+        Test that a tape is streamed back in batches with every column intact.
+        """
+
+        batches = list(read_tape(tape, batch_size=25))
+        assert [len(batch["symbol"]) for batch in batches] == [25, 25, 10]
+
+        first = batches[0]
+        assert int(first["timestamp"][0]) == to_epoch_ns(records[0][0])
+        assert first["symbol"][1] == "ABC"
+        assert int(first["quantity"][1]) == 11
+        assert float(first["trade_price"][1]) == 51.0
+        assert first["side"][0] == "BUY"
+        assert first["side"][1] == "SELL"
+
+    def test_readers_refuse_other_formats(self, tmp_path, records) -> None:
+        """
+        Test that the binary reader refuses a CSV tape.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        path = tmp_path / "tape.csv"
+        write_csv_tape(path, records)
+        with pytest.raises(ValueError):
+            list(read_binary_tape(path))
+
+    def test_csv_iso_timestamps(self, tmp_path) -> None:
+        """Test that CSV tapes can hold ISO 8601 timestamps."""
+
+        path = tmp_path / "tape.csv"
+        path.write_text("timestamp,symbol,quantity,trade_price,side\n"
+                        "2025-03-03T09:30:00-05:00,ABC,10,50.0,BUY\n")
+        batch = next(read_csv_tape(path))
+        assert int(batch["timestamp"][0]) == to_epoch_ns(START)
+
+    def test_replay_keeps_recorded_timestamps(self, market, tape, records) -> None:
+        """
+        Test that replayed trades keep their tape timestamps.
+
+        The VWSP at the end of the tape only uses the last 15 minutes of trades.
+        """
+
+        result = replay_tape(market, read_tape(tape, batch_size=7))
+        assert result.accepted == len(records)
+        assert result.rejected == []
+        assert result.last_timestamp_ns == to_epoch_ns(records[-1][0])
+
+        abc = market.stocks["ABC"]
+        assert abc.trades[0].timestamp == records[1][0]
+        end = records[-1][0]
+        window = [r for r in records if r[1] == "ABC" and r[0] >= end - timedelta(minutes=15)]
+        expected = sum(r[2] * r[3] for r in window) / sum(r[2] for r in window)
+        assert math.isclose(abc.volume_weighted_stock_price(now=end), expected)
+
+    def test_replay_reports_rejected_rows(self, market, tmp_path, records) -> None:
+        """
+        Test that rejected rows are reported by their position on the tape.
+        """
+
+        records[42] = (records[42][0], "NOPE", 1, 1.0, TradeSide.BUY)
+        path = tmp_path / "tape.bin"
+        write_binary_tape(path, records)
+        result = replay_tape(market, read_tape(path, batch_size=10))
+        assert result.accepted == len(records) - 1
+        assert [(reject.row, reject.reason) for reject in result.rejected] == [
+            (42, "Stock symbol not found")]
+
+    def test_replay_enforces_retention(self, market, tape) -> None:
+        """
+        Test that a market retention policy is enforced as the tape is replayed.
+        """
+
+        market.retention = RetentionPolicy(max_age=timedelta(minutes=20))
+        replay_tape(market, read_tape(tape, batch_size=25))
+
+        kept = sum(len(stock.trades) for stock in market.stocks.values())
+        compacted = sum(len(stock.bars) for stock in market.stocks.values())
+        assert kept == 21
+        assert compacted == 39
+
+    def test_replay_speed(self, market, tape, records) -> None:
+        """
+        Test that a paced replay releases trades at the requested speed.
+
+        The hour long tape replayed at 60x takes one simulated minute.
+        """
+
+        clock = SimulatedClock(0)
+        result = replay_tape(market, read_tape(tape), speed=60, sleep=clock.sleep,
+                             clock=clock.monotonic)
+        assert result.accepted == len(records)
+        assert math.isclose(clock.monotonic(), 59.0)
+
+    def test_replay_invalid_speed(self, market, tape) -> None:
+        """
+        Test that a non-positive speed is refused.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            replay_tape(market, read_tape(tape), speed=0)
+
+    def test_replay_command(self, monkeypatch, market, tape) -> None:
+        """Test the replay command prints the prices at the end of the tape."""
+
+        monkeypatch.setattr("src.cli.commands.set_up_stock_market", lambda: market)
+        result = CliRunner().invoke(app, ["replay", str(tape)])
+        assert result.exit_code == 0, result.output
+        assert "Replayed 60 trades" in result.output
+        assert "Volume Weighted Stock Price for ABC" in result.output
+        assert "GBCE All Share Index" in result.output
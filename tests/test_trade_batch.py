@@ -0,0 +1,133 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+from src.models.trade_batch import new_trade_ids, to_columns, validate_trades
+from src.models.trade_store import to_epoch_ns
+
+SYMBOLS = {"ABC", "XYZ"}
+NOW_NS = to_epoch_ns(datetime(2025, 3, 1, 10, 0, tzinfo=pytz.utc))
+
+
+class TestTradeBatch:
+    """Unit tests for trade batch normalisation and validation"""
+
+    def test_tuple_and_dict_records(self) -> None:
+        """Test that tuple and dict records are turned into columns."""
+
+        columns = to_columns([("ABC", 10, 80.0, "BUY"),
+                              {"symbol": "XYZ", "quantity": 5, "trade_price": 90.0,
+                               "side": "SELL"}])
+        assert columns == {"symbol": ["ABC", "XYZ"], "quantity": [10, 5],
+                           "trade_price": [80.0, 90.0], "side": ["BUY", "SELL"]}
+
+    def test_missing_column(self) -> None:
+        """
+        Test that a column mapping without a required column is refused.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            to_columns({"symbol": ["ABC"], "quantity": [1], "trade_price": [1.0]})
+
+    def test_column_length_mismatch(self) -> None:
+        """
+        Test that columns of different lengths are refused.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            to_columns({"symbol": ["ABC"], "quantity": [1, 2], "trade_price": [1.0],
+                        "side": ["BUY"]})
+
+    def test_rejects_invalid_rows(self) -> None:
+        """
+        Test that every invalid row is masked out and reported with its reason.
+        """
+
+        columns = to_columns([("ABC", 10, 80.0, "BUY"),
+                              ("NOPE", 10, 80.0, "BUY"),
+                              ("ABC", 1.5, 80.0, "BUY"),
+                              ("ABC", 10, "cheap", "BUY"),
+                              ("ABC", 10, 80.0, "buy"),
+                              ("XYZ", "20", "81.5", "SELL")])
+        validated, rejected = validate_trades(columns, SYMBOLS, NOW_NS)
+
+        assert list(validated.valid) == [True, False, False, False, False, True]
+        assert [reject.row for reject in rejected] == [1, 2, 3, 4]
+        assert rejected[0].reason == "Stock symbol not found"
+        assert validated.quantities[5] == 20
+        assert validated.trade_prices[5] == 81.5
+        assert list(validated.sides[[0, 5]]) == [0, 1]
+
+    def test_numpy_columns(self) -> None:
+        """
+        Test that NumPy columns are validated without converting element by element.
+        """
+
+        columns = to_columns({"symbol": np.array(["ABC", "XYZ", "ABC"]),
+                              "quantity": np.array([10.0, 2.5, 30.0]),
+                              "trade_price": np.array([80.0, 81.0, 82.0]),
+                              "side": np.array(["BUY", "SELL", "SELL"])})
+        validated, rejected = validate_trades(columns, SYMBOLS, NOW_NS)
+
+        assert list(validated.valid) == [True, False, True]
+        assert [reject.row for reject in rejected] == [1]
+        assert validated.quantities.dtype == np.int64
+        assert list(validated.timestamps) == [NOW_NS] * 3
+
+    def test_rejects_non_finite_prices(self) -> None:
+        """
+        Test that infinite and NaN prices are rejected from NumPy, string and object
+        price columns, since one of them would poison the running sums of its stock.
+        """
+
+        for prices in (np.array([80.0, np.inf, np.nan]), np.array(["80", "inf", "nan"]),
+                       [80.0, float("-inf"), "nan"]):
+            columns = to_columns({"symbol": ["ABC"] * 3, "quantity": [10] * 3,
+                                  "trade_price": prices, "side": ["BUY"] * 3})
+            validated, rejected = validate_trades(columns, SYMBOLS, NOW_NS)
+            assert list(validated.valid) == [True, False, False]
+            assert all(reject.reason.startswith("Invalid trade price") for reject in rejected)
+
+    def test_timestamps(self) -> None:
+        """
+        Test that datetimes, epoch nanoseconds and missing timestamps are converted.
+        """
+
+        timestamp = datetime(2025, 3, 1, 9, 0, tzinfo=pytz.utc)
+        columns = to_columns([("ABC", 1, 1.0, "BUY", timestamp),
+                              ("ABC", 1, 1.0, "BUY", 1_000),
+                              ("ABC", 1, 1.0, "BUY"),
+                              ("ABC", 1, 1.0, "BUY", "yesterday")])
+        validated, rejected = validate_trades(columns, SYMBOLS, NOW_NS)
+
+        assert list(validated.timestamps[:3]) == [to_epoch_ns(timestamp), 1_000, NOW_NS]
+        assert [reject.row for reject in rejected] == [3]
+
+    def test_groups_sorted_by_timestamp(self) -> None:
+        """
+        Test that valid rows are grouped per symbol and sorted by timestamp.
+        """
+
+        columns = to_columns({"symbol": ["ABC", "XYZ", "ABC", "NOPE", "ABC"],
+                              "quantity": [1, 2, 3, 4, 5],
+                              "trade_price": [1.0] * 5,
+                              "side": ["BUY"] * 5,
+                              "timestamp": [30, 10, 10, 5, 20]})
+        validated, _ = validate_trades(columns, SYMBOLS, NOW_NS)
+        groups = {symbol: list(rows) for symbol, rows in validated.groups()}
+        assert groups == {"ABC": [2, 4, 0], "XYZ": [1]}
+
+    def test_new_trade_ids(self) -> None:
+        """Test that generated trade IDs are distinct version 4 UUIDs."""
+
+        ids = new_trade_ids(100)
+        assert len(ids) == 1600
+        uuids = {ids[i:i + 16] for i in range(0, len(ids), 16)}
+        assert len(uuids) == 100
+        assert all(uid[6] >> 4 == 4 and uid[8] >> 6 == 2 for uid in uuids)
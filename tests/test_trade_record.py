@@ -0,0 +1,90 @@
+import uuid
+from datetime import datetime
+
+import pytest
+import pytz
+
+from src.models.trade import Trade
+from src.models.trade_record import TradeRecord
+from src.models.trade_side import TradeSide
+from src.models.trade_store import TradeStore, to_epoch_ns
+
+NOW_NS = to_epoch_ns(datetime(2025, 3, 3, 14, 30, tzinfo=pytz.utc))
+
+
+class TestTradeRecord:
+    """Unit tests for TradeRecord class"""
+
+    def test_ids_are_random_uuids(self) -> None:
+        """
+        Test that records get distinct random UUIDs, over more than one block of IDs, so
+        trades recorded after a recovery never reuse the IDs of recovered ones.
+        """
+
+        ids = [TradeRecord.create(NOW_NS, 100, 80.0, TradeSide.BUY).trade_id
+               for _ in range(10_000)]
+        assert len(set(ids)) == len(ids)
+        assert all(uuid.UUID(int=trade_id).version == 4 for trade_id in ids)
+
+    def test_immutable(self) -> None:
+        """
+        Test that records cannot be changed.
+
+        Should raise an AttributeError which pytest would catch
+        """
+
+        record = TradeRecord.create(NOW_NS, 100, 80.0, TradeSide.BUY)
+        with pytest.raises(AttributeError):
+            record.quantity = 1
+
+    def test_to_trade(self) -> None:
+        """Test converting a record to a Trade model and back."""
+
+        record = TradeRecord.create(NOW_NS, 100, 80.0, TradeSide.SELL)
+        trade = record.to_trade()
+        assert trade.trade_id == uuid.UUID(int=record.trade_id)
+        assert to_epoch_ns(trade.timestamp) == NOW_NS
+        assert (trade.quantity, trade.trade_price, trade.side) == (100, 80.0, TradeSide.SELL)
+        assert TradeRecord.from_trade(trade) == record
+
+    def test_validate_coerces_like_trade(self) -> None:
+        """
+        Test that validation accepts the values a Trade accepts.
+        """
+
+        record = TradeRecord.validate(NOW_NS, "100", 80, "BUY")
+        assert record.quantity == 100
+        assert isinstance(record.trade_price, float)
+        assert record.side is TradeSide.BUY
+
+    @pytest.mark.parametrize("quantity, trade_price, side", [
+        (100, 80.0, "buy"),
+        (100, 80.0, "HOLD"),
+        (1.5, 80.0, "BUY"),
+        ("many", 80.0, "BUY"),
+        (100, "cheap", "BUY"),
+        (2 ** 64, 80.0, "BUY"),
+        (100, float("inf"), "BUY"),
+        (100, "nan", "BUY"),
+    ])
+    def test_validate_rejects(self, quantity, trade_price, side) -> None:
+        """
+        Test that validation refuses the values a Trade refuses.
+
+        Should raise a ValueError which pytest would catch
+        """
+
+        with pytest.raises(ValueError):
+            TradeRecord.validate(NOW_NS, quantity, trade_price, side)
+        if quantity != 2 ** 64:
+            with pytest.raises(ValueError):
+                Trade(timestamp=datetime.now(pytz.utc), quantity=quantity,
+                      trade_price=trade_price, side=side)
+
+    def test_stored_record_reads_back_as_trade(self) -> None:
+        """Test that a record stored in a trade store reads back as its Trade."""
+
+        store = TradeStore()
+        record = TradeRecord.create(NOW_NS, 100, 80.0, TradeSide.BUY)
+        store.append_record(record)
+        assert store[0] == record.to_trade()
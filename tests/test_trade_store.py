@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from src.models.trade import Trade
+from src.models.trade_side import TradeSide
+from src.models.trade_store import TradeStore, from_epoch_ns, to_epoch_ns
+
+
+class TestTradeStore:
+    """Unit tests for TradeStore class"""
+
+    def test_epoch_ns_round_trip(self) -> None:
+        """Test converting datetimes to epoch nanoseconds and back."""
+
+        timestamp = datetime(2025, 3, 1, 10, 30, 15, 123456, tzinfo=pytz.utc)
+        timestamp_ns = to_epoch_ns(timestamp)
+        assert timestamp_ns == 1740825015123456000
+        assert from_epoch_ns(timestamp_ns) == timestamp
+
+    def test_naive_timestamp_is_utc(self) -> None:
+        """Test that naive datetimes are taken to be in UTC."""
+
+        naive = datetime(2025, 3, 1, 10, 30)
+        assert to_epoch_ns(naive) == to_epoch_ns(naive.replace(tzinfo=pytz.utc))
+
+    def test_trades_built_on_demand(self) -> None:
+        """
+        Test that trades read back from the store are equal to the recorded ones.
+        """
+
+        store = TradeStore()
+        trade = Trade(timestamp=datetime.now(pytz.timezone('US/Eastern')), quantity=100,
+                      side=TradeSide.SELL, trade_price=80.5)
+        assert store.append(trade) == 0
+        assert len(store) == 1
+        assert store[0] == trade
+        assert store[-1] == trade
+        assert list(store) == [trade]
+        assert store[:] == [trade]
+
+    def test_keeps_timestamp_order(self) -> None:
+        """
+        Test that trades recorded out of order are stored sorted by timestamp.
+        """
+
+        now = datetime.now(pytz.timezone('US/Eastern'))
+        store = TradeStore()
+        for minutes in (5, 20, 10, 0):
+            store.append(Trade(timestamp=now - timedelta(minutes=minutes), quantity=minutes,
+                               side=TradeSide.BUY, trade_price=1.0))
+
+        assert [trade.quantity for trade in store] == [20, 10, 5, 0]
+        assert list(store.timestamps) == sorted(store.timestamps)
+        assert store.bisect(to_epoch_ns(now - timedelta(minutes=10))) == 1
+
+    def test_bytes_per_trade(self) -> None:
+        """
+        Test that the store reports its memory usage per trade.
+
+        Timestamp, quantity and price take 8 bytes each, the side flag 1 byte and the
+        trade ID 16 bytes.
+        """
+
+        store = TradeStore()
+        assert store.bytes_per_trade is None
+        now = datetime.now(pytz.utc)
+        for i in range(1000):
+            store.append(Trade(timestamp=now, quantity=i, side=TradeSide.BUY,
+                               trade_price=10.0))
+        assert store.nbytes == 1000 * 41
+        assert store.bytes_per_trade == 41
+
+    def test_from_buffers(self) -> None:
+        """
+        Test that a store over read-only buffers reads them in place, and copies them
+        before the first change.
+        """
+
+        now = datetime.now(pytz.utc)
+        source = TradeStore()
+        for minutes in (2, 1, 0):
+            source.append(Trade(timestamp=now - timedelta(minutes=minutes), quantity=minutes,
+                                side=TradeSide.SELL, trade_price=2.0))
+        buffers = [bytes(memoryview(column).cast('B')) for column in (
+            source.timestamps, source.quantities, source.prices, source.sides,
+            source.trade_ids)]
+
+        store = TradeStore.from_buffers(*buffers)
+        assert isinstance(store.timestamps, memoryview)
+        assert list(store) == list(source)
+        assert store.bisect(to_epoch_ns(now)) == 2
+        assert store.nbytes == source.nbytes
+
+        trade = Trade(timestamp=now - timedelta(seconds=30), quantity=9, side=TradeSide.BUY,
+                      trade_price=3.0)
+        assert store.append(trade) == 2
+        assert [trade.quantity for trade in store] == [2, 1, 9, 0]
+        assert len(store.drop_front(1)) == 1
+        assert len(source) == 3
+
+    def test_merge(self) -> None:
+        """
+        Test merging a sorted batch that starts before the last stored trade.
+        """
+
+        store = TradeStore()
+        for i, timestamp_ns in enumerate((10, 20, 30, 40)):
+            store.record(timestamp_ns, i, float(i), 0, bytes([i]) * 16)
+
+        position = store.merge(np.array([20, 25, 50], dtype=np.int64),
+                               np.array([7, 8, 9], dtype=np.int64),
+                               np.array([7.0, 8.0, 9.0]), np.array([1, 1, 1], dtype=np.int8),
+                               bytes([7]) * 16 + bytes([8]) * 16 + bytes([9]) * 16)
+
+        assert position == 2
+        assert list(store.timestamps) == [10, 20, 20, 25, 30, 40, 50]
+        assert list(store.quantities) == [0, 1, 7, 8, 2, 3, 9]
+        assert list(store.prices) == [0.0, 1.0, 7.0, 8.0, 2.0, 3.0, 9.0]
+        assert list(store.sides) == [0, 0, 1, 1, 0, 0, 1]
+        assert [store.trade_ids[i * 16] for i in range(len(store))] == [0, 1, 7, 8, 2, 3, 9]
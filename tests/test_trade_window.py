@@ -0,0 +1,154 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from src.models.order_flow import summarize
+from src.models.trade import Trade
+from src.models.trade_side import TradeSide
+from src.models.trade_store import TradeStore, to_epoch_ns
+from src.models.trade_window import TradeWindow
+
+LAG_NS = 15 * 60 * 1_000_000_000
+
+
+def record(store: TradeStore, window: TradeWindow, timestamp: datetime, quantity: int,
+           trade_price: float) -> None:
+    """Store a BUY trade and add it to the window."""
+
+    position = store.append(Trade(timestamp=timestamp, quantity=quantity, side=TradeSide.BUY,
+                                  trade_price=trade_price))
+    window.add(position)
+
+
+class TestTradeWindow:
+    """Unit tests for TradeWindow class"""
+
+    def test_empty_window(self) -> None:
+        """An empty window has no VWSP."""
+
+        window = TradeWindow(TradeStore(), LAG_NS)
+        assert window.volume_weighted_stock_price(to_epoch_ns(datetime.now(pytz.utc))) is None
+
+    def test_evicts_expired_trades(self) -> None:
+        """
+        Test that trades older than the lag are evicted as time moves forward.
+        """
+
+        start = datetime(2025, 3, 1, 10, 0, tzinfo=pytz.utc)
+        store = TradeStore()
+        window = TradeWindow(store, LAG_NS)
+        record(store, window, start, 100, 10.0)
+        record(store, window, start + timedelta(minutes=10), 100, 20.0)
+
+        now_ns = to_epoch_ns(start + timedelta(minutes=10))
+        assert math.isclose(window.volume_weighted_stock_price(now_ns), 15.0)
+        now_ns = to_epoch_ns(start + timedelta(minutes=20))
+        assert math.isclose(window.volume_weighted_stock_price(now_ns), 20.0)
+        assert len(window) == 1
+        now_ns = to_epoch_ns(start + timedelta(minutes=30))
+        assert window.volume_weighted_stock_price(now_ns) is None
+        assert len(window) == 0
+
+    def test_out_of_order_trades(self) -> None:
+        """
+        Test that trades added out of order are still evicted by timestamp.
+        """
+
+        now = datetime(2025, 3, 1, 10, 0, tzinfo=pytz.utc)
+        store = TradeStore()
+        window = TradeWindow(store, LAG_NS)
+        record(store, window, now - timedelta(minutes=5), 100, 80.0)
+        record(store, window, now - timedelta(minutes=20), 50, 78.0)
+        record(store, window, now - timedelta(minutes=10), 200, 82.0)
+
+        expected = (80.0 * 100 + 82.0 * 200) / 300
+        assert math.isclose(window.volume_weighted_stock_price(to_epoch_ns(now)), expected)
+
+    def test_can_answer(self) -> None:
+        """
+        Test that the window refuses queries earlier than the time it was advanced to.
+        """
+
+        now_ns = to_epoch_ns(datetime(2025, 3, 1, 10, 0, tzinfo=pytz.utc))
+        window = TradeWindow(TradeStore(), LAG_NS)
+        window.advance(now_ns)
+
+        assert window.can_answer(now_ns)
+        assert window.can_answer(now_ns + 1)
+        assert not window.can_answer(now_ns - 1)
+
+    def test_trade_before_threshold_is_ignored(self) -> None:
+        """
+        Test that a trade older than the current threshold does not enter the window.
+        """
+
+        now = datetime(2025, 3, 1, 10, 0, tzinfo=pytz.utc)
+        store = TradeStore()
+        window = TradeWindow(store, LAG_NS)
+        record(store, window, now, 100, 10.0)
+        window.advance(to_epoch_ns(now))
+        record(store, window, now - timedelta(minutes=30), 100, 20.0)
+
+        assert len(store) == 2
+        assert len(window) == 1
+        assert math.isclose(window.volume_weighted_stock_price(to_epoch_ns(now)), 10.0)
+
+    def test_insert_merged_trades(self) -> None:
+        """
+        Test that a merged batch is added to the sums, except the trades it puts before
+        the window.
+        """
+
+        store = TradeStore()
+        minute_ns = 60 * 1_000_000_000
+        for minutes in (0, 10, 20):
+            store.record(minutes * minute_ns, 10, 100.0, 0, bytes(16))
+        window = TradeWindow(store, LAG_NS)
+        assert window.volume_weighted_stock_price(20 * minute_ns) == 100.0
+
+        columns = (np.array([2, 12, 25], dtype=np.int64) * minute_ns,
+                   np.array([10, 10, 20], dtype=np.int64), np.array([50.0, 200.0, 300.0]))
+        sides = np.zeros(3, dtype=np.int8)
+        store.merge(*columns, sides, bytes(48))
+        window.insert(*columns, sides)
+
+        assert window.seen == len(store) == 6
+        assert store.timestamps[window.start] == 10 * minute_ns
+        assert math.isclose(window.volume_weighted_stock_price(20 * minute_ns),
+                            (1000.0 + 1000.0 + 2000.0 + 6000.0) / 50)
+
+    def test_order_flow(self) -> None:
+        """
+        Test that the SELL side sums follow trades recorded in and out of order, merged
+        and evicted.
+        """
+
+        store = TradeStore()
+        minute_ns = 60 * 1_000_000_000
+        rows = [(minutes, 10 + minutes, 100.0 + minutes, minutes % 3 == 0)
+                for minutes in (0, 4, 9, 3, 14, 12, 20)]
+        window = TradeWindow(store, LAG_NS)
+        for minutes, quantity, price, sell in rows:
+            window.add(store.record(minutes * minute_ns, quantity, price, int(sell),
+                                    bytes(16)))
+        columns = (np.array([5, 16, 30], dtype=np.int64) * minute_ns,
+                   np.array([7, 8, 9], dtype=np.int64), np.array([50.0, 60.0, 70.0]),
+                   np.array([1, 1, 0], dtype=np.int8))
+        window.advance(21 * minute_ns)
+        store.merge(*columns, bytes(48))
+        window.insert(*columns)
+
+        for now_minutes in (21, 26, 29, 31, 50):
+            now_ns = now_minutes * minute_ns
+            flow = window.order_flow(now_ns)
+            start = store.bisect(now_ns - LAG_NS)
+            expected = summarize(store.quantities[start:], store.prices[start:],
+                                 store.sides[start:])
+            assert flow.buy_volume == expected.buy_volume
+            assert flow.sell_volume == expected.sell_volume
+            assert flow.buy_trade_count == expected.buy_trade_count
+            assert flow.sell_trade_count == expected.sell_trade_count
+            assert math.isclose(flow.sell_notional, expected.sell_notional, abs_tol=1e-9)
+            assert math.isclose(flow.buy_notional, expected.buy_notional, abs_tol=1e-9)